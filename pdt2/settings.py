@@ -96,6 +96,10 @@ DATABASES = {
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
          'OPTIONS': {
             'timeout': 20,
+        },
+        # File-backed test database so concurrency tests can open several connections.
+        'TEST': {
+            'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3'),
         }
     }
 }
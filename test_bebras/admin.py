@@ -8,7 +8,11 @@ from django.utils.timezone import now
 from decimal import Decimal, InvalidOperation
 from django.utils.html import strip_tags
 
-from .models import Answer, Attempt, Choice, Question, Skill, Test, TestAssignment, GroupMetadata
+from .models import Answer, Attempt, Choice, IndexedAnswer, Question, Skill, Test, TestAssignment, GroupMetadata
+from .services.answer_key import get_answer_key, get_key_entry, record_answer_decisions
+from .services.rescoring_service import rescore_test
+from .services.statistics_rollup_service import updating_rollups
+from .services.scoring_service import answer_score, is_correct_status, manual_grade_for, normalized_answer_value, update_attempt_totals
 
 class ChoiceInline(admin.TabularInline):
     model = Choice
@@ -16,9 +20,10 @@ class ChoiceInline(admin.TabularInline):
 
 @admin.register(Question)
 class QuestionAdmin(admin.ModelAdmin):
-    list_display = ('short_statement', 'difficulty', 'response_format')
+    list_display = ('short_statement', 'difficulty', 'estimated_difficulty', 'response_format')
     list_filter = ('difficulty', 'response_format')
     search_fields = ('statement',)
+    readonly_fields = ('estimated_difficulty', 'difficulty_standard_error', 'calibrated_at')
     filter_horizontal = ('skills',)
 
     formfield_overrides = {
@@ -54,6 +59,13 @@ class ChoiceAdmin(admin.ModelAdmin):
         return strip_tags(obj.text)
     clean_choice_text.short_description = "Alternativa"
 
+@admin.register(IndexedAnswer)
+class IndexedAnswerAdmin(admin.ModelAdmin):
+    list_display = ('question', 'normalized_answer', 'is_correct', 'updated_at')
+    list_filter = ('is_correct',)
+    search_fields = ('normalized_answer', 'question__statement')
+    readonly_fields = ('updated_at',)
+
 @admin.register(Test)
 class TestAdmin(admin.ModelAdmin):
     list_display = ('name', 'maximum_time_display', 'allow_backtracking', 'allow_no_response', 'max_attempts', 'display_points_and_penalties', 'creator')
@@ -61,7 +73,7 @@ class TestAdmin(admin.ModelAdmin):
 
     fieldsets = (
         (None, {
-            'fields': ('name', 'questions', 'maximum_time', 'allow_backtracking', 'allow_no_response', 'max_attempts', 'creator')
+            'fields': ('name', 'questions', 'maximum_time', 'allow_backtracking', 'allow_no_response', 'max_attempts', 'delivery_mode', 'creator')
         }),
         ('Configuración de Puntuación', {
             'fields': ('points_per_difficulty', 'penalty_type', 'fixed_penalty', 'penalty_by_difficulty'),
@@ -73,6 +85,18 @@ class TestAdmin(admin.ModelAdmin):
         models.JSONField: {'widget': Textarea(attrs={'rows': 4, 'cols': 80})},
     }
 
+    actions = ['rescore_attempts']
+
+    def rescore_attempts(self, request, queryset):
+        for test in queryset:
+            result = rescore_test(test)
+            self.message_user(
+                request,
+                f"'{test.name}': {result['attempts']} intentos recalculados en {result['elapsed']:.2f} s "
+                f"({result['attempts_per_second']:.0f} intentos/s)."
+            )
+    rescore_attempts.short_description = "Recalcular puntajes de los intentos"
+
     def maximum_time_display(self, obj):
         total_seconds = obj.maximum_time.total_seconds()
         minutes = int(total_seconds // 60)
@@ -110,32 +134,16 @@ class AnswerAdmin(admin.ModelAdmin):
     )
 
     def save_model(self, request, obj, form, change):
+        answer_key = get_answer_key(obj.attempt.test)
+        key_entry = get_key_entry(answer_key, obj.question)
+        previous_score = obj.question_score or Decimal(0)
+        previous_correct = is_correct_status(form.initial.get('grade_status'), form.initial.get('is_correct_manual'))
+
         if 'is_correct_manual' in form.changed_data:
             obj.grade_status = 'graded'
             obj.graded_by = request.user
             obj.graded_at = now()
-
-            if obj.is_correct_manual:
-                test_points_config = obj.attempt.test.points_per_difficulty
-                
-                if test_points_config and str(obj.question.difficulty) in test_points_config:
-                    obj.manual_grade = Decimal(str(test_points_config[str(obj.question.difficulty)]))
-                else:
-                    obj.manual_grade = Decimal('0.0')
-            else:
-                calculated_penalty = Decimal('0.0')
-                test_penalty_type = obj.attempt.test.penalty_type
-                
-                if test_penalty_type == 'fixed':
-                    calculated_penalty = obj.attempt.test.fixed_penalty if obj.attempt.test.fixed_penalty is not None else Decimal('0.0')
-                elif test_penalty_type == 'by_difficulty':
-                    penalty_config = obj.attempt.test.penalty_by_difficulty
-                    if penalty_config and str(obj.question.difficulty) in penalty_config:
-                        calculated_penalty = Decimal(str(penalty_config[str(obj.question.difficulty)]))
-                    else:
-                        calculated_penalty = Decimal('0.0')
-
-                obj.manual_grade = -calculated_penalty 
+            obj.manual_grade = manual_grade_for(key_entry, obj.is_correct_manual)
 
         elif 'grade_status' in form.changed_data and obj.grade_status != 'graded':
             obj.graded_by = None
@@ -143,7 +151,20 @@ class AnswerAdmin(admin.ModelAdmin):
             obj.manual_grade = None
             obj.is_correct_manual = None
 
-        super().save_model(request, obj, form, change)
+        obj.question_score = answer_score(key_entry, obj.grade_status, obj.manual_grade)
+
+        with updating_rollups([obj.attempt_id]):
+            super().save_model(request, obj, form, change)
+            update_attempt_totals(
+                {obj.attempt_id: (
+                    obj.question_score - previous_score,
+                    is_correct_status(obj.grade_status, obj.is_correct_manual) - previous_correct
+                )},
+                {obj.attempt_id: answer_key.max_score}
+            )
+            normalized = normalized_answer_value(obj.answer_text, obj.answer_number)
+            if 'is_correct_manual' in form.changed_data and obj.is_correct_manual is not None and normalized is not None:
+                record_answer_decisions(obj.question_id, [normalized], obj.is_correct_manual)
 
 
     def has_add_permission(self, request):
@@ -156,7 +177,7 @@ class AnswerAdmin(admin.ModelAdmin):
         return obj.grade_status == 'pending'
 
     def has_delete_permission(self, request, obj=None):
-        return True
+        return False
 
 
 @admin.register(Attempt)
@@ -164,14 +185,14 @@ class AttemptAdmin(admin.ModelAdmin):
     list_display = ('user', 'test', 'date_taken', 'score', 'correct_count')
     list_filter = ('date_taken', 'user', 'test')
     search_fields = ('user__username', 'test__name')
-    readonly_fields = ('user', 'test', 'date_taken', 'end_time', 'score', 'correct_count')
+    readonly_fields = ('user', 'test', 'date_taken', 'end_time', 'score', 'raw_score', 'correct_count')
 
     def has_add_permission(self, request):
         return False
     def has_change_permission(self, request, obj=None):
         return False
     def has_delete_permission(self, request, obj=None):
-        return True
+        return False
 
 @admin.register(TestAssignment)
 class TestAssignmentAdmin(admin.ModelAdmin):
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class TestBebrasConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'test_bebras'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -27,6 +27,12 @@ class AutoTestCreationForm(forms.Form):
         initial=1,
         help_text='Establece el número máximo de veces que un estudiante puede intentar este test. Por defecto es 1.'
     )
+    delivery_mode = forms.ChoiceField(
+        label='Modo de presentación',
+        choices=[('per_question', 'Una pregunta por página'), ('single_page', 'Test completo en una página')],
+        initial='per_question',
+        help_text='El test completo en una página solo se usa si se permite retroceder.'
+    )
 
     points_per_difficulty = forms.CharField(
         label='Puntos por dificultad (JSON, ej: {"1": 10, "2": 20}). Opcional si solo hay una dificultad.',
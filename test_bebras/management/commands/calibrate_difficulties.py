@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from test_bebras.services.calibration_service import calibrate_difficulties
+
+
+class Command(BaseCommand):
+    help = "Estima la dificultad empírica de las preguntas y la habilidad de cada intento con el modelo de Rasch."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cold', action='store_true', help="Ignora las estimaciones guardadas y ajusta desde cero.")
+        parser.add_argument('--max-iterations', type=int, default=200, help="Cantidad máxima de iteraciones del ajuste.")
+        parser.add_argument('--tolerance', type=float, default=1e-4, help="Cambio máximo entre iteraciones para considerar el ajuste convergido.")
+
+    def handle(self, *args, **options):
+        result = calibrate_difficulties(
+            warm_start=not options['cold'],
+            max_iterations=options['max_iterations'],
+            tolerance=options['tolerance'],
+        )
+        message = (
+            f"{result['answers']} respuestas de {result['attempts']} intentos sobre {result['questions']} preguntas "
+            f"calibradas en {result['iterations']} iteraciones ({result['updated_attempts']} habilidades actualizadas) "
+            f"en {result['elapsed']:.2f} s."
+        )
+        if result['converged']:
+            self.stdout.write(self.style.SUCCESS(message))
+        else:
+            self.stdout.write(self.style.WARNING(f"{message} El ajuste no convergió; aumenta --max-iterations."))
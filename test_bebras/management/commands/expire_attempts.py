@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from test_bebras.services.attempt_finalization_service import finalize_expired_attempts
+
+
+class Command(BaseCommand):
+    help = "Finaliza en lote los intentos abiertos cuyo tiempo límite ya venció. Pensado para ejecutarse periódicamente (cron o Heroku Scheduler)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Cantidad de intentos procesados por lote.")
+
+    def handle(self, *args, **options):
+        finalized_count = finalize_expired_attempts(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Se finalizaron {finalized_count} intentos vencidos."))
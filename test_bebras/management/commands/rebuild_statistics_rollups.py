@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from test_bebras.models import Test
+from test_bebras.services.statistics_rollup_service import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Reconstruye desde cero las estadísticas agregadas por test, grupo, habilidad y pregunta."
+
+    def add_arguments(self, parser):
+        parser.add_argument('test_ids', nargs='*', type=int, help="IDs de los tests a reconstruir.")
+        parser.add_argument('--all', action='store_true', help="Reconstruye todos los tests.")
+        parser.add_argument('--chunk-size', type=int, default=500, help="Cantidad de intentos procesados por lote.")
+
+    def handle(self, *args, **options):
+        if options['all']:
+            tests = Test.objects.order_by('id')
+        elif options['test_ids']:
+            tests = Test.objects.filter(id__in=options['test_ids']).order_by('id')
+        else:
+            raise CommandError("Indica al menos un ID de test o usa --all.")
+
+        for test in tests:
+            started = time.perf_counter()
+            attempts = rebuild_rollups([test.id], chunk_size=options['chunk_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f"'{test.name}' (id {test.id}): estadísticas de {attempts} intentos reconstruidas "
+                f"en {time.perf_counter() - started:.2f} s."
+            ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from test_bebras.services.activity_rollup_service import refresh_activity_rollups
+
+
+class Command(BaseCommand):
+    help = "Actualiza la actividad diaria por test y grupo, recalculando solo los días con intentos modificados desde la última ejecución."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Recalcula todos los días desde cero.")
+
+    def handle(self, *args, **options):
+        result = refresh_activity_rollups(full=options['full'])
+        since = f"desde {result['since']:%Y-%m-%d %H:%M}" if result['since'] else "completa"
+        self.stdout.write(self.style.SUCCESS(
+            f"Actualización {since}: {result['buckets']} días recalculados en {result['tests']} tests."
+        ))
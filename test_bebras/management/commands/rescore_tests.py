@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from test_bebras.models import Test
+from test_bebras.services.rescoring_service import rescore_test
+
+
+class Command(BaseCommand):
+    help = "Recalcula los puntajes de todos los intentos de los tests indicados con su configuración de puntuación actual."
+
+    def add_arguments(self, parser):
+        parser.add_argument('test_ids', nargs='*', type=int, help="IDs de los tests a recalcular.")
+        parser.add_argument('--all', action='store_true', help="Recalcula todos los tests.")
+        parser.add_argument('--chunk-size', type=int, default=500, help="Cantidad de intentos procesados por lote.")
+
+    def handle(self, *args, **options):
+        if options['all']:
+            tests = Test.objects.order_by('id')
+        elif options['test_ids']:
+            tests = Test.objects.filter(id__in=options['test_ids']).order_by('id')
+        else:
+            raise CommandError("Indica al menos un ID de test o usa --all.")
+
+        for test in tests:
+            self.stdout.write(f"Recalculando '{test.name}' (id {test.id})...")
+            result = rescore_test(test, chunk_size=options['chunk_size'], progress_callback=self._report_progress)
+            self.stdout.write(self.style.SUCCESS(
+                f"{result['attempts']} intentos y {result['answers']} respuestas recalculados "
+                f"({result['updated_answers']} respuestas cambiaron) en {result['elapsed']:.2f} s "
+                f"({result['attempts_per_second']:.0f} intentos/s)."
+            ))
+
+    def _report_progress(self, processed, total, elapsed):
+        rate = processed / elapsed if elapsed > 0 else processed
+        self.stdout.write(f"  {processed}/{total} intentos ({rate:.0f} intentos/s)")
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.7 on 2026-10-18 07:33
+
+from django.db import migrations
+from django.db.models import Count, Max
+
+
+def remove_duplicate_answers(apps, schema_editor):
+    Answer = apps.get_model('test_bebras', 'Answer')
+    duplicates = (
+        Answer.objects.filter(attempt__isnull=False)
+        .values('attempt_id', 'question_id')
+        .annotate(latest_id=Max('id'), total=Count('id'))
+        .filter(total__gt=1)
+    )
+    for duplicate in duplicates:
+        Answer.objects.filter(
+            attempt_id=duplicate['attempt_id'],
+            question_id=duplicate['question_id'],
+        ).exclude(id=duplicate['latest_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('test_bebras', '0012_alter_answer_grade_status_alter_choice_text_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_answers, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='answer',
+            unique_together={('attempt', 'question')},
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 07:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('test_bebras', '0013_answer_unique_attempt_question'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='test',
+            name='delivery_mode',
+            field=models.CharField(choices=[('per_question', 'One question per page'), ('single_page', 'Whole test on one page')], default='per_question', help_text='Whole-test delivery is only used when backtracking is allowed.', max_length=20),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.7 on 2026-10-18 07:35
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def populate_attempt_deadlines(apps, schema_editor):
+    Attempt = apps.get_model('test_bebras', 'Attempt')
+    Test = apps.get_model('test_bebras', 'Test')
+    for test_id, maximum_time in Test.objects.values_list('id', 'maximum_time'):
+        Attempt.objects.filter(test_id=test_id).update(deadline=F('date_taken') + maximum_time)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('test_bebras', '0014_test_delivery_mode'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attempt',
+            name='deadline',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(populate_attempt_deadlines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.7 on 2026-10-18 07:37
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_current_question_index(apps, schema_editor):
+    Attempt = apps.get_model('test_bebras', 'Attempt')
+    Answer = apps.get_model('test_bebras', 'Answer')
+    answered_count = (
+        Answer.objects.filter(attempt_id=OuterRef('pk'))
+        .values('attempt_id')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    Attempt.objects.filter(end_time__isnull=True).update(
+        current_question_index=Coalesce(Subquery(answered_count, output_field=IntegerField()), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('test_bebras', '0015_attempt_deadline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attempt',
+            name='current_question_index',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_current_question_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.7 on 2026-10-18 07:38
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+from django.utils import timezone
+
+
+def close_duplicate_open_attempts(apps, schema_editor):
+    Attempt = apps.get_model('test_bebras', 'Attempt')
+    duplicates = (
+        Attempt.objects.filter(end_time__isnull=True)
+        .values('user_id', 'test_id')
+        .annotate(latest_id=Max('id'), total=Count('id'))
+        .filter(total__gt=1)
+    )
+    for duplicate in duplicates:
+        Attempt.objects.filter(
+            user_id=duplicate['user_id'],
+            test_id=duplicate['test_id'],
+            end_time__isnull=True,
+        ).exclude(id=duplicate['latest_id']).update(end_time=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('test_bebras', '0016_attempt_current_question_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(close_duplicate_open_attempts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='attempt',
+            constraint=models.UniqueConstraint(condition=models.Q(('end_time__isnull', True)), fields=('user', 'test'), name='unique_open_attempt_per_user_test'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 07:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('test_bebras', '0017_attempt_unique_open_attempt'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='content_version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 5.1.7 on 2026-10-18 07:42
+
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.db import migrations, models
+
+
+def _points(test, difficulty):
+    return Decimal(str((test.points_per_difficulty or {}).get(str(difficulty), 0)))
+
+
+def _penalty(test, difficulty):
+    if test.penalty_type == 'fixed':
+        return Decimal(str(test.fixed_penalty or 0))
+    if test.penalty_type == 'by_difficulty':
+        return Decimal(str((test.penalty_by_difficulty or {}).get(str(difficulty), 0)))
+    return Decimal(0)
+
+
+def _grade(answer):
+    question = answer.question
+    if question.response_format == 'choice':
+        return 'correct' if answer.answer_choice and answer.answer_choice.is_correct else 'incorrect'
+    if answer.grade_status == 'graded':
+        return 'graded'
+
+    if question.response_format == 'text':
+        if not answer.answer_text:
+            return 'incorrect'
+        if question.correct_answer and answer.answer_text.strip().lower() == question.correct_answer.strip().lower():
+            return 'correct'
+        return 'pending'
+
+    if answer.answer_number is None:
+        return 'incorrect'
+    try:
+        if question.correct_answer and Decimal(str(answer.answer_number)) == Decimal(question.correct_answer.strip()):
+            return 'correct'
+    except (ValueError, InvalidOperation):
+        pass
+    return 'pending'
+
+
+def populate_scores(apps, schema_editor):
+    Attempt = apps.get_model('test_bebras', 'Attempt')
+    Answer = apps.get_model('test_bebras', 'Answer')
+    Test = apps.get_model('test_bebras', 'Test')
+
+    for test in Test.objects.all():
+        max_score = sum((_points(test, d) for d in test.questions.values_list('difficulty', flat=True)), Decimal(0))
+        totals = defaultdict(lambda: [Decimal(0), 0])
+        answers = []
+        for answer in Answer.objects.filter(attempt__test=test).select_related('question', 'answer_choice'):
+            status = _grade(answer)
+            difficulty = answer.question.difficulty
+            if status == 'correct':
+                score = _points(test, difficulty)
+            elif status == 'incorrect':
+                score = -_penalty(test, difficulty)
+            elif status == 'graded':
+                score = answer.manual_grade if answer.manual_grade is not None else Decimal('0.0')
+            else:
+                score = Decimal(0)
+            answer.grade_status = status
+            answer.question_score = score
+            answers.append(answer)
+            totals[answer.attempt_id][0] += score
+            if status == 'correct' or (status == 'graded' and answer.is_correct_manual):
+                totals[answer.attempt_id][1] += 1
+        Answer.objects.bulk_update(answers, ['grade_status', 'question_score'], batch_size=500)
+
+        attempts = list(Attempt.objects.filter(test=test))
+        for attempt in attempts:
+            raw_score, correct_count = totals[attempt.id]
+            attempt.raw_score = raw_score
+            attempt.correct_count = correct_count
+            if max_score > 0:
+                attempt.score = max(Decimal(0), min(Decimal(100), raw_score / max_score * Decimal(100)))
+            else:
+                attempt.score = Decimal(0)
+        Attempt.objects.bulk_update(attempts, ['raw_score', 'correct_count', 'score'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('test_bebras', '0018_question_content_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attempt',
+            name='raw_score',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=7),
+        ),
+        migrations.RunPython(populate_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.1.7 on 2026-10-18 07:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_indexed_answers(apps, schema_editor):
+    Answer = apps.get_model('test_bebras', 'Answer')
+    IndexedAnswer = apps.get_model('test_bebras', 'IndexedAnswer')
+    decisions = {}
+    graded_answers = Answer.objects.filter(
+        grade_status='graded',
+        is_correct_manual__isnull=False,
+        question__response_format__in=['text', 'number'],
+    ).order_by('graded_at', 'id').values_list('question_id', 'answer_text', 'answer_number', 'is_correct_manual')
+    for question_id, answer_text, answer_number, is_correct in graded_answers:
+        value = answer_text if answer_number is None else answer_number
+        if value is None or str(value).strip() == '':
+            continue
+        decisions[(question_id, str(value).strip().lower())] = is_correct
+
+    IndexedAnswer.objects.bulk_create(
+        [
+            IndexedAnswer(question_id=question_id, normalized_answer=normalized_answer, is_correct=is_correct)
+            for (question_id, normalized_answer), is_correct in decisions.items()
+        ],
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('test_bebras', '0019_attempt_raw_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndexedAnswer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('normalized_answer', models.TextField()),
+                ('is_correct', models.BooleanField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='indexed_answers', to='test_bebras.question')),
+            ],
+            options={
+                'unique_together': {('question', 'normalized_answer')},
+            },
+        ),
+        migrations.RunPython(populate_indexed_answers, migrations.RunPython.noop),
+    ]
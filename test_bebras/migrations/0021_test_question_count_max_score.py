@@ -0,0 +1,39 @@
+# Generated by Django 5.1.7 on 2026-10-18 07:58
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def populate_test_totals(apps, schema_editor):
+    Test = apps.get_model('test_bebras', 'Test')
+    tests = list(Test.objects.all())
+    for test in tests:
+        points_per_difficulty = test.points_per_difficulty or {}
+        difficulties = list(test.questions.values_list('difficulty', flat=True))
+        test.question_count = len(difficulties)
+        test.max_score = sum(
+            (Decimal(str(points_per_difficulty.get(str(d), 0))) for d in difficulties), Decimal(0)
+        ).quantize(Decimal('0.01'))
+    Test.objects.bulk_update(tests, ['question_count', 'max_score'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('test_bebras', '0020_indexedanswer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='test',
+            name='max_score',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=7),
+        ),
+        migrations.AddField(
+            model_name='test',
+            name='question_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_test_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,146 @@
+# Generated by Django 5.1.7 on 2026-10-18 08:04
+
+from collections import defaultdict
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+COUNTER_FIELDS = ('answered', 'correct', 'incorrect', 'unanswered', 'score_sum')
+
+
+def _answer_outcome(answer_text, answer_number, answer_choice_id, grade_status, is_correct_manual):
+    if answer_choice_id is None and answer_number is None and not answer_text:
+        return 'unanswered'
+    if grade_status == 'correct' or (grade_status == 'graded' and is_correct_manual):
+        return 'correct'
+    if grade_status == 'pending':
+        return 'pending'
+    return 'incorrect'
+
+
+def populate_rollups(apps, schema_editor):
+    Answer = apps.get_model('test_bebras', 'Answer')
+    Attempt = apps.get_model('test_bebras', 'Attempt')
+    Question = apps.get_model('test_bebras', 'Question')
+    Test = apps.get_model('test_bebras', 'Test')
+    TestAssignment = apps.get_model('test_bebras', 'TestAssignment')
+    rollup_models = {
+        'question_id': apps.get_model('test_bebras', 'TestQuestionRollup'),
+        'skill_id': apps.get_model('test_bebras', 'TestSkillRollup'),
+        'group_id': apps.get_model('test_bebras', 'TestGroupRollup'),
+    }
+
+    question_ids_by_test = defaultdict(list)
+    for test_id, question_id in Test.questions.through.objects.values_list('test_id', 'question_id'):
+        question_ids_by_test[test_id].append(question_id)
+    skill_ids_by_question = defaultdict(list)
+    for question_id, skill_id in Question.skills.through.objects.values_list('question_id', 'skill_id'):
+        skill_ids_by_question[question_id].append(skill_id)
+    group_ids_by_test_user = defaultdict(set)
+    for test_id, group_id, user_id in TestAssignment.objects.filter(group__user__isnull=False).values_list(
+        'test_id', 'group_id', 'group__user'
+    ):
+        group_ids_by_test_user[(test_id, user_id)].add(group_id)
+
+    totals = {key_field: defaultdict(lambda: defaultdict(int)) for key_field in rollup_models}
+    attempts = list(Attempt.objects.filter(end_time__isnull=False).order_by('id').values_list('id', 'test_id', 'user_id', 'score'))
+    for start in range(0, len(attempts), 500):
+        chunk = attempts[start:start + 500]
+        answers = {
+            (row[0], row[1]): (_answer_outcome(*row[2:7]), row[7])
+            for row in Answer.objects.filter(attempt_id__in=[attempt[0] for attempt in chunk]).values_list(
+                'attempt_id', 'question_id', 'answer_text', 'answer_number', 'answer_choice_id',
+                'grade_status', 'is_correct_manual', 'question_score'
+            )
+        }
+        for attempt_id, test_id, user_id, score in chunk:
+            group_ids = group_ids_by_test_user[(test_id, user_id)]
+            for group_id in group_ids:
+                totals['group_id'][(test_id, group_id)]['attempts'] += 1
+                totals['group_id'][(test_id, group_id)]['percentage_sum'] += score
+            for question_id in question_ids_by_test[test_id]:
+                outcome, question_score = answers.get((attempt_id, question_id), ('unanswered', None))
+                answered = outcome != 'unanswered'
+                correct = outcome == 'correct'
+                counters = {
+                    'answered': int(answered),
+                    'correct': int(correct),
+                    'incorrect': int(answered and not correct),
+                    'unanswered': int(not answered),
+                    'score_sum': question_score if question_score is not None else Decimal(0),
+                }
+                keys = [('question_id', question_id)]
+                keys += [('skill_id', skill_id) for skill_id in skill_ids_by_question[question_id]]
+                keys += [('group_id', group_id) for group_id in group_ids]
+                for key_field, key_id in keys:
+                    for field in COUNTER_FIELDS:
+                        totals[key_field][(test_id, key_id)][field] += counters[field]
+
+    for key_field, model in rollup_models.items():
+        model.objects.bulk_create([
+            model(test_id=test_id, **{key_field: key_id}, **counters)
+            for (test_id, key_id), counters in totals[key_field].items()
+        ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('test_bebras', '0021_test_question_count_max_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TestGroupRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('answered', models.IntegerField(default=0)),
+                ('correct', models.IntegerField(default=0)),
+                ('incorrect', models.IntegerField(default=0)),
+                ('unanswered', models.IntegerField(default=0)),
+                ('score_sum', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('attempts', models.IntegerField(default=0)),
+                ('percentage_sum', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='test_rollups', to='auth.group')),
+                ('test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='group_rollups', to='test_bebras.test')),
+            ],
+            options={
+                'unique_together': {('test', 'group')},
+            },
+        ),
+        migrations.CreateModel(
+            name='TestQuestionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('answered', models.IntegerField(default=0)),
+                ('correct', models.IntegerField(default=0)),
+                ('incorrect', models.IntegerField(default=0)),
+                ('unanswered', models.IntegerField(default=0)),
+                ('score_sum', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='test_rollups', to='test_bebras.question')),
+                ('test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='question_rollups', to='test_bebras.test')),
+            ],
+            options={
+                'unique_together': {('test', 'question')},
+            },
+        ),
+        migrations.CreateModel(
+            name='TestSkillRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('answered', models.IntegerField(default=0)),
+                ('correct', models.IntegerField(default=0)),
+                ('incorrect', models.IntegerField(default=0)),
+                ('unanswered', models.IntegerField(default=0)),
+                ('score_sum', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('skill', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='test_rollups', to='test_bebras.skill')),
+                ('test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='skill_rollups', to='test_bebras.test')),
+            ],
+            options={
+                'unique_together': {('test', 'skill')},
+            },
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
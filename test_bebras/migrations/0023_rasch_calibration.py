@@ -0,0 +1,33 @@
+# Generated by Django 5.1.7 on 2026-10-18 08:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('test_bebras', '0022_statistics_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attempt',
+            name='ability_estimate',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='calibrated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='difficulty_standard_error',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='estimated_difficulty',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+    ]
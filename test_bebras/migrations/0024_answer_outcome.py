@@ -0,0 +1,41 @@
+# Generated by Django 5.1.7 on 2026-10-18 08:20
+
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def populate_answer_outcomes(apps, schema_editor):
+    Answer = apps.get_model('test_bebras', 'Answer')
+    has_response = (
+        Q(answer_choice__isnull=False)
+        | Q(answer_number__isnull=False)
+        | (Q(answer_text__isnull=False) & ~Q(answer_text=''))
+    )
+    answered = Answer.objects.filter(has_response)
+    answered.update(outcome='incorrect')
+    answered.filter(Q(grade_status='correct') | Q(grade_status='graded', is_correct_manual=True)).update(outcome='correct')
+    answered.filter(grade_status='pending').update(outcome='pending')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('test_bebras', '0023_rasch_calibration'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='answer',
+            name='outcome',
+            field=models.CharField(choices=[('correct', 'Correcta'), ('incorrect', 'Incorrecta'), ('unanswered', 'Sin respuesta'), ('pending', 'Pendiente de Revisión')], default='unanswered', editable=False, max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='answer',
+            index=models.Index(fields=['attempt', 'outcome'], name='answer_attempt_outcome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='answer',
+            index=models.Index(fields=['question', 'outcome'], name='answer_question_outcome_idx'),
+        ),
+        migrations.RunPython(populate_answer_outcomes, migrations.RunPython.noop),
+    ]
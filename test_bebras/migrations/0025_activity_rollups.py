@@ -0,0 +1,66 @@
+# Generated by Django 5.1.7 on 2026-10-18 08:23
+
+from collections import defaultdict
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def populate_activity_rollups(apps, schema_editor):
+    Attempt = apps.get_model('test_bebras', 'Attempt')
+    DailyActivityRollup = apps.get_model('test_bebras', 'DailyActivityRollup')
+
+    def bucket_rows(date_field, **counters):
+        return Attempt.objects.filter(
+            **{f'{date_field}__isnull': False}, user__groups__testassignment__test=F('test')
+        ).annotate(day=TruncDate(date_field)).values('test_id', 'day', group=F('user__groups')).annotate(**counters).order_by()
+
+    buckets = defaultdict(lambda: {'started': 0, 'finished': 0, 'score_sum': Decimal(0)})
+    for row in bucket_rows('date_taken', started=Count('id')):
+        buckets[(row['test_id'], row['group'], row['day'])]['started'] = row['started']
+    for row in bucket_rows('end_time', finished=Count('id'), score_sum=Sum('score')):
+        buckets[(row['test_id'], row['group'], row['day'])].update(finished=row['finished'], score_sum=row['score_sum'])
+
+    refreshed_at = timezone.now()
+    DailyActivityRollup.objects.bulk_create([
+        DailyActivityRollup(test_id=test_id, group_id=group_id, day=day, refreshed_at=refreshed_at, **counters)
+        for (test_id, group_id, day), counters in buckets.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('test_bebras', '0024_answer_outcome'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attempt',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.CreateModel(
+            name='DailyActivityRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('started', models.IntegerField(default=0)),
+                ('finished', models.IntegerField(default=0)),
+                ('score_sum', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('refreshed_at', models.DateTimeField()),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity_rollups', to='auth.group')),
+                ('test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity_rollups', to='test_bebras.test')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['group', 'day'], name='activity_group_day_idx')],
+                'unique_together': {('test', 'group', 'day')},
+            },
+        ),
+        migrations.RunPython(populate_activity_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.7 on 2026-10-18 08:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('test_bebras', '0025_activity_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='test',
+            name='answer_key_version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name='test',
+            name='statistics_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.1.7 on 2026-10-18 08:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def populate_test_rollups(apps, schema_editor):
+    Attempt = apps.get_model('test_bebras', 'Attempt')
+    TestQuestionRollup = apps.get_model('test_bebras', 'TestQuestionRollup')
+    TestRollup = apps.get_model('test_bebras', 'TestRollup')
+    counter_fields = ('answered', 'correct', 'incorrect', 'unanswered', 'score_sum')
+
+    attempt_totals = {
+        row['test_id']: row for row in Attempt.objects.filter(end_time__isnull=False).values('test_id').annotate(
+            attempts=Count('id'), percentage_sum=Sum('score')
+        ).order_by()
+    }
+    question_totals = {
+        row['test_id']: row for row in TestQuestionRollup.objects.values('test_id').annotate(
+            **{f'total_{field}': Sum(field) for field in counter_fields}
+        ).order_by()
+    }
+    TestRollup.objects.bulk_create([
+        TestRollup(
+            test_id=test_id,
+            attempts=attempt_totals.get(test_id, {}).get('attempts') or 0,
+            percentage_sum=attempt_totals.get(test_id, {}).get('percentage_sum') or 0,
+            **{field: question_totals.get(test_id, {}).get(f'total_{field}') or 0 for field in counter_fields}
+        )
+        for test_id in attempt_totals.keys() | question_totals.keys()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('test_bebras', '0026_test_versions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TestRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('answered', models.IntegerField(default=0)),
+                ('correct', models.IntegerField(default=0)),
+                ('incorrect', models.IntegerField(default=0)),
+                ('unanswered', models.IntegerField(default=0)),
+                ('score_sum', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('attempts', models.IntegerField(default=0)),
+                ('percentage_sum', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('test', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='rollup', to='test_bebras.test')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.RunPython(populate_test_rollups, migrations.RunPython.noop),
+    ]
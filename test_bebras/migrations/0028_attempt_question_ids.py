@@ -0,0 +1,33 @@
+# Generated by Django 5.1.7 on 2026-10-18 09:05
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def populate_question_ids(apps, schema_editor):
+    Attempt = apps.get_model('test_bebras', 'Attempt')
+    Test = apps.get_model('test_bebras', 'Test')
+    question_ids_by_test = defaultdict(list)
+    memberships = Test.questions.through.objects.order_by('question_id').values_list('test_id', 'question_id')
+    for test_id, question_id in memberships:
+        question_ids_by_test[test_id].append(question_id)
+    open_test_ids = Attempt.objects.filter(end_time__isnull=True).values_list('test_id', flat=True).distinct()
+    for test_id in open_test_ids:
+        Attempt.objects.filter(test_id=test_id, end_time__isnull=True).update(question_ids=question_ids_by_test[test_id])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('test_bebras', '0027_test_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attempt',
+            name='question_ids',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.RunPython(populate_question_ids, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,8 @@
+from datetime import timedelta
+
 from django.db import models
 from django.contrib.auth.models import User, Group
+from django.utils import timezone
 from ckeditor.fields import RichTextField
 from ckeditor_uploader.fields import RichTextUploadingField
 from django.db.models import JSONField
@@ -23,10 +26,23 @@ class Question(models.Model):
     ]
     response_format = models.CharField(max_length=20, choices=RESPONSE_FORMAT)
     correct_answer = models.TextField(null=True, blank=True)
+    content_version = models.PositiveIntegerField(default=1, editable=False)
+    estimated_difficulty = models.FloatField(null=True, blank=True, editable=False)
+    difficulty_standard_error = models.FloatField(null=True, blank=True, editable=False)
+    calibrated_at = models.DateTimeField(null=True, blank=True, editable=False)
     
     def __str__(self):
         return self.statement[:50]
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        bump_version = not self._state.adding and (update_fields is None or 'content_version' in update_fields)
+        if bump_version:
+            self.content_version = models.F('content_version') + 1
+        super().save(*args, **kwargs)
+        if bump_version:
+            self.refresh_from_db(fields=['content_version'])
+
 class Choice(models.Model):
     question = models.ForeignKey(Question, related_name='choices', on_delete=models.CASCADE)
     text = RichTextUploadingField()
@@ -44,6 +60,12 @@ class Test(models.Model):
     allow_backtracking = models.BooleanField(default=True)
     allow_no_response = models.BooleanField(default=True)
     max_attempts = models.IntegerField(default=1, help_text="Maximum number of attempts allowed for this test per student.")
+    delivery_mode = models.CharField(
+        max_length=20,
+        choices=[('per_question', 'One question per page'), ('single_page', 'Whole test on one page')],
+        default='per_question',
+        help_text="Whole-test delivery is only used when backtracking is allowed."
+    )
 
     # Configuraciones de puntuación y penalización
     points_per_difficulty = JSONField(default=dict)
@@ -55,12 +77,28 @@ class Test(models.Model):
     fixed_penalty = models.DecimalField(max_digits=5, decimal_places=2, blank=True, null=True)
     penalty_by_difficulty = JSONField(default=dict, blank=True, null=True)
 
+    question_count = models.PositiveIntegerField(default=0, editable=False)
+    max_score = models.DecimalField(max_digits=7, decimal_places=2, default=0, editable=False)
+    answer_key_version = models.PositiveIntegerField(default=1, editable=False)
+    statistics_version = models.PositiveIntegerField(default=0, editable=False)
+
     creator = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='created_tests')
     assigned_groups = models.ManyToManyField(Group, through='TestAssignment', related_name='assigned_tests', blank=True)
     
     def __str__(self):
         return self.name
 
+    VERSION_FIELDS = ('answer_key_version', 'statistics_version')
+
+    def save(self, *args, **kwargs):
+        # The version counters only move through F() updates, so a stale instance never writes them back.
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.VERSION_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 class Answer(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
@@ -86,26 +124,101 @@ class Answer(models.Model):
     is_correct_manual = models.BooleanField(null=True, blank=True)
     question_score = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
 
+    OUTCOME_CHOICES = [
+        ('correct', 'Correcta'),
+        ('incorrect', 'Incorrecta'),
+        ('unanswered', 'Sin respuesta'),
+        ('pending', 'Pendiente de Revisión'),
+    ]
+    outcome = models.CharField(max_length=20, choices=OUTCOME_CHOICES, default='unanswered', editable=False)
+
+    class Meta:
+        unique_together = ('attempt', 'question')
+        indexes = [
+            models.Index(fields=['attempt', 'outcome'], name='answer_attempt_outcome_idx'),
+            models.Index(fields=['question', 'outcome'], name='answer_question_outcome_idx'),
+        ]
 
     def __str__(self):
         return f"Respuesta de {self.user} a {self.question}"
+
+    def has_response(self):
+        return self.answer_choice_id is not None or self.answer_number is not None or bool(self.answer_text)
+
+    def refresh_outcome(self):
+        if not self.has_response():
+            self.outcome = 'unanswered'
+        elif self.grade_status == 'pending':
+            self.outcome = 'pending'
+        elif self.grade_status == 'correct' or (self.grade_status == 'graded' and self.is_correct_manual):
+            self.outcome = 'correct'
+        else:
+            self.outcome = 'incorrect'
+        return self.outcome
     
     def save(self, *args, **kwargs):
-        if self.question.response_format == 'text' and self.grade_status == 'not_applicable':
+        if self.grade_status == 'not_applicable' and self.question.response_format == 'text':
             self.grade_status = 'pending'
+        self.refresh_outcome()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'outcome'}
         super().save(*args, **kwargs)
 
+class IndexedAnswer(models.Model):
+    question = models.ForeignKey(Question, related_name='indexed_answers', on_delete=models.CASCADE)
+    normalized_answer = models.TextField()
+    is_correct = models.BooleanField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('question', 'normalized_answer')
+
+    def __str__(self):
+        return f"{self.normalized_answer} ({'aceptada' if self.is_correct else 'rechazada'})"
+
 class Attempt(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     test = models.ForeignKey(Test, on_delete=models.CASCADE)
     date_taken = models.DateTimeField(auto_now_add=True)
     score = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    raw_score = models.DecimalField(max_digits=7, decimal_places=2, default=0)
     correct_count = models.IntegerField(default=0)
     end_time = models.DateTimeField(null=True, blank=True)
+    deadline = models.DateTimeField(null=True, blank=True, db_index=True)
+    current_question_index = models.PositiveIntegerField(default=0)
+    question_ids = models.JSONField(default=list, blank=True, editable=False)
+    ability_estimate = models.FloatField(null=True, blank=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    DEADLINE_GRACE_PERIOD = timedelta(seconds=30)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'test'],
+                condition=models.Q(end_time__isnull=True),
+                name='unique_open_attempt_per_user_test'
+            ),
+        ]
 
     def __str__(self):
         return f"Intento {self.id} de {self.user.username} para {self.test.name}"
 
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.deadline is None:
+            self.deadline = timezone.now() + self.test.maximum_time
+        if self._state.adding and not self.question_ids:
+            self.question_ids = list(self.test.questions.order_by('id').values_list('id', flat=True))
+        super().save(*args, **kwargs)
+
+    def seconds_remaining(self):
+        if self.deadline is None:
+            return int(self.test.maximum_time.total_seconds())
+        return max(0, int((self.deadline - timezone.now()).total_seconds()))
+
+    def is_expired(self):
+        return self.deadline is not None and timezone.now() > self.deadline + self.DEADLINE_GRACE_PERIOD
+
 class TestAssignment(models.Model):
     test = models.ForeignKey(Test, on_delete=models.CASCADE)
     group = models.ForeignKey(Group, on_delete=models.CASCADE)
@@ -123,4 +236,56 @@ class GroupMetadata(models.Model):
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='created_groups')
 
     def __str__(self):
-        return f"Metadata para el grupo: {self.group.name}"
\ No newline at end of file
+        return f"Metadata para el grupo: {self.group.name}"
+
+
+class StatisticsRollup(models.Model):
+    answered = models.IntegerField(default=0)
+    correct = models.IntegerField(default=0)
+    incorrect = models.IntegerField(default=0)
+    unanswered = models.IntegerField(default=0)
+    score_sum = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        abstract = True
+
+class TestRollup(StatisticsRollup):
+    test = models.OneToOneField(Test, on_delete=models.CASCADE, related_name='rollup')
+    attempts = models.IntegerField(default=0)
+    percentage_sum = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+class TestGroupRollup(StatisticsRollup):
+    test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='group_rollups')
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name='test_rollups')
+    attempts = models.IntegerField(default=0)
+    percentage_sum = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('test', 'group')
+
+class TestSkillRollup(StatisticsRollup):
+    test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='skill_rollups')
+    skill = models.ForeignKey(Skill, on_delete=models.CASCADE, related_name='test_rollups')
+
+    class Meta:
+        unique_together = ('test', 'skill')
+
+class TestQuestionRollup(StatisticsRollup):
+    test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='question_rollups')
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='test_rollups')
+
+    class Meta:
+        unique_together = ('test', 'question')
+
+class DailyActivityRollup(models.Model):
+    day = models.DateField()
+    test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='activity_rollups')
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name='activity_rollups')
+    started = models.IntegerField(default=0)
+    finished = models.IntegerField(default=0)
+    score_sum = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('test', 'group', 'day')
+        indexes = [models.Index(fields=['group', 'day'], name='activity_group_day_idx')]
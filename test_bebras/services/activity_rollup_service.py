@@ -0,0 +1,99 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from ..models import Attempt, DailyActivityRollup, TestAssignment
+from .statistics_rollup_service import invalidate_statistics
+
+REFRESH_OVERLAP = timedelta(minutes=5)
+
+
+def last_refreshed_at():
+    return DailyActivityRollup.objects.aggregate(last=Max('refreshed_at'))['last']
+
+
+def changed_buckets(since=None):
+    attempts = Attempt.objects.all()
+    if since is not None:
+        attempts = attempts.filter(updated_at__gte=since)
+    days_by_test = defaultdict(set)
+    rows = attempts.annotate(
+        started_day=TruncDate('date_taken'), finished_day=TruncDate('end_time')
+    ).values_list('test_id', 'started_day', 'finished_day').distinct().order_by()
+    for test_id, started_day, finished_day in rows:
+        days_by_test[test_id].add(started_day)
+        if finished_day is not None:
+            days_by_test[test_id].add(finished_day)
+    return days_by_test
+
+
+def _day_bounds(days):
+    start = timezone.make_aware(datetime.combine(min(days), time.min))
+    end = timezone.make_aware(datetime.combine(max(days) + timedelta(days=1), time.min))
+    return start, end
+
+
+def _bucket_rows(test_id, days, date_field, **counters):
+    start, end = _day_bounds(days)
+    rows = Attempt.objects.filter(
+        test_id=test_id, **{f'{date_field}__gte': start, f'{date_field}__lt': end},
+        user__groups__testassignment__test=F('test')
+    ).annotate(day=TruncDate(date_field)).values('day', group=F('user__groups')).annotate(**counters).order_by()
+    return [row for row in rows if row['day'] in days]
+
+
+def refresh_activity_buckets(days_by_test):
+    refreshed_at = timezone.now()
+    refreshed_buckets = 0
+    for test_id, days in days_by_test.items():
+        buckets = defaultdict(lambda: {'started': 0, 'finished': 0, 'score_sum': Decimal(0)})
+        for row in _bucket_rows(test_id, days, 'date_taken', started=Count('id')):
+            buckets[(row['day'], row['group'])]['started'] = row['started']
+        for row in _bucket_rows(test_id, days, 'end_time', finished=Count('id'), score_sum=Sum('score')):
+            buckets[(row['day'], row['group'])].update(finished=row['finished'], score_sum=row['score_sum'])
+
+        with transaction.atomic():
+            DailyActivityRollup.objects.filter(test_id=test_id, day__in=sorted(days)).delete()
+            DailyActivityRollup.objects.bulk_create([
+                DailyActivityRollup(test_id=test_id, group_id=group_id, day=day, refreshed_at=refreshed_at, **counters)
+                for (day, group_id), counters in buckets.items()
+            ], batch_size=500)
+        refreshed_buckets += len(days)
+    invalidate_statistics(days_by_test)
+    return refreshed_buckets
+
+
+def refresh_activity_rollups(full=False):
+    since = None if full else last_refreshed_at()
+    if since is not None:
+        since -= REFRESH_OVERLAP
+    else:
+        DailyActivityRollup.objects.all().delete()
+    days_by_test = changed_buckets(since)
+    return {
+        'since': since,
+        'tests': len(days_by_test),
+        'buckets': refresh_activity_buckets(days_by_test),
+    }
+
+
+def remove_from_activity_rollups(attempt):
+    group_ids = list(TestAssignment.objects.filter(
+        test_id=attempt.test_id, group__user=attempt.user_id
+    ).values_list('group_id', flat=True))
+    if not group_ids:
+        return
+    rollups = DailyActivityRollup.objects.filter(test_id=attempt.test_id, group_id__in=group_ids)
+    rollups.filter(
+        day=timezone.localdate(attempt.date_taken), refreshed_at__gte=attempt.date_taken
+    ).update(started=F('started') - 1)
+    if attempt.end_time is not None:
+        rollups.filter(
+            day=timezone.localdate(attempt.end_time), refreshed_at__gte=attempt.updated_at
+        ).update(finished=F('finished') - 1, score_sum=F('score_sum') - attempt.score)
+    invalidate_statistics([attempt.test_id])
@@ -0,0 +1,128 @@
+from collections import defaultdict, namedtuple
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import F
+
+from ..models import Choice, IndexedAnswer, Question, Test
+from .scoring_service import ScoringPolicy
+
+ANSWER_KEY_CACHE_TIMEOUT = 60 * 60 * 24
+
+AnswerKeyEntry = namedtuple('AnswerKeyEntry', [
+    'question_id', 'response_format', 'difficulty', 'points', 'penalty',
+    'correct_choice_ids', 'correct_choice_text', 'correct_answer', 'accepted_answers', 'rejected_answers',
+])
+AnswerKey = namedtuple('AnswerKey', ['test_id', 'entries', 'max_score'])
+
+
+def _answer_key_cache_key(test_id, version):
+    return f'answer_key_{test_id}_{version}'
+
+
+def build_answer_key(test):
+    policy = ScoringPolicy(test)
+    questions = list(
+        Question.objects.filter(tests_assigned=test.id)
+        .order_by('id')
+        .values_list('id', 'response_format', 'difficulty', 'correct_answer')
+    )
+    correct_choices = defaultdict(list)
+    choice_rows = Choice.objects.filter(
+        question_id__in=[question_id for question_id, _, _, _ in questions], is_correct=True
+    ).order_by('id').values_list('question_id', 'id', 'text')
+    for question_id, choice_id, text in choice_rows:
+        correct_choices[question_id].append((choice_id, text))
+
+    indexed_answers = defaultdict(lambda: (set(), set()))
+    index_rows = IndexedAnswer.objects.filter(
+        question_id__in=[question_id for question_id, _, _, _ in questions]
+    ).values_list('question_id', 'normalized_answer', 'is_correct')
+    for question_id, normalized_answer, is_correct in index_rows:
+        indexed_answers[question_id][0 if is_correct else 1].add(normalized_answer)
+
+    entries = {}
+    for question_id, response_format, difficulty, correct_answer in questions:
+        choices = correct_choices.get(question_id, [])
+        accepted_answers, rejected_answers = indexed_answers.get(question_id, (set(), set()))
+        entries[question_id] = AnswerKeyEntry(
+            question_id=question_id,
+            response_format=response_format,
+            difficulty=difficulty,
+            points=policy.points(difficulty),
+            penalty=policy.penalty(difficulty),
+            correct_choice_ids=frozenset(choice_id for choice_id, _ in choices),
+            correct_choice_text=choices[0][1] if choices else None,
+            correct_answer=correct_answer,
+            accepted_answers=frozenset(accepted_answers),
+            rejected_answers=frozenset(rejected_answers),
+        )
+
+    answer_key = AnswerKey(
+        test_id=test.id,
+        entries=entries,
+        max_score=sum((entry.points for entry in entries.values()), Decimal(0)),
+    )
+    cache.set(_answer_key_cache_key(test.id, test.answer_key_version), answer_key, ANSWER_KEY_CACHE_TIMEOUT)
+    return answer_key
+
+
+def get_answer_key(test):
+    answer_key = cache.get(_answer_key_cache_key(test.id, test.answer_key_version))
+    if answer_key is None:
+        answer_key = build_answer_key(test)
+    return answer_key
+
+
+def get_answer_keys(test_ids):
+    versions = Test.objects.filter(id__in=test_ids).values_list('id', 'answer_key_version')
+    cached = cache.get_many([_answer_key_cache_key(test_id, version) for test_id, version in versions])
+    answer_keys = {answer_key.test_id: answer_key for answer_key in cached.values()}
+    missing_ids = [test_id for test_id in test_ids if test_id not in answer_keys]
+    for test in Test.objects.filter(id__in=missing_ids):
+        answer_keys[test.id] = build_answer_key(test)
+    return answer_keys
+
+
+def get_key_entry(answer_key, question):
+    entry = answer_key.entries.get(question.id)
+    if entry is None:
+        # The question was removed from the test after it was answered.
+        entry = AnswerKeyEntry(
+            question_id=question.id,
+            response_format=question.response_format,
+            difficulty=question.difficulty,
+            points=Decimal(0),
+            penalty=Decimal(0),
+            correct_choice_ids=frozenset(),
+            correct_choice_text=None,
+            correct_answer=None,
+            accepted_answers=frozenset(),
+            rejected_answers=frozenset(),
+        )
+    return entry
+
+
+def record_answer_decisions(question_id, normalized_answers, is_correct):
+    IndexedAnswer.objects.bulk_create(
+        [
+            IndexedAnswer(question_id=question_id, normalized_answer=normalized_answer, is_correct=is_correct)
+            for normalized_answer in set(normalized_answers)
+        ],
+        update_conflicts=True,
+        unique_fields=['question', 'normalized_answer'],
+        update_fields=['is_correct', 'updated_at'],
+    )
+    invalidate_answer_keys_for_questions([question_id])
+
+
+def invalidate_answer_keys(test_ids):
+    Test.objects.filter(id__in=list(test_ids)).update(answer_key_version=F('answer_key_version') + 1)
+
+
+def invalidate_answer_keys_for_questions(question_ids):
+    invalidate_answer_keys(
+        Test.questions.through.objects.filter(question_id__in=question_ids)
+        .values_list('test_id', flat=True)
+        .distinct()
+    )
@@ -0,0 +1,107 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+from django.utils.timezone import now
+
+from ..models import Answer, Attempt
+from .answer_key import get_answer_key, get_answer_keys
+from .scoring_service import answer_score, update_attempt_totals
+from .statistics_rollup_service import updating_rollups
+
+
+def _unanswered_answer(attempt_id, question_id, user_id, question_score):
+    return Answer(
+        attempt_id=attempt_id,
+        question_id=question_id,
+        user_id=user_id,
+        answer_text="",
+        answer_number=None,
+        answer_choice=None,
+        grade_status='incorrect',
+        question_score=question_score,
+        outcome='unanswered'
+    )
+
+
+def _build_missing_answers(attempt_rows):
+    answer_keys = get_answer_keys({test_id for _, test_id, _ in attempt_rows})
+    answered = set(
+        Answer.objects.filter(attempt_id__in=[attempt_id for attempt_id, _, _ in attempt_rows])
+        .values_list('attempt_id', 'question_id')
+    )
+
+    missing_answers = []
+    deltas = {}
+    max_scores = {}
+    for attempt_id, test_id, user_id in attempt_rows:
+        answer_key = answer_keys[test_id]
+        score_delta = Decimal(0)
+        for entry in answer_key.entries.values():
+            if (attempt_id, entry.question_id) not in answered:
+                question_score = answer_score(entry, 'incorrect')
+                missing_answers.append(_unanswered_answer(attempt_id, entry.question_id, user_id, question_score))
+                score_delta += question_score
+        deltas[attempt_id] = (score_delta, 0)
+        max_scores[attempt_id] = answer_key.max_score
+    return missing_answers, deltas, max_scores
+
+
+def finalize_attempt(attempt, questions, end_time=None):
+    end_time = end_time or now()
+    answer_key = get_answer_key(attempt.test)
+    with transaction.atomic():
+        if not Attempt.objects.select_for_update().filter(id=attempt.id, end_time__isnull=True).exists():
+            attempt.refresh_from_db(fields=['end_time'])
+            return attempt
+        answered_question_ids = set(
+            Answer.objects.filter(attempt_id=attempt.id).values_list('question_id', flat=True)
+        )
+        missing_answers = []
+        score_delta = Decimal(0)
+        for question in questions:
+            if question.id in answered_question_ids:
+                continue
+            entry = answer_key.entries.get(question.id)
+            question_score = answer_score(entry, 'incorrect') if entry else Decimal(0)
+            missing_answers.append(_unanswered_answer(attempt.id, question.id, attempt.user_id, question_score))
+            score_delta += question_score
+        with updating_rollups([attempt.id]):
+            Answer.objects.bulk_create(missing_answers, ignore_conflicts=True)
+            update_attempt_totals({attempt.id: (score_delta, 0)}, {attempt.id: answer_key.max_score}, end_time=end_time)
+    attempt.end_time = end_time
+    return attempt
+
+
+def finalize_attempt_batch(attempt_rows):
+    if not attempt_rows:
+        return 0
+
+    with transaction.atomic():
+        locked_ids = set(
+            Attempt.objects.select_for_update()
+            .filter(id__in=[attempt_id for attempt_id, _, _ in attempt_rows], end_time__isnull=True)
+            .values_list('id', flat=True)
+        )
+        attempt_rows = [row for row in attempt_rows if row[0] in locked_ids]
+        if not attempt_rows:
+            return 0
+        missing_answers, deltas, max_scores = _build_missing_answers(attempt_rows)
+        with updating_rollups(deltas.keys()):
+            Answer.objects.bulk_create(missing_answers, ignore_conflicts=True)
+            return update_attempt_totals(deltas, max_scores, end_time=F('deadline'))
+
+
+def finalize_expired_attempts(batch_size=500, reference_time=None):
+    cutoff = (reference_time or now()) - Attempt.DEADLINE_GRACE_PERIOD
+    expired_attempts = Attempt.objects.filter(end_time__isnull=True, deadline__lt=cutoff).order_by('id')
+
+    finalized_count = 0
+    while True:
+        attempt_rows = list(expired_attempts.values_list('id', 'test_id', 'user_id')[:batch_size])
+        if not attempt_rows:
+            break
+        finalized_count += finalize_attempt_batch(attempt_rows)
+        if len(attempt_rows) < batch_size:
+            break
+    return finalized_count
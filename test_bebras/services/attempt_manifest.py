@@ -0,0 +1,52 @@
+from collections import defaultdict, namedtuple
+
+from django.core.cache import cache
+
+from ..models import Choice, Question
+
+MANIFEST_CACHE_TIMEOUT = 60 * 60 * 12
+
+ManifestQuestion = namedtuple('ManifestQuestion', ['id', 'response_format', 'difficulty', 'choice_ids'])
+
+
+def _manifest_cache_key(attempt_id):
+    return f'attempt_manifest_{attempt_id}'
+
+
+def build_attempt_manifest(attempt):
+    if attempt.question_ids:
+        rows = Question.objects.filter(id__in=attempt.question_ids).values_list('id', 'response_format', 'difficulty')
+        rows_by_id = {row[0]: row for row in rows}
+        questions = [rows_by_id[question_id] for question_id in attempt.question_ids if question_id in rows_by_id]
+    else:
+        questions = list(
+            Question.objects.filter(tests_assigned=attempt.test_id)
+            .order_by('id')
+            .values_list('id', 'response_format', 'difficulty')
+        )
+
+    choices_by_question = defaultdict(list)
+    choice_rows = Choice.objects.filter(
+        question_id__in=[question_id for question_id, _, _ in questions]
+    ).order_by('id').values_list('question_id', 'id')
+    for question_id, choice_id in choice_rows:
+        choices_by_question[question_id].append(choice_id)
+
+    manifest = tuple(
+        ManifestQuestion(
+            id=question_id,
+            response_format=response_format,
+            difficulty=difficulty,
+            choice_ids=tuple(choices_by_question[question_id]),
+        )
+        for question_id, response_format, difficulty in questions
+    )
+    cache.set(_manifest_cache_key(attempt.id), manifest, MANIFEST_CACHE_TIMEOUT)
+    return manifest
+
+
+def get_attempt_manifest(attempt):
+    manifest = cache.get(_manifest_cache_key(attempt.id))
+    if manifest is None:
+        manifest = build_attempt_manifest(attempt)
+    return manifest
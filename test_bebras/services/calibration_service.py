@@ -0,0 +1,149 @@
+import time
+from collections import namedtuple
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Case, IntegerField, Value, When
+from django.utils import timezone
+
+from ..models import Answer, Attempt, Question
+from .scoring_service import correct_answer_filter
+
+ABILITY_PRIOR_VARIANCE = 4.0
+DIFFICULTY_PRIOR_VARIANCE = 100.0
+MAX_NEWTON_STEP = 1.0
+STORED_PRECISION = 3
+
+RaschFit = namedtuple('RaschFit', ['abilities', 'difficulties', 'standard_errors', 'iterations', 'converged'])
+
+
+def _sigmoid(values):
+    return 1.0 / (1.0 + np.exp(-values))
+
+
+def _newton_step(gradient, information):
+    return np.clip(gradient / information, -MAX_NEWTON_STEP, MAX_NEWTON_STEP)
+
+
+def fit_rasch(person_index, item_index, responses, abilities, difficulties, max_iterations=200, tolerance=1e-4):
+    person_count, item_count = len(abilities), len(difficulties)
+    abilities = abilities.astype(np.float64)
+    difficulties = difficulties.astype(np.float64)
+    responses = responses.astype(np.float64)
+
+    converged = False
+    for iteration in range(1, max_iterations + 1):
+        probabilities = _sigmoid(abilities[person_index] - difficulties[item_index])
+        residuals = responses - probabilities
+        weights = probabilities * (1.0 - probabilities)
+        ability_step = _newton_step(
+            np.bincount(person_index, residuals, person_count) - abilities / ABILITY_PRIOR_VARIANCE,
+            np.bincount(person_index, weights, person_count) + 1.0 / ABILITY_PRIOR_VARIANCE,
+        )
+        abilities += ability_step
+
+        probabilities = _sigmoid(abilities[person_index] - difficulties[item_index])
+        residuals = responses - probabilities
+        weights = probabilities * (1.0 - probabilities)
+        difficulty_step = _newton_step(
+            -np.bincount(item_index, residuals, item_count) - difficulties / DIFFICULTY_PRIOR_VARIANCE,
+            np.bincount(item_index, weights, item_count) + 1.0 / DIFFICULTY_PRIOR_VARIANCE,
+        )
+        difficulties += difficulty_step
+
+        if max(np.abs(ability_step).max(), np.abs(difficulty_step).max()) < tolerance:
+            converged = True
+            break
+    probabilities = _sigmoid(abilities[person_index] - difficulties[item_index])
+    information = np.bincount(item_index, probabilities * (1.0 - probabilities), item_count)
+    standard_errors = 1.0 / np.sqrt(information + 1.0 / DIFFICULTY_PRIOR_VARIANCE)
+    return RaschFit(abilities, difficulties, standard_errors, iteration, converged)
+
+
+def _response_arrays():
+    rows = np.array(
+        list(
+            Answer.objects.filter(attempt__end_time__isnull=False)
+            .exclude(outcome='pending')
+            .annotate(is_correct=Case(When(correct_answer_filter(), then=Value(1)), default=Value(0), output_field=IntegerField()))
+            .values_list('attempt_id', 'question_id', 'is_correct')
+        ),
+        dtype=np.int64,
+    ).reshape(-1, 3)
+    attempt_ids, person_index = np.unique(rows[:, 0], return_inverse=True)
+    question_ids, item_index = np.unique(rows[:, 1], return_inverse=True)
+    return attempt_ids, question_ids, person_index, item_index, rows[:, 2]
+
+
+def _logit(proportions):
+    proportions = np.clip(proportions, 0.05, 0.95)
+    return np.log(proportions / (1 - proportions))
+
+
+def _starting_values(attempt_ids, question_ids, person_index, item_index, responses, warm_start):
+    item_counts = np.bincount(item_index, minlength=len(question_ids))
+    person_counts = np.bincount(person_index, minlength=len(attempt_ids))
+    difficulties = -_logit(np.bincount(item_index, responses, len(question_ids)) / item_counts)
+    if warm_start:
+        stored_difficulties = dict(
+            Question.objects.filter(id__in=question_ids.tolist(), estimated_difficulty__isnull=False).values_list('id', 'estimated_difficulty')
+        )
+        difficulties = np.array([stored_difficulties.get(question_id, value) for question_id, value in zip(question_ids.tolist(), difficulties)])
+
+    abilities = (
+        _logit(np.bincount(person_index, responses, len(attempt_ids)) / person_counts)
+        + np.bincount(person_index, difficulties[item_index], len(attempt_ids)) / person_counts
+    )
+    if warm_start:
+        stored_abilities = dict(
+            Attempt.objects.filter(id__in=attempt_ids.tolist(), ability_estimate__isnull=False).values_list('id', 'ability_estimate')
+        )
+        abilities = np.array([stored_abilities.get(attempt_id, value) for attempt_id, value in zip(attempt_ids.tolist(), abilities)])
+    return abilities, difficulties
+
+
+def _changed(objects, field, values_by_id):
+    changed = []
+    for obj in objects:
+        value = round(float(values_by_id[obj.id]), STORED_PRECISION)
+        if getattr(obj, field) != value:
+            setattr(obj, field, value)
+            changed.append(obj)
+    return changed
+
+
+def calibrate_difficulties(warm_start=True, max_iterations=200, tolerance=1e-4):
+    started = time.perf_counter()
+    attempt_ids, question_ids, person_index, item_index, responses = _response_arrays()
+    if not len(responses):
+        return {
+            'answers': 0, 'questions': 0, 'attempts': 0, 'updated_attempts': 0,
+            'iterations': 0, 'converged': True, 'elapsed': time.perf_counter() - started,
+        }
+
+    abilities, difficulties = _starting_values(attempt_ids, question_ids, person_index, item_index, responses, warm_start)
+    fit = fit_rasch(person_index, item_index, responses, abilities, difficulties, max_iterations, tolerance)
+
+    calibrated_at = timezone.now()
+    standard_errors = dict(zip(question_ids.tolist(), fit.standard_errors))
+    questions = list(Question.objects.filter(id__in=question_ids.tolist()).only('id', 'estimated_difficulty'))
+    for question in questions:
+        question.difficulty_standard_error = round(float(standard_errors[question.id]), STORED_PRECISION)
+        question.calibrated_at = calibrated_at
+    _changed(questions, 'estimated_difficulty', dict(zip(question_ids.tolist(), fit.difficulties)))
+    attempts = Attempt.objects.filter(id__in=attempt_ids.tolist()).only('id', 'ability_estimate')
+    changed_attempts = _changed(attempts, 'ability_estimate', dict(zip(attempt_ids.tolist(), fit.abilities)))
+
+    with transaction.atomic():
+        Question.objects.bulk_update(questions, ['estimated_difficulty', 'difficulty_standard_error', 'calibrated_at'], batch_size=500)
+        Attempt.objects.bulk_update(changed_attempts, ['ability_estimate'], batch_size=500)
+
+    return {
+        'answers': len(responses),
+        'questions': len(questions),
+        'attempts': len(attempts),
+        'updated_attempts': len(changed_attempts),
+        'iterations': fit.iterations,
+        'converged': fit.converged,
+        'elapsed': time.perf_counter() - started,
+    }
@@ -78,7 +78,7 @@ def generate_attempts_xlsx_report(user, group_id_filter=None, test_id_filter=Non
         attempts_for_assignment = Attempt.objects.filter(
             test=test_assignment.test,
             user__groups=test_assignment.group
-        ).order_by('user__username', 'date_taken')
+        ).select_related('user', 'test').order_by('user__username', 'date_taken')
         
         current_user_id = None
         attempt_counter = 0
@@ -0,0 +1,117 @@
+import csv
+from collections import namedtuple
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db.models import Count, Max, OuterRef, Subquery, Sum
+
+from ..models import Attempt
+
+GRADEBOOK_PAGE_SIZE = 50
+GRADEBOOK_SORTS = ('name', 'average', 'attempts')
+
+GradebookCell = namedtuple('GradebookCell', ['test_id', 'best_score', 'last_score', 'average_score', 'attempt_count', 'last_attempt_id'])
+GradebookRow = namedtuple('GradebookRow', ['student_id', 'username', 'full_name', 'cells', 'attempt_count', 'average_score'])
+Gradebook = namedtuple('Gradebook', ['tests', 'rows'])
+
+
+def gradebook_cells(group, test_ids):
+    latest_attempts = Attempt.objects.filter(
+        user_id=OuterRef('user_id'), test_id=OuterRef('test_id'), end_time__isnull=False
+    ).order_by('-end_time', '-id')
+    rows = Attempt.objects.filter(
+        user__groups=group, test_id__in=test_ids, end_time__isnull=False
+    ).values('user_id', 'test_id').annotate(
+        best_score=Max('score'),
+        score_sum=Sum('score'),
+        attempt_count=Count('id'),
+        last_score=Subquery(latest_attempts.values('score')[:1]),
+        last_attempt_id=Subquery(latest_attempts.values('id')[:1]),
+    ).order_by()
+    return {
+        (row['user_id'], row['test_id']): (
+            row['best_score'], row['last_score'], row['score_sum'], row['attempt_count'], row['last_attempt_id']
+        )
+        for row in rows
+    }
+
+
+def _sort_value(sort, tests):
+    if sort == 'average':
+        return lambda row: row.average_score
+    if sort == 'attempts':
+        return lambda row: row.attempt_count
+    if sort.startswith('test_'):
+        column = next(index for index, test in enumerate(tests) if f'test_{test.id}' == sort)
+        return lambda row: row.cells[column].best_score if row.cells[column] else None
+    return lambda row: (row.full_name or row.username).lower()
+
+
+def is_valid_sort(sort, tests):
+    return sort in GRADEBOOK_SORTS or sort in {f'test_{test.id}' for test in tests}
+
+
+def build_gradebook(group, tests, sort='name', descending=False):
+    tests = list(tests)
+    cells = gradebook_cells(group, [test.id for test in tests])
+    students = User.objects.filter(groups=group).order_by('username').values_list('id', 'username', 'first_name', 'last_name')
+
+    rows = []
+    for student_id, username, first_name, last_name in students:
+        student_cells = []
+        score_sum, attempt_count = Decimal(0), 0
+        for test in tests:
+            cell = cells.get((student_id, test.id))
+            if cell is None:
+                student_cells.append(None)
+                continue
+            best_score, last_score, test_score_sum, test_attempt_count, last_attempt_id = cell
+            student_cells.append(GradebookCell(
+                test_id=test.id,
+                best_score=best_score,
+                last_score=last_score,
+                average_score=test_score_sum / test_attempt_count,
+                attempt_count=test_attempt_count,
+                last_attempt_id=last_attempt_id,
+            ))
+            score_sum += test_score_sum
+            attempt_count += test_attempt_count
+        rows.append(GradebookRow(
+            student_id=student_id,
+            username=username,
+            full_name=f'{first_name} {last_name}'.strip(),
+            cells=student_cells,
+            attempt_count=attempt_count,
+            average_score=score_sum / attempt_count if attempt_count else None,
+        ))
+
+    sort_value = _sort_value(sort, tests)
+    missing = [row for row in rows if sort_value(row) is None]
+    present = [row for row in rows if sort_value(row) is not None]
+    present.sort(key=sort_value, reverse=descending)
+    return Gradebook(tests=tests, rows=present + missing)
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def _format_score(value):
+    return '' if value is None else f'{value:.2f}'
+
+
+def gradebook_csv_rows(gradebook):
+    writer = csv.writer(_Echo())
+    header = ['Estudiante', 'Usuario', 'Intentos', 'Promedio General (%)']
+    for test in gradebook.tests:
+        header += [f'{test.name} - Mejor (%)', f'{test.name} - Último (%)', f'{test.name} - Promedio (%)', f'{test.name} - Intentos']
+    yield writer.writerow(header)
+    for row in gradebook.rows:
+        values = [row.full_name or row.username, row.username, row.attempt_count, _format_score(row.average_score)]
+        for cell in row.cells:
+            if cell is None:
+                values += ['', '', '', 0]
+            else:
+                values += [_format_score(cell.best_score), _format_score(cell.last_score), _format_score(cell.average_score), cell.attempt_count]
+        yield writer.writerow(values)
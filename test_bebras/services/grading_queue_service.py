@@ -0,0 +1,69 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import Answer
+from .answer_key import get_answer_key, get_key_entry, record_answer_decisions
+from .scoring_service import manual_grade_for, normalized_answer_value, update_attempt_totals
+from .statistics_rollup_service import updating_rollups
+
+
+def pending_answer_groups(test, question):
+    groups = {}
+    pending_answers = Answer.objects.filter(
+        attempt__test=test, question=question, grade_status='pending'
+    ).values_list('answer_text', 'answer_number')
+    for answer_text, answer_number in pending_answers:
+        normalized = normalized_answer_value(answer_text, answer_number)
+        if normalized is None:
+            continue
+        group = groups.setdefault(normalized, {
+            'normalized': normalized,
+            'sample': answer_text if answer_number is None else answer_number,
+            'count': 0,
+        })
+        group['count'] += 1
+    return sorted(groups.values(), key=lambda group: (-group['count'], group['normalized']))
+
+
+def grade_answer_group(test, question, normalized, is_correct, grader):
+    answer_key = get_answer_key(test)
+    key_entry = get_key_entry(answer_key, question)
+    manual_grade = manual_grade_for(key_entry, is_correct)
+    graded_at = timezone.now()
+
+    with transaction.atomic():
+        pending_answers = Answer.objects.select_for_update().filter(
+            attempt__test=test, question=question, grade_status='pending'
+        ).only('id', 'attempt_id', 'answer_text', 'answer_number', 'answer_choice_id', 'question_score')
+        matching_answers = [
+            answer for answer in pending_answers
+            if normalized_answer_value(answer.answer_text, answer.answer_number) == normalized
+        ]
+
+        deltas = defaultdict(lambda: [Decimal(0), 0])
+        for answer in matching_answers:
+            deltas[answer.attempt_id][0] += manual_grade - (answer.question_score or Decimal(0))
+            deltas[answer.attempt_id][1] += int(is_correct)
+            answer.grade_status = 'graded'
+            answer.is_correct_manual = is_correct
+            answer.manual_grade = manual_grade
+            answer.question_score = manual_grade
+            answer.graded_by = grader
+            answer.graded_at = graded_at
+            answer.refresh_outcome()
+
+        with updating_rollups(deltas.keys()):
+            Answer.objects.bulk_update(
+                matching_answers,
+                ['grade_status', 'is_correct_manual', 'manual_grade', 'question_score', 'graded_by', 'graded_at', 'outcome'],
+                batch_size=500
+            )
+            update_attempt_totals(
+                {attempt_id: tuple(delta) for attempt_id, delta in deltas.items()},
+                {attempt_id: answer_key.max_score for attempt_id in deltas}
+            )
+        record_answer_decisions(question.id, [normalized], is_correct)
+    return {'graded_count': len(matching_answers), 'attempt_count': len(deltas)}
@@ -0,0 +1,141 @@
+from collections import namedtuple
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Case, IntegerField, Value, When
+from django.db.models.functions import Coalesce
+
+from ..models import Answer, Attempt, Choice
+from .answer_key import get_answer_key
+from .scoring_service import correct_answer_filter
+
+ITEM_ANALYSIS_CACHE_TIMEOUT = 60 * 60 * 24
+EXTREME_GROUP_FRACTION = 0.27
+
+ItemStatistics = namedtuple('ItemStatistics', ['question_id', 'p_value', 'point_biserial', 'discrimination', 'choice_rates'])
+ChoiceRate = namedtuple('ChoiceRate', ['choice_id', 'text', 'is_correct', 'rate', 'upper_rate', 'lower_rate'])
+ItemAnalysis = namedtuple('ItemAnalysis', ['test_id', 'student_count', 'items'])
+
+
+def _item_analysis_cache_key(test):
+    return f'item_analysis_{test.id}_{test.statistics_version}_{test.answer_key_version}'
+
+
+def _latest_attempt_ids(test):
+    latest = {}
+    attempts = Attempt.objects.filter(test=test, end_time__isnull=False).order_by('user_id', '-end_time', '-id')
+    for attempt_id, user_id in attempts.values_list('id', 'user_id'):
+        latest.setdefault(user_id, attempt_id)
+    return np.fromiter(latest.values(), dtype=np.int64, count=len(latest))
+
+
+def response_matrix(test, question_ids):
+    attempt_ids = _latest_attempt_ids(test)
+    rows = np.array(
+        list(
+            Answer.objects.filter(attempt__test=test, attempt__end_time__isnull=False, question_id__in=question_ids)
+            .annotate(
+                is_correct=Case(When(correct_answer_filter(), then=Value(1)), default=Value(0), output_field=IntegerField()),
+                choice=Coalesce('answer_choice_id', Value(0)),
+            )
+            .values_list('attempt_id', 'question_id', 'is_correct', 'choice')
+        ),
+        dtype=np.int64,
+    ).reshape(-1, 4)
+
+    attempt_ids.sort()
+    rows = rows[np.isin(rows[:, 0], attempt_ids)]
+    student_index = np.searchsorted(attempt_ids, rows[:, 0])
+    sorted_question_ids = np.asarray(sorted(question_ids), dtype=np.int64)
+    column_order = np.argsort(np.asarray(question_ids, dtype=np.int64))
+    question_index = column_order[np.searchsorted(sorted_question_ids, rows[:, 1])]
+
+    matrix = np.zeros((len(attempt_ids), len(question_ids)), dtype=np.int8)
+    matrix[student_index, question_index] = rows[:, 2]
+    return matrix, student_index, rows[:, 3]
+
+
+def _point_biserial(matrix):
+    items = matrix.astype(np.float64)
+    rest_scores = items.sum(axis=1, keepdims=True) - items
+    items_centered = items - items.mean(axis=0)
+    rest_centered = rest_scores - rest_scores.mean(axis=0)
+    denominator = np.sqrt((items_centered ** 2).sum(axis=0) * (rest_centered ** 2).sum(axis=0))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        correlation = (items_centered * rest_centered).sum(axis=0) / denominator
+    return np.where(denominator > 0, correlation, np.nan)
+
+
+def _extreme_groups(matrix):
+    group_size = min(max(1, int(round(len(matrix) * EXTREME_GROUP_FRACTION))), len(matrix) // 2)
+    order = np.argsort(matrix.sum(axis=1), kind='stable')
+    membership = np.zeros(len(matrix), dtype=np.int8)
+    if group_size:
+        membership[order[:group_size]] = -1
+        membership[order[-group_size:]] = 1
+    return membership, group_size
+
+
+def analyze_responses(matrix, student_index, choice_ids):
+    student_count = len(matrix)
+    p_values = matrix.mean(axis=0)
+    point_biserial = _point_biserial(matrix)
+    membership, group_size = _extreme_groups(matrix)
+    if group_size:
+        discrimination = matrix[membership == 1].mean(axis=0) - matrix[membership == -1].mean(axis=0)
+    else:
+        discrimination = np.full(matrix.shape[1], np.nan)
+
+    selected = choice_ids > 0
+    choice_values, choice_index = np.unique(choice_ids[selected], return_inverse=True)
+    answer_membership = membership[student_index[selected]]
+    choice_counts = np.bincount(choice_index, minlength=len(choice_values))
+    upper_counts = np.bincount(choice_index, weights=answer_membership == 1, minlength=len(choice_values))
+    lower_counts = np.bincount(choice_index, weights=answer_membership == -1, minlength=len(choice_values))
+    choice_rates = {
+        int(choice_id): (count / student_count, upper / max(group_size, 1), lower / max(group_size, 1))
+        for choice_id, count, upper, lower in zip(choice_values, choice_counts, upper_counts, lower_counts)
+    }
+    return p_values, point_biserial, discrimination, choice_rates
+
+
+def _optional_float(value):
+    return None if np.isnan(value) else float(value)
+
+
+def build_item_analysis(test):
+    question_ids = list(get_answer_key(test).entries)
+    matrix, student_index, choice_ids = response_matrix(test, question_ids)
+    if not len(matrix):
+        return ItemAnalysis(test_id=test.id, student_count=0, items={})
+
+    p_values, point_biserial, discrimination, choice_rates = analyze_responses(matrix, student_index, choice_ids)
+    choices_by_question = {}
+    for choice_id, question_id, text, is_correct in Choice.objects.filter(question_id__in=question_ids).order_by('id').values_list(
+        'id', 'question_id', 'text', 'is_correct'
+    ):
+        rate, upper_rate, lower_rate = choice_rates.get(choice_id, (0.0, 0.0, 0.0))
+        choices_by_question.setdefault(question_id, []).append(
+            ChoiceRate(choice_id, text, is_correct, rate, upper_rate, lower_rate)
+        )
+
+    items = {
+        question_id: ItemStatistics(
+            question_id=question_id,
+            p_value=float(p_values[column]),
+            point_biserial=_optional_float(point_biserial[column]),
+            discrimination=_optional_float(discrimination[column]),
+            choice_rates=choices_by_question.get(question_id, []),
+        )
+        for column, question_id in enumerate(question_ids)
+    }
+    return ItemAnalysis(test_id=test.id, student_count=len(matrix), items=items)
+
+
+def get_item_analysis(test):
+    cache_key = _item_analysis_cache_key(test)
+    analysis = cache.get(cache_key)
+    if analysis is None:
+        analysis = build_item_analysis(test)
+        cache.set(cache_key, analysis, ITEM_ANALYSIS_CACHE_TIMEOUT)
+    return analysis
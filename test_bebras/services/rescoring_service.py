@@ -0,0 +1,135 @@
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Value, When
+from django.utils import timezone
+
+from ..models import Answer, Attempt
+from .answer_key import build_answer_key
+from .scoring_service import ScoringPolicy, derive_grade_status, from_cents, percentage_score, score_answers
+from .statistics_rollup_service import rebuild_rollups
+
+
+def _answer_score_expressions(policy, difficulty_by_question):
+    questions_by_difficulty = defaultdict(list)
+    for question_id, difficulty in difficulty_by_question.items():
+        questions_by_difficulty[difficulty].append(question_id)
+
+    score_whens, manual_whens = [], []
+    for difficulty, question_ids in questions_by_difficulty.items():
+        points, penalty = Value(policy.points(difficulty)), Value(-policy.penalty(difficulty))
+        manual_correct = When(grade_status='graded', is_correct_manual=True, question_id__in=question_ids, then=points)
+        manual_incorrect = When(grade_status='graded', question_id__in=question_ids, then=penalty)
+        score_whens += [
+            When(grade_status='correct', question_id__in=question_ids, then=points),
+            When(grade_status='incorrect', question_id__in=question_ids, then=penalty),
+            manual_correct,
+            manual_incorrect,
+        ]
+        manual_whens += [manual_correct, manual_incorrect]
+
+    output_field = DecimalField(max_digits=5, decimal_places=2)
+    return (
+        Case(*score_whens, default=Value(Decimal(0)), output_field=output_field),
+        Case(*manual_whens, default=F('manual_grade'), output_field=output_field),
+    )
+
+
+def _regraded_answers(answers, answer_key):
+    regraded = []
+    for answer in answers:
+        entry = answer_key.entries.get(answer.question_id)
+        if entry is None or answer.grade_status == 'graded':
+            continue
+        grade_status = derive_grade_status(
+            entry, answer_text=answer.answer_text, answer_number=answer.answer_number, answer_choice_id=answer.answer_choice_id
+        )
+        if grade_status != answer.grade_status:
+            answer.grade_status = grade_status
+            answer.refresh_outcome()
+            regraded.append(answer)
+    return regraded
+
+
+def _rescore_chunk(attempt_ids, policy, answer_key, max_score):
+    with transaction.atomic():
+        attempts = list(Attempt.objects.select_for_update().filter(id__in=attempt_ids).order_by('id'))
+        updated_at = timezone.now()
+        position = {attempt.id: index for index, attempt in enumerate(attempts)}
+        answers = list(
+            Answer.objects.filter(attempt_id__in=attempt_ids).annotate(difficulty=F('question__difficulty')).only(
+                'id', 'attempt_id', 'question_id', 'answer_text', 'answer_number', 'answer_choice_id',
+                'grade_status', 'is_correct_manual', 'question_score', 'outcome'
+            )
+        )
+        regraded = _regraded_answers(answers, answer_key)
+        if regraded:
+            Answer.objects.bulk_update(regraded, ['grade_status', 'outcome'], batch_size=500)
+
+        scores = score_answers(
+            policy,
+            [answer.difficulty for answer in answers],
+            [answer.grade_status for answer in answers],
+            None,
+            [answer.is_correct_manual for answer in answers],
+            attempt_index=[position[answer.attempt_id] for answer in answers],
+            attempt_count=len(attempts),
+        )
+        regraded_ids = {answer.id for answer in regraded}
+        changed_answers = sum(
+            answer.id in regraded_ids or from_cents(question_cents) != answer.question_score
+            for answer, question_cents in zip(answers, scores.question_scores)
+        )
+        if changed_answers:
+            question_score, manual_grade = _answer_score_expressions(policy, {answer.question_id: answer.difficulty for answer in answers})
+            Answer.objects.filter(attempt_id__in=attempt_ids).update(question_score=question_score, manual_grade=manual_grade)
+
+        for attempt, raw_cents, correct_count in zip(attempts, scores.attempt_raw_scores, scores.attempt_correct_counts):
+            attempt.raw_score = from_cents(raw_cents)
+            attempt.correct_count = int(correct_count)
+            attempt.score = percentage_score(attempt.raw_score, max_score)
+            attempt.updated_at = updated_at
+        Attempt.objects.bulk_update(attempts, ['raw_score', 'correct_count', 'score', 'updated_at'], batch_size=500)
+    return len(answers), changed_answers
+
+
+def _chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def rescore_test(test, chunk_size=500, progress_callback=None):
+    started = time.perf_counter()
+    test.refresh_from_db()
+    policy = ScoringPolicy(test)
+    answer_key = build_answer_key(test)
+    attempts = Attempt.objects.filter(test=test).order_by('id')
+    total_attempts = attempts.count()
+
+    processed_attempts = processed_answers = updated_answers = 0
+    attempt_ids = attempts.values_list('id', flat=True).iterator(chunk_size=chunk_size)
+    for chunk in _chunked(attempt_ids, chunk_size):
+        answers, updated = _rescore_chunk(chunk, policy, answer_key, answer_key.max_score)
+        processed_attempts += len(chunk)
+        processed_answers += answers
+        updated_answers += updated
+        if progress_callback:
+            progress_callback(processed_attempts, total_attempts, time.perf_counter() - started)
+    rebuild_rollups([test.id], chunk_size=chunk_size)
+
+    elapsed = time.perf_counter() - started
+    return {
+        'attempts': processed_attempts,
+        'answers': processed_answers,
+        'updated_answers': updated_answers,
+        'elapsed': elapsed,
+        'attempts_per_second': processed_attempts / elapsed if elapsed > 0 else float(processed_attempts),
+    }
@@ -0,0 +1,81 @@
+import time
+from collections import namedtuple
+
+import numpy as np
+from django.core.cache import cache
+
+from ..models import Attempt
+from .statistics_rollup_service import statistics_version
+
+SCORE_DISTRIBUTION_CACHE_TIMEOUT = 60 * 60 * 24
+SCORE_DISTRIBUTION_MAX_STALENESS = 60
+HISTOGRAM_BIN_EDGES = np.linspace(0, 100, 11)
+
+ScoreDistribution = namedtuple('ScoreDistribution', ['test_id', 'group_id', 'sorted_scores', 'summary', 'version', 'built_at'])
+
+
+def score_array(attempts):
+    # Select by id so a DISTINCT scope query does not merge attempts that share a score.
+    scores = Attempt.objects.filter(id__in=attempts.values('id'), end_time__isnull=False).values_list('score', flat=True)
+    return np.fromiter((float(score) for score in scores), dtype=np.float64)
+
+
+def summarize_scores(scores):
+    counts, _ = np.histogram(np.clip(scores, 0, 100), bins=HISTOGRAM_BIN_EDGES)
+    summary = {
+        'count': int(len(scores)),
+        'histogram': [
+            {'from': float(lower), 'to': float(upper), 'count': int(count)}
+            for lower, upper, count in zip(HISTOGRAM_BIN_EDGES[:-1], HISTOGRAM_BIN_EDGES[1:], counts)
+        ],
+        'mean': None,
+        'minimum': None,
+        'maximum': None,
+        'quartiles': None,
+    }
+    if len(scores):
+        quartiles = np.percentile(scores, [25, 50, 75])
+        summary.update(
+            mean=round(float(scores.mean()), 2),
+            minimum=float(scores.min()),
+            maximum=float(scores.max()),
+            quartiles={'q1': round(float(quartiles[0]), 2), 'median': round(float(quartiles[1]), 2), 'q3': round(float(quartiles[2]), 2)},
+        )
+    return summary
+
+
+def percentile_rank(sorted_scores, score):
+    if not len(sorted_scores):
+        return None
+    score = float(score)
+    below = np.searchsorted(sorted_scores, score, side='left')
+    equal = np.searchsorted(sorted_scores, score, side='right') - below
+    return float((below + 0.5 * equal) / len(sorted_scores) * 100)
+
+
+def _score_distribution_cache_key(test_id, group_id):
+    return f'score_distribution_v1_{test_id}_{group_id or 0}'
+
+
+def build_score_distribution(test_id, group_id=None):
+    version = statistics_version(test_id)
+    attempts = Attempt.objects.filter(test_id=test_id)
+    if group_id:
+        attempts = attempts.filter(user__groups__id=group_id)
+    scores = np.sort(score_array(attempts))
+    distribution = ScoreDistribution(
+        test_id=test_id, group_id=group_id, sorted_scores=scores, summary=summarize_scores(scores),
+        version=version, built_at=time.time(),
+    )
+    cache.set(_score_distribution_cache_key(test_id, group_id), distribution, SCORE_DISTRIBUTION_CACHE_TIMEOUT)
+    return distribution
+
+
+def get_score_distribution(test_id, group_id=None):
+    distribution = cache.get(_score_distribution_cache_key(test_id, group_id))
+    if distribution is None or (
+        distribution.version != statistics_version(test_id)
+        and time.time() - distribution.built_at > SCORE_DISTRIBUTION_MAX_STALENESS
+    ):
+        distribution = build_score_distribution(test_id, group_id)
+    return distribution
@@ -0,0 +1,220 @@
+from collections import namedtuple
+from decimal import ROUND_HALF_EVEN, Decimal, InvalidOperation
+
+import numpy as np
+from django.db.models import Case, DecimalField, F, FloatField, IntegerField, Q, Value, When
+from django.db.models.functions import Cast, Coalesce, Greatest, Least, NullIf
+from django.utils import timezone
+
+from ..models import Attempt, Question
+
+CENT = Decimal('0.01')
+MAX_DIFFICULTY = max(value for value, _ in Question._meta.get_field('difficulty').choices)
+
+STATUS_CORRECT, STATUS_INCORRECT, STATUS_PENDING, STATUS_GRADED = range(4)
+STATUS_CODES = {
+    'correct': STATUS_CORRECT,
+    'incorrect': STATUS_INCORRECT,
+    'pending': STATUS_PENDING,
+    'graded': STATUS_GRADED,
+}
+
+BatchScores = namedtuple('BatchScores', ['question_scores', 'is_correct', 'attempt_raw_scores', 'attempt_correct_counts'])
+
+
+def _to_decimal(value):
+    return Decimal(str(value)).quantize(CENT, rounding=ROUND_HALF_EVEN)
+
+
+def to_cents(value):
+    return int(_to_decimal(value) * 100)
+
+
+def from_cents(cents):
+    return Decimal(int(cents)).scaleb(-2)
+
+
+class ScoringPolicy:
+    def __init__(self, test):
+        self.points_per_difficulty = {k: _to_decimal(v) for k, v in (test.points_per_difficulty or {}).items()}
+        self.penalty_type = test.penalty_type
+        self.fixed_penalty = _to_decimal(test.fixed_penalty or 0)
+        self.penalty_by_difficulty = {k: _to_decimal(v) for k, v in (test.penalty_by_difficulty or {}).items()}
+
+        difficulties = range(MAX_DIFFICULTY + 1)
+        self.points_cents = np.array([to_cents(self.points(d)) for d in difficulties], dtype=np.int64)
+        self.penalty_cents = np.array([to_cents(self.penalty(d)) for d in difficulties], dtype=np.int64)
+
+    def points(self, difficulty):
+        return self.points_per_difficulty.get(str(difficulty), Decimal(0))
+
+    def penalty(self, difficulty):
+        if self.penalty_type == 'fixed':
+            return self.fixed_penalty
+        if self.penalty_type == 'by_difficulty':
+            return self.penalty_by_difficulty.get(str(difficulty), Decimal(0))
+        return Decimal(0)
+
+    def max_score(self, difficulties):
+        return from_cents(self.points_cents[np.asarray(difficulties, dtype=np.int64)].sum())
+
+
+def answer_score(entry, status, manual_grade=None):
+    if status == 'correct':
+        return entry.points
+    if status == 'incorrect':
+        return -entry.penalty
+    if status == 'graded':
+        return manual_grade if manual_grade is not None else Decimal('0.0')
+    return Decimal(0)
+
+
+def manual_grade_for(entry, is_correct):
+    return entry.points if is_correct else -entry.penalty
+
+
+def normalize_answer(value):
+    return str(value).strip().lower()
+
+
+def normalized_answer_value(answer_text, answer_number):
+    value = answer_text if answer_number is None else answer_number
+    if value is None or str(value).strip() == '':
+        return None
+    return normalize_answer(value)
+
+
+def auto_grade_status(entry, answer_text=None, answer_number=None):
+    correct_answer = entry.correct_answer
+    if entry.response_format == 'text':
+        if not answer_text:
+            return 'incorrect'
+        normalized = normalize_answer(answer_text)
+        if correct_answer and normalized == normalize_answer(correct_answer):
+            return 'correct'
+
+    elif entry.response_format == 'number':
+        if answer_number is None:
+            return 'incorrect'
+        normalized = normalize_answer(answer_number)
+        try:
+            if correct_answer is not None and Decimal(str(answer_number)) == Decimal(str(correct_answer).strip()):
+                return 'correct'
+        except (ValueError, InvalidOperation):
+            pass
+
+    else:
+        return 'incorrect'
+
+    if normalized in entry.accepted_answers:
+        return 'correct'
+    if normalized in entry.rejected_answers:
+        return 'incorrect'
+    return 'pending'
+
+
+def derive_grade_status(entry, answer_text=None, answer_number=None, answer_choice_id=None):
+    if entry.response_format == 'choice':
+        return 'correct' if answer_choice_id in entry.correct_choice_ids else 'incorrect'
+    return auto_grade_status(entry, answer_text=answer_text, answer_number=answer_number)
+
+
+def is_correct_status(status, is_correct_manual=None):
+    return status == 'correct' or (status == 'graded' and bool(is_correct_manual))
+
+
+def correct_answer_filter(prefix=''):
+    return Q(**{f'{prefix}outcome': 'correct'})
+
+
+def status_codes(statuses):
+    return np.fromiter((STATUS_CODES.get(status, STATUS_PENDING) for status in statuses), dtype=np.int8, count=len(statuses))
+
+
+def _correct_mask(codes, is_correct_manual):
+    manual = np.fromiter((bool(value) for value in is_correct_manual), dtype=bool, count=len(codes))
+    return (codes == STATUS_CORRECT) | ((codes == STATUS_GRADED) & manual)
+
+
+def correct_mask(statuses, is_correct_manual):
+    return _correct_mask(status_codes(statuses), is_correct_manual)
+
+
+def score_answers(policy, difficulties, statuses, manual_grades, is_correct_manual, attempt_index=None, attempt_count=None):
+    """Score a batch of answers at once; scores are returned as integer cents.
+
+    Passing ``manual_grades=None`` derives the grade of manually corrected
+    answers from ``is_correct_manual`` and the policy, as grading does.
+    """
+    difficulties = np.asarray(difficulties, dtype=np.int64)
+    codes = status_codes(statuses)
+    if manual_grades is None:
+        manual = np.fromiter((bool(value) for value in is_correct_manual), dtype=bool, count=len(codes))
+        manual_cents = np.where(manual, policy.points_cents[difficulties], -policy.penalty_cents[difficulties])
+    else:
+        manual_cents = np.fromiter(
+            (to_cents(grade) if grade is not None else 0 for grade in manual_grades), dtype=np.int64, count=len(codes)
+        )
+
+    question_scores = np.zeros(len(codes), dtype=np.int64)
+    question_scores = np.where(codes == STATUS_CORRECT, policy.points_cents[difficulties], question_scores)
+    question_scores = np.where(codes == STATUS_INCORRECT, -policy.penalty_cents[difficulties], question_scores)
+    question_scores = np.where(codes == STATUS_GRADED, manual_cents, question_scores)
+    is_correct = _correct_mask(codes, is_correct_manual)
+
+    attempt_raw_scores = attempt_correct_counts = None
+    if attempt_index is not None:
+        attempt_index = np.asarray(attempt_index, dtype=np.int64)
+        minlength = attempt_count or 0
+        attempt_raw_scores = np.rint(np.bincount(attempt_index, weights=question_scores, minlength=minlength)).astype(np.int64)
+        attempt_correct_counts = np.bincount(attempt_index[is_correct], minlength=minlength)
+    return BatchScores(question_scores, is_correct, attempt_raw_scores, attempt_correct_counts)
+
+
+def percentage_score(raw_score, max_score):
+    if max_score <= 0:
+        return Decimal(0)
+    percentage = raw_score / max_score * Decimal(100)
+    return max(Decimal(0), min(Decimal(100), percentage)).quantize(CENT, rounding=ROUND_HALF_EVEN)
+
+
+def percentage_expression(raw_score_expression, max_score_expression):
+    percentage = (
+        Cast(raw_score_expression, FloatField()) * Value(100.0)
+        / NullIf(Cast(max_score_expression, FloatField()), Value(0.0))
+    )
+    return Coalesce(
+        Least(Greatest(percentage, Value(0.0)), Value(100.0)),
+        Value(0.0),
+        output_field=DecimalField(max_digits=5, decimal_places=2),
+    )
+
+
+def _per_attempt_value(values_by_attempt, output_field):
+    if len(values_by_attempt) == 1:
+        return Value(next(iter(values_by_attempt.values())), output_field=output_field)
+    return Case(
+        *[When(id=attempt_id, then=Value(value)) for attempt_id, value in values_by_attempt.items()],
+        default=Value(0),
+        output_field=output_field,
+    )
+
+
+def update_attempt_totals(deltas, max_scores, **extra_fields):
+    """Apply {attempt_id: (score_delta, correct_delta)} to the stored totals with a single UPDATE."""
+    if not deltas:
+        return 0
+
+    decimal_field = DecimalField(max_digits=7, decimal_places=2)
+    score_delta = _per_attempt_value({k: v[0] for k, v in deltas.items()}, decimal_field)
+    correct_delta = _per_attempt_value({k: v[1] for k, v in deltas.items()}, IntegerField())
+    max_score = _per_attempt_value({k: max_scores[k] for k in deltas}, decimal_field)
+
+    new_raw_score = F('raw_score') + score_delta
+    return Attempt.objects.filter(id__in=list(deltas)).update(
+        raw_score=new_raw_score,
+        correct_count=F('correct_count') + correct_delta,
+        score=percentage_expression(new_raw_score, max_score),
+        updated_at=timezone.now(),
+        **extra_fields
+    )
@@ -0,0 +1,180 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncWeek
+from django.utils import timezone
+
+from ..models import Answer, Attempt, DailyActivityRollup, Test, TestGroupRollup, TestRollup, TestSkillRollup
+from .score_distribution_service import score_array, summarize_scores
+from .scoring_service import correct_answer_filter
+from .statistics_rollup_service import answered_filter, statistics_version
+
+DASHBOARD_STATISTICS_CACHE_TIMEOUT = 60 * 10
+ACTIVITY_TREND_DAYS = 365
+
+
+def _attempts_queryset(user, group_id, test_id):
+    if user.is_staff:
+        attempts = Attempt.objects.all()
+    else:
+        groups_visible_to_teacher = Group.objects.filter(groupmetadata__created_by=user).distinct()
+        attempts = Attempt.objects.filter(
+            user__groups__in=groups_visible_to_teacher,
+            test__in=Test.objects.filter(creator=user),
+            test__testassignment__assigned_by=user,
+            test__testassignment__group__in=groups_visible_to_teacher
+        ).distinct()
+    if group_id:
+        attempts = attempts.filter(user__groups__id=group_id)
+    if test_id:
+        attempts = attempts.filter(test__id=test_id)
+    return attempts
+
+
+def _scoped_rollups(rollups, user, group_id, test_id):
+    if not user.is_staff:
+        rollups = rollups.filter(
+            group__groupmetadata__created_by=user,
+            test__creator=user,
+            test__testassignment__group=F('group'),
+            test__testassignment__assigned_by=user
+        )
+    if group_id:
+        rollups = rollups.filter(group_id=group_id)
+    if test_id:
+        rollups = rollups.filter(test_id=test_id)
+    return rollups
+
+
+def _group_rollups(user, group_id, test_id):
+    return _scoped_rollups(TestGroupRollup.objects.all(), user, group_id, test_id)
+
+
+def user_attempt_counts(user, group_id=None, test_id=None):
+    attempts = _attempts_queryset(user, group_id, test_id)
+    users = User.objects.filter(
+        attempt__in=attempts
+    ).annotate(
+        num_attempts=Count('attempt', filter=Q(attempt__in=attempts))
+    ).filter(num_attempts__gt=0).order_by('-num_attempts')
+    return [
+        {'username': row.get_full_name() or row.username, 'attempts': row.num_attempts}
+        for row in users
+    ]
+
+
+def overall_performance(user, group_id=None, test_id=None):
+    # Staff see every attempt of a test; teachers only see the attempts of their own groups.
+    if user.is_staff and not group_id:
+        rollups = TestRollup.objects.filter(test_id=test_id) if test_id else TestRollup.objects.all()
+    else:
+        rollups = _group_rollups(user, group_id, test_id)
+    totals = {
+        field: value or 0 for field, value in rollups.aggregate(
+            total_attempts_count=Sum('attempts'),
+            correct=Sum('correct'),
+            answered=Sum('answered'),
+            unanswered=Sum('unanswered'),
+        ).items()
+    }
+    return {
+        'total_attempts_count': totals['total_attempts_count'],
+        'correct': totals['correct'],
+        'incorrect': totals['answered'] - totals['correct'],
+        'answered': totals['answered'],
+        'unanswered': totals['unanswered'],
+        'total_possible': totals['answered'] + totals['unanswered'],
+    }
+
+
+def skill_performance(user, group_id=None, test_id=None):
+    if group_id:
+        skill_rows = Answer.objects.filter(
+            attempt_id__in=_attempts_queryset(user, group_id, test_id).filter(end_time__isnull=False).values('id'),
+            question__skills__isnull=False,
+        ).filter(answered_filter()).values(skill_name=F('question__skills__name'), skill_id=F('question__skills__id')).annotate(
+            answered_count=Count('id'),
+            correct_count=Count('id', filter=correct_answer_filter()),
+        )
+    else:
+        skill_rows = TestSkillRollup.objects.filter(
+            test_id__in=_group_rollups(user, group_id, test_id).values('test_id')
+        ).values('skill_id', skill_name=F('skill__name')).annotate(
+            answered_count=Sum('answered'),
+            correct_count=Sum('correct'),
+        ).filter(answered_count__gt=0)
+
+    return [
+        {
+            'skill_name': row['skill_name'],
+            'answered': row['answered_count'],
+            'correct': row['correct_count'],
+            'accuracy': row['correct_count'] / row['answered_count'] * 100,
+            'incorrect': row['answered_count'] - row['correct_count'],
+        }
+        for row in skill_rows.order_by('skill_name', 'skill_id')
+    ]
+
+
+def activity_trend(user, group_id=None, test_id=None):
+    rollups = _scoped_rollups(
+        DailyActivityRollup.objects.filter(day__gt=timezone.localdate() - timedelta(days=ACTIVITY_TREND_DAYS)),
+        user, group_id, test_id
+    )
+    daily_rows = rollups.values('day').annotate(
+        started=Sum('started'), finished=Sum('finished'), score_sum=Sum('score_sum')
+    ).order_by('day')
+    weekly_rows = rollups.annotate(week=TruncWeek('day')).values('week').annotate(
+        started=Sum('started'), finished=Sum('finished')
+    ).order_by('week')
+    return {
+        'daily': [
+            {
+                'day': row['day'].isoformat(),
+                'started': row['started'],
+                'finished': row['finished'],
+                'average_score': round(float(row['score_sum']) / row['finished'], 2) if row['finished'] else None,
+            }
+            for row in daily_rows
+        ],
+        'weekly': [
+            {
+                'week': row['week'].isoformat(),
+                'started': row['started'],
+                'finished': row['finished'],
+                'completion_rate': round(row['finished'] / row['started'] * 100, 2) if row['started'] else None,
+            }
+            for row in weekly_rows
+        ],
+    }
+
+
+def score_distribution(user, group_id=None, test_id=None):
+    return summarize_scores(score_array(_attempts_queryset(user, group_id, test_id)))
+
+
+DASHBOARD_STATISTICS = {
+    'user_attempts': user_attempt_counts,
+    'overall_performance': overall_performance,
+    'skill_performance': skill_performance,
+    'activity_trend': activity_trend,
+    'score_distribution': score_distribution,
+}
+
+
+def _dashboard_cache_key(name, user, group_id, test_id):
+    scope = 'staff' if user.is_staff else f'teacher_{user.id}'
+    version = statistics_version(test_id)
+    return f'dashboard_statistics_v1_{name}_{scope}_{group_id or 0}_{test_id or 0}_{version}'
+
+
+def get_dashboard_statistic(name, user, group_id=None, test_id=None):
+    cache_key = _dashboard_cache_key(name, user, group_id, test_id)
+    data = cache.get(cache_key)
+    if data is None:
+        data = DASHBOARD_STATISTICS[name](user, group_id, test_id)
+        cache.set(cache_key, data, DASHBOARD_STATISTICS_CACHE_TIMEOUT)
+    return data
+
@@ -0,0 +1,206 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from ..models import (
+    Answer, Attempt, Question, Test, TestAssignment, TestGroupRollup, TestQuestionRollup, TestRollup, TestSkillRollup
+)
+from .answer_key import get_answer_keys
+
+ROLLUP_KEY_FIELDS = {
+    TestQuestionRollup: 'question_id',
+    TestSkillRollup: 'skill_id',
+    TestGroupRollup: 'group_id',
+    TestRollup: None,
+}
+
+
+def statistics_version(test_id=None):
+    tests = Test.objects.filter(id=test_id) if test_id else Test.objects.all()
+    versions = tests.aggregate(
+        tests=Count('id'), statistics=Sum('statistics_version'), answer_keys=Sum('answer_key_version')
+    )
+    return f"{versions['tests']}.{versions['statistics'] or 0}.{versions['answer_keys'] or 0}"
+
+
+def invalidate_statistics(test_ids):
+    test_ids = set(test_ids)
+    if not test_ids:
+        return
+    transaction.on_commit(
+        lambda: Test.objects.filter(id__in=test_ids).update(statistics_version=F('statistics_version') + 1)
+    )
+
+
+def _rollup_keys(model, key_id):
+    key_field = ROLLUP_KEY_FIELDS[model]
+    return {key_field: key_id} if key_field else {}
+
+
+def _empty_totals():
+    return {model: defaultdict(lambda: defaultdict(int)) for model in ROLLUP_KEY_FIELDS}
+
+
+def _add(rows, key, counters):
+    for field, value in counters.items():
+        rows[key][field] += value
+
+
+def answered_filter(prefix=''):
+    return ~Q(**{f'{prefix}outcome': 'unanswered'})
+
+
+def attempt_contributions(attempt_ids):
+    totals = _empty_totals()
+    attempts = list(
+        Attempt.objects.filter(id__in=attempt_ids, end_time__isnull=False).values_list('id', 'test_id', 'user_id', 'score')
+    )
+    if not attempts:
+        return totals
+
+    test_ids = {test_id for _, test_id, _, _ in attempts}
+    answer_keys = get_answer_keys(test_ids)
+    answers = {
+        (attempt_id, question_id): (outcome, question_score)
+        for attempt_id, question_id, outcome, question_score in Answer.objects.filter(
+            attempt_id__in=[row[0] for row in attempts]
+        ).values_list('attempt_id', 'question_id', 'outcome', 'question_score')
+    }
+
+    skills_by_question = defaultdict(list)
+    question_ids = {question_id for answer_key in answer_keys.values() for question_id in answer_key.entries}
+    for question_id, skill_id in Question.skills.through.objects.filter(question_id__in=question_ids).values_list('question_id', 'skill_id'):
+        skills_by_question[question_id].append(skill_id)
+
+    groups_by_test_user = defaultdict(set)
+    assignments = TestAssignment.objects.filter(
+        test_id__in=test_ids, group__user__in={user_id for _, _, user_id, _ in attempts}
+    ).values_list('test_id', 'group_id', 'group__user')
+    for test_id, group_id, user_id in assignments:
+        groups_by_test_user[(test_id, user_id)].add(group_id)
+
+    for attempt_id, test_id, user_id, score in attempts:
+        group_keys = [(test_id, group_id) for group_id in groups_by_test_user[(test_id, user_id)]]
+        _add(totals[TestRollup], (test_id, None), {'attempts': 1, 'percentage_sum': score})
+        for key in group_keys:
+            _add(totals[TestGroupRollup], key, {'attempts': 1, 'percentage_sum': score})
+
+        for question_id in answer_keys[test_id].entries:
+            answer = answers.get((attempt_id, question_id))
+            outcome, question_score = answer or ('unanswered', None)
+            answered = outcome != 'unanswered'
+            correct = outcome == 'correct'
+            counters = {
+                'answered': int(answered),
+                'correct': int(correct),
+                'incorrect': int(answered and not correct),
+                'unanswered': int(not answered),
+                'score_sum': question_score if question_score is not None else Decimal(0),
+            }
+            _add(totals[TestRollup], (test_id, None), counters)
+            _add(totals[TestQuestionRollup], (test_id, question_id), counters)
+            for skill_id in skills_by_question[question_id]:
+                _add(totals[TestSkillRollup], (test_id, skill_id), counters)
+            for key in group_keys:
+                _add(totals[TestGroupRollup], key, counters)
+    return totals
+
+
+def _difference(after, before):
+    deltas = _empty_totals()
+    for model in ROLLUP_KEY_FIELDS:
+        for key in after[model].keys() | before[model].keys():
+            fields = after[model][key].keys() | before[model][key].keys()
+            delta = {field: after[model][key][field] - before[model][key][field] for field in fields}
+            delta = {field: value for field, value in delta.items() if value}
+            if delta:
+                deltas[model][key] = delta
+    return deltas
+
+
+def apply_rollup_deltas(deltas, create_missing=True):
+    for model, rows in deltas.items():
+        if not rows:
+            continue
+        key_field = ROLLUP_KEY_FIELDS[model]
+        if create_missing:
+            model.objects.bulk_create(
+                [model(test_id=test_id, **_rollup_keys(model, key_id)) for test_id, key_id in rows],
+                ignore_conflicts=True
+            )
+
+        keys_by_delta = defaultdict(lambda: defaultdict(list))
+        for (test_id, key_id), delta in rows.items():
+            keys_by_delta[tuple(sorted(delta.items()))][test_id].append(key_id)
+        for delta, keys_by_test in keys_by_delta.items():
+            condition = reduce(or_, (
+                Q(test_id=test_id, **({f'{key_field}__in': key_ids} if key_field else {}))
+                for test_id, key_ids in keys_by_test.items()
+            ))
+            model.objects.filter(condition).update(**{field: F(field) + value for field, value in delta})
+    invalidate_statistics(test_id for rows in deltas.values() for test_id, _ in rows)
+
+
+@contextmanager
+def updating_rollups(attempt_ids):
+    attempt_ids = list(attempt_ids)
+    with transaction.atomic():
+        before = attempt_contributions(attempt_ids)
+        yield
+        apply_rollup_deltas(_difference(attempt_contributions(attempt_ids), before))
+
+
+def remove_from_rollups(attempt_ids):
+    apply_rollup_deltas(_difference(_empty_totals(), attempt_contributions(attempt_ids)), create_missing=False)
+
+
+def refresh_skill_rollups(test_ids):
+    test_ids = set(test_ids)
+    if not test_ids:
+        return
+    counter_fields = ('answered', 'correct', 'incorrect', 'unanswered', 'score_sum')
+    rows = TestQuestionRollup.objects.filter(
+        test_id__in=test_ids, question__skills__isnull=False
+    ).values('test_id', skill=F('question__skills__id')).annotate(
+        **{f'total_{field}': Sum(field) for field in counter_fields}
+    ).order_by()
+    with transaction.atomic():
+        TestSkillRollup.objects.filter(test_id__in=test_ids).delete()
+        TestSkillRollup.objects.bulk_create([
+            TestSkillRollup(
+                test_id=row['test_id'], skill_id=row['skill'],
+                **{field: row[f'total_{field}'] for field in counter_fields}
+            )
+            for row in rows
+        ], batch_size=500)
+    invalidate_statistics(test_ids)
+
+
+def rebuild_rollups(test_ids, chunk_size=500):
+    rebuilt_attempts = 0
+    for test_id in test_ids:
+        totals = _empty_totals()
+        attempt_ids = list(
+            Attempt.objects.filter(test_id=test_id, end_time__isnull=False).order_by('id').values_list('id', flat=True)
+        )
+        for start in range(0, len(attempt_ids), chunk_size):
+            chunk_totals = attempt_contributions(attempt_ids[start:start + chunk_size])
+            for model, rows in chunk_totals.items():
+                for key, counters in rows.items():
+                    _add(totals[model], key, counters)
+
+        with transaction.atomic():
+            for model in ROLLUP_KEY_FIELDS:
+                model.objects.filter(test_id=test_id).delete()
+                model.objects.bulk_create(
+                    [model(test_id=key[0], **_rollup_keys(model, key[1]), **counters) for key, counters in totals[model].items()],
+                    batch_size=500
+                )
+        rebuilt_attempts += len(attempt_ids)
+    invalidate_statistics(test_ids)
+    return rebuilt_attempts
@@ -1,21 +1,62 @@
-from django.shortcuts import get_object_or_404
+from decimal import Decimal
+
 from django.utils.timezone import now
-from django.db import transaction
+from django.db import IntegrityError, transaction
+from django.db.models import F
 from django.contrib import messages
 from django.urls import reverse
-from ..models import Test, Attempt, Answer, Choice, Question
+from ..models import Attempt, Answer, Question
+from .attempt_manifest import build_attempt_manifest, get_attempt_manifest
+from .attempt_finalization_service import finalize_attempt
+from .answer_key import get_answer_key, get_key_entry
+from .scoring_service import answer_score, auto_grade_status, is_correct_status, update_attempt_totals
+from .statistics_rollup_service import updating_rollups
+
+ANSWER_UPSERT_FIELDS = [
+    'user', 'answer_text', 'answer_number', 'answer_choice', 'answered_at', 'grade_status',
+    'manual_grade', 'graded_by', 'graded_at', 'is_correct_manual', 'question_score', 'outcome',
+]
+
+
+def admit_attempt(user, test):
+    attempts = list(Attempt.objects.filter(user=user, test=test).order_by('-date_taken'))
+    finalized_attempts = [attempt for attempt in attempts if attempt.end_time is not None]
+    open_attempt = next((attempt for attempt in attempts if attempt.end_time is None), None)
+
+    if len(finalized_attempts) >= test.max_attempts:
+        return {
+            'status': 'exhausted',
+            'last_finalized_attempt': finalized_attempts[0] if finalized_attempts else None,
+        }
+
+    if open_attempt:
+        return {'status': 'resumed', 'attempt': open_attempt, 'finalized_count': len(finalized_attempts)}
+
+    question_ids = list(test.questions.order_by('id').values_list('id', flat=True))
+    try:
+        with transaction.atomic():
+            open_attempt = Attempt.objects.create(
+                user=user, test=test, score=0, correct_count=0, question_ids=question_ids
+            )
+    except IntegrityError:
+        open_attempt = Attempt.objects.get(user=user, test=test, end_time__isnull=True)
+        return {'status': 'resumed', 'attempt': open_attempt, 'finalized_count': len(finalized_attempts)}
+
+    build_attempt_manifest(open_attempt)
+    return {'status': 'created', 'attempt': open_attempt, 'finalized_count': len(finalized_attempts)}
 
 
 class TestAttemptService:
-    def __init__(self, user, test, session, request_post_data=None, attempt=None):
+    def __init__(self, user, test, request_post_data=None, attempt=None):
         self.user = user
         self.test = test
-        self.session = session
         self.request_post_data = request_post_data
         self.attempt = attempt
-        self.questions = list(self.test.questions.order_by('id'))
-        self.total_questions = len(self.questions)
-        self.current_question_index = self.session.get(f'current_question_index_{self.attempt.id}', 0)
+        self.manifest = get_attempt_manifest(self.attempt)
+        self.total_questions = len(self.manifest)
+        self.current_question_index = self.attempt.current_question_index
+        self.single_page = self.test.delivery_mode == 'single_page' and self.test.allow_backtracking
+        self.answer_key = get_answer_key(self.test)
 
     def get_current_state(self):
         self.current_question_index = max(0, self.current_question_index)
@@ -25,14 +66,10 @@ class TestAttemptService:
             return {'status': 'finished', 'attempt': self.attempt, 'attempt_id': self.attempt.id}
 
         if self.current_question_index >= self.total_questions:
-            if self.attempt.end_time is None:
-                self.attempt.end_time = now()
-                self.attempt.save()
-                if f'current_question_index_{self.attempt.id}' in self.session:
-                    del self.session[f'current_question_index_{self.attempt.id}']
+            self._finish_attempt()
             return {'status': 'finished', 'attempt': self.attempt, 'attempt_id': self.attempt.id}
 
-        current_question = self.questions[self.current_question_index]
+        current_question = Question.objects.get(id=self.manifest[self.current_question_index].id)
         existing_answer = Answer.objects.filter(attempt=self.attempt, question=current_question).first()
 
         user_answer_data = None
@@ -42,7 +79,7 @@ class TestAttemptService:
             elif current_question.response_format == 'number':
                 user_answer_data = existing_answer.answer_number
             elif current_question.response_format == 'choice':
-                user_answer_data = existing_answer.answer_choice.id if existing_answer.answer_choice else None
+                user_answer_data = existing_answer.answer_choice_id
 
         return {
             'status': 'in_progress',
@@ -56,6 +93,42 @@ class TestAttemptService:
             'error': None
         }
 
+    def get_single_page_state(self):
+        if self.attempt.end_time is not None:
+            return {'status': 'finished', 'attempt': self.attempt, 'attempt_id': self.attempt.id}
+
+        questions_by_id = Question.objects.prefetch_related('choices').in_bulk(
+            [entry.id for entry in self.manifest]
+        )
+        existing_answers = {
+            answer.question_id: answer for answer in Answer.objects.filter(attempt=self.attempt)
+        }
+
+        question_items = []
+        for number, entry in enumerate(self.manifest, start=1):
+            existing_answer = existing_answers.get(entry.id)
+            user_answer_data = None
+            if existing_answer:
+                if entry.response_format == 'text':
+                    user_answer_data = existing_answer.answer_text
+                elif entry.response_format == 'number':
+                    user_answer_data = existing_answer.answer_number
+                elif entry.response_format == 'choice':
+                    user_answer_data = existing_answer.answer_choice_id
+            question_items.append({
+                'question': questions_by_id[entry.id],
+                'question_number': number,
+                'user_answer_data': user_answer_data,
+            })
+
+        return {
+            'status': 'in_progress',
+            'attempt': self.attempt,
+            'question_items': question_items,
+            'total_questions': self.total_questions,
+            'error': None
+        }
+
     def process_post_request(self):
         if not self.request_post_data:
             return {'status': 'error', 'message': 'No hay datos POST para procesar.'}
@@ -64,7 +137,9 @@ class TestAttemptService:
             messages.error(self.user, "No puedes realizar acciones en un test ya finalizado.")
             return {'status': 'redirect', 'view_name': 'test_review', 'kwargs': {'test_id': self.test.id, 'attempt_id': self.attempt.id}}
 
-        if self.request_post_data.get('force_finish') == 'true':
+        if self.single_page and 'submit_test' in self.request_post_data:
+            return self._handle_bulk_submission()
+        elif self.request_post_data.get('force_finish') == 'true':
             return self._handle_force_finish()
         elif 'next_question' in self.request_post_data:
             return self._handle_next_question()
@@ -74,49 +149,120 @@ class TestAttemptService:
 
 
     def _handle_force_finish(self):
-        with transaction.atomic():
-            answered_questions_ids = Answer.objects.filter(attempt=self.attempt).values_list('question_id', flat=True)
-            unanswered_questions = [q for q in self.questions if q.id not in answered_questions_ids]
-
-            for question in unanswered_questions:
-                Answer.objects.create(
-                    attempt=self.attempt,
-                    question=question,
-                    user=self.user,
-                    answer_text="",
-                    answer_number=None,
-                    answer_choice=None,
-                    grade_status='incorrect'
-                )
-
-            if f'current_question_index_{self.attempt.id}' in self.session:
-                del self.session[f'current_question_index_{self.attempt.id}']
+        finalize_attempt(self.attempt, self.manifest)
+        return {'status': 'redirect', 'view_name': 'test_review', 'kwargs': {'test_id': self.test.id, 'attempt_id': self.attempt.id}}
 
-            self.attempt.end_time = now()
-            self.attempt.save()
+    def _handle_bulk_submission(self):
+        timed_out = self.request_post_data.get('timed_out') == 'true'
+        answers = []
+        missing_question_numbers = []
+        for number, entry in enumerate(self.manifest, start=1):
+            answer_data, user_provided_answer = self._build_answer_data(entry)
+            if not user_provided_answer:
+                missing_question_numbers.append(str(number))
+            answer = Answer(**answer_data)
+            answer.refresh_outcome()
+            answers.append(answer)
+
+        if not self.test.allow_no_response and missing_question_numbers and not timed_out:
+            return {
+                'status': 'validation_error',
+                'message': f"Debes responder todas las preguntas antes de finalizar. Faltan: {', '.join(missing_question_numbers)}."
+            }
+
+        with transaction.atomic():
+            if self._lock_open_attempt():
+                previous_score, previous_correct = self._stored_totals([answer.question_id for answer in answers])
+                with updating_rollups([self.attempt.id]):
+                    Answer.objects.bulk_create(
+                        answers,
+                        update_conflicts=True,
+                        unique_fields=['attempt', 'question'],
+                        update_fields=ANSWER_UPSERT_FIELDS,
+                    )
+                    score_delta = sum((answer.question_score for answer in answers), Decimal(0)) - previous_score
+                    correct_delta = sum(is_correct_status(answer.grade_status) for answer in answers) - previous_correct
+                    self.attempt.end_time = now()
+                    update_attempt_totals(
+                        {self.attempt.id: (score_delta, correct_delta)},
+                        {self.attempt.id: self.answer_key.max_score},
+                        end_time=self.attempt.end_time
+                    )
         return {'status': 'redirect', 'view_name': 'test_review', 'kwargs': {'test_id': self.test.id, 'attempt_id': self.attempt.id}}
 
     def _handle_next_question(self):
         if self.attempt.end_time is not None:
             return {'status': 'redirect', 'view_name': 'test_review', 'kwargs': {'test_id': self.test.id, 'attempt_id': self.attempt.id}}
 
-        if self.current_question_index >= self.total_questions:
-            if self.attempt.end_time is None:
-                self.attempt.end_time = now()
-                self.attempt.save()
-                if f'current_question_index_{self.attempt.id}' in self.session:
-                    del self.session[f'current_question_index_{self.attempt.id}']
+        result = self._submit_current_answer()
+        if result['status'] == 'validation_error':
+            return result
+        if result['status'] == 'finished':
             return {'status': 'redirect', 'view_name': 'test_review', 'kwargs': {'test_id': self.test.id, 'attempt_id': self.attempt.id}}
+        return {'status': 'redirect', 'view_name': 'test_detail', 'kwargs': {'test_id': self.test.id}}
+
+    def process_autosave(self):
+        review_url = reverse('test_review', kwargs={'test_id': self.test.id, 'attempt_id': self.attempt.id})
+        if self.attempt.end_time is not None:
+            return {'status': 'finished', 'redirect_url': review_url}
+
+        result = self._submit_current_answer()
+        if result['status'] == 'validation_error':
+            return result
+        if result['status'] == 'finished':
+            return {'status': 'finished', 'redirect_url': review_url}
+        return {'status': 'in_progress', 'question': self.get_question_payload()}
+
+    def get_question_payload(self):
+        state = self.get_current_state()
+        if state['status'] == 'finished':
+            return None
+
+        current_question = state['current_question']
+        return {
+            'id': current_question.id,
+            'statement': current_question.statement,
+            'response_format': current_question.response_format,
+            'difficulty': current_question.difficulty,
+            'skills': [skill.name for skill in current_question.skills.all()],
+            'choices': [{'id': choice.id, 'text': choice.text} for choice in current_question.choices.all()],
+            'question_number': state['question_number'],
+            'total_questions': state['total_questions'],
+            'answered': state['answered'],
+            'user_answer_data': state['user_answer_data'],
+            'allow_backtracking': state['allow_backtracking'],
+        }
+
+    def _submit_current_answer(self):
+        if self.current_question_index >= self.total_questions:
+            self._finish_attempt()
+            return {'status': 'finished'}
+
+        current_question = self.manifest[self.current_question_index]
+        answer_data, user_provided_answer = self._build_answer_data(current_question)
+
+        if not self.test.allow_no_response and not user_provided_answer:
+            return {'status': 'validation_error', 'message': "Debes responder antes de continuar."}
 
-        current_question = self.questions[self.current_question_index]
-        Answer.objects.filter(attempt=self.attempt, question=current_question).delete()
+        if not self._save_answer(answer_data):
+            self.attempt.refresh_from_db(fields=['end_time'])
+            return {'status': 'finished'}
 
+        self._move_to_question(self.current_question_index + 1)
+
+        if self.current_question_index >= self.total_questions:
+            self._finish_attempt()
+            return {'status': 'finished'}
+        return {'status': 'advanced'}
+
+    def _build_answer_data(self, current_question):
+        key_entry = get_key_entry(self.answer_key, current_question)
         user_provided_answer = False
         answer_data = {
             "attempt": self.attempt,
-            "question": current_question,
+            "question_id": current_question.id,
             "user": self.user,
-            "grade_status": "not_applicable"
+            "grade_status": "incorrect"
         }
 
         if current_question.response_format == 'text':
@@ -124,6 +270,7 @@ class TestAttemptService:
             answer_data["answer_text"] = answer_text
             if answer_text:
                 user_provided_answer = True
+                answer_data['grade_status'] = auto_grade_status(key_entry, answer_text=answer_text)
 
         elif current_question.response_format == 'number':
             answer_number_str = self.request_post_data.get(f'question_{current_question.id}', '')
@@ -132,46 +279,86 @@ class TestAttemptService:
                 try:
                     answer_data["answer_number"] = int(answer_number_str)
                     user_provided_answer = True
+                    answer_data['grade_status'] = auto_grade_status(key_entry, answer_number=answer_data["answer_number"])
                 except ValueError:
                     pass
 
         elif current_question.response_format == 'choice':
             answer_choice_id = self.request_post_data.get(f'question_{current_question.id}')
-            answer_data["answer_choice"] = None
+            answer_data["answer_choice_id"] = None
             if answer_choice_id:
                 try:
-                    answer_data["answer_choice"] = Choice.objects.get(id=answer_choice_id)
+                    answer_choice_id = int(answer_choice_id)
+                except ValueError:
+                    answer_choice_id = None
+                if answer_choice_id in current_question.choice_ids:
+                    answer_data["answer_choice_id"] = answer_choice_id
                     user_provided_answer = True
-                    answer_data['grade_status'] = 'correct' if answer_data["answer_choice"].is_correct else 'incorrect'
-                except Choice.DoesNotExist:
-                    pass
-            elif not self.test.allow_no_response:
-                answer_data['grade_status'] = 'incorrect'
+                    if answer_choice_id in key_entry.correct_choice_ids:
+                        answer_data['grade_status'] = 'correct'
 
-        if not self.test.allow_no_response and not user_provided_answer:
-            messages.warning(self.user, "Debes responder antes de continuar.")
-            return {'status': 'validation_error', 'message': "Debes responder antes de continuar."}
+        answer_data['question_score'] = answer_score(key_entry, answer_data['grade_status'])
+        return answer_data, user_provided_answer
 
-        if not user_provided_answer and current_question.response_format in ['text', 'number']:
-            answer_data['grade_status'] = 'incorrect'
+    def _lock_open_attempt(self):
+        return Attempt.objects.select_for_update().filter(id=self.attempt.id, end_time__isnull=True).exists()
 
+    def _stored_totals(self, question_ids):
+        score, correct = Decimal(0), 0
+        stored_answers = Answer.objects.filter(attempt_id=self.attempt.id, question_id__in=question_ids).values_list(
+            'question_score', 'grade_status', 'is_correct_manual'
+        )
+        for question_score, grade_status, is_correct_manual in stored_answers:
+            score += question_score or Decimal(0)
+            correct += is_correct_status(grade_status, is_correct_manual)
+        return score, correct
+
+    def _save_answer(self, answer_data):
         with transaction.atomic():
-            Answer.objects.create(**answer_data)
+            if not self._lock_open_attempt():
+                return False
+            previous_score, previous_correct = self._stored_totals([answer_data['question_id']])
+            answer = Answer(**answer_data)
+            answer.refresh_outcome()
+            Answer.objects.bulk_create(
+                [answer],
+                update_conflicts=True,
+                unique_fields=['attempt', 'question'],
+                update_fields=ANSWER_UPSERT_FIELDS,
+            )
+            update_attempt_totals(
+                {self.attempt.id: (
+                    answer_data['question_score'] - previous_score,
+                    is_correct_status(answer_data['grade_status']) - previous_correct
+                )},
+                {self.attempt.id: self.answer_key.max_score}
+            )
+        return True
 
-        self.session[f'current_question_index_{self.attempt.id}'] += 1
+    def _finish_attempt(self):
+        if self.attempt.end_time is None:
+            self.attempt.end_time = now()
+            with transaction.atomic():
+                if self._lock_open_attempt():
+                    with updating_rollups([self.attempt.id]):
+                        Attempt.objects.filter(id=self.attempt.id).update(end_time=self.attempt.end_time, updated_at=now())
 
-        if self.session[f'current_question_index_{self.attempt.id}'] >= self.total_questions:
-            if self.attempt.end_time is None:
-                self.attempt.end_time = now()
-                self.attempt.save()
-                if f'current_question_index_{self.attempt.id}' in self.session:
-                    del self.session[f'current_question_index_{self.attempt.id}']
-            return {'status': 'redirect', 'view_name': 'test_review', 'kwargs': {'test_id': self.test.id, 'attempt_id': self.attempt.id}}
+    def _move_to_question(self, new_index):
+        step = new_index - self.current_question_index
+        moved = Attempt.objects.filter(
+            id=self.attempt.id,
+            current_question_index=self.current_question_index
+        ).update(current_question_index=F('current_question_index') + step)
+
+        if moved:
+            self.current_question_index = new_index
         else:
-            return {'status': 'redirect', 'view_name': 'test_detail', 'kwargs': {'test_id': self.test.id}}
+            self.attempt.refresh_from_db(fields=['current_question_index'])
+            self.current_question_index = self.attempt.current_question_index
+        self.attempt.current_question_index = self.current_question_index
 
     def _handle_previous_question(self):
         if self.current_question_index > 0:
-            self.session[f'current_question_index_{self.attempt.id}'] -= 1
+            self._move_to_question(self.current_question_index - 1)
             return {'status': 'redirect', 'view_name': 'test_detail', 'kwargs': {'test_id': self.test.id}}
         return {'status': 'no_action'}
\ No newline at end of file
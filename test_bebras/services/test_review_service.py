@@ -1,22 +1,26 @@
-import json
+import hashlib
 from django.db import transaction
+from django.db.models import Max
 from django.shortcuts import get_object_or_404
-from decimal import Decimal, InvalidOperation
+from decimal import Decimal
 from django.utils import timezone
+from django.utils.http import quote_etag
 
-from ..models import Test, Attempt, Answer, Choice
+from ..models import Test, Attempt, Answer
+from .answer_key import get_answer_key, get_key_entry, record_answer_decisions
+from .scoring_service import manual_grade_for, normalized_answer_value, update_attempt_totals
+from .score_distribution_service import get_score_distribution, percentile_rank
+from .statistics_rollup_service import updating_rollups
 
 class TestReviewService:
     def __init__(self, test_id, attempt_id, request_user=None, post_data=None):
         self.test = get_object_or_404(Test, id=test_id)
         self.attempt = get_object_or_404(Attempt, id=attempt_id)
-        self.answers = Answer.objects.filter(attempt=self.attempt).select_related('question', 'answer_choice')
-        self.total_questions = self.test.questions.count()
-
-        self.points_per_difficulty = {k: Decimal(str(v)) for k, v in (self.test.points_per_difficulty or {}).items()}
-        self.penalty_type = self.test.penalty_type
-        self.fixed_penalty = Decimal(str(self.test.fixed_penalty or 0))
-        self.penalty_by_difficulty = {k: Decimal(str(v)) for k, v in (self.test.penalty_by_difficulty or {}).items()}
+        self.answers = Answer.objects.filter(attempt=self.attempt).select_related(
+            'question', 'answer_choice'
+        ).prefetch_related('question__skills')
+        self.answer_key = get_answer_key(self.test)
+        self.total_questions = self.test.question_count
 
         self.total_correct = 0
         self.total_raw_score = Decimal(0)
@@ -27,70 +31,16 @@ class TestReviewService:
         self.post_data = post_data
 
     def _calculate_answer_score_and_status(self, answer):
-        is_correct_current = False
-        question_score_value = Decimal(0)
         correct_answer_display = "No disponible"
-        difficulty = answer.question.difficulty
-        question_status = ""
+        key_entry = get_key_entry(self.answer_key, answer.question)
+        if key_entry.response_format == 'choice':
+            correct_answer_display = key_entry.correct_choice_text or correct_answer_display
+        elif key_entry.correct_answer:
+            correct_answer_display = key_entry.correct_answer
 
-        if answer.question.response_format == 'choice':
-            correct_choice = answer.question.choices.filter(is_correct=True).first()
-            if correct_choice:
-                correct_answer_display = correct_choice.text
-            is_correct_auto = answer.answer_choice and answer.answer_choice.is_correct
-            
-            question_status = 'correct' if is_correct_auto else 'incorrect'
-            is_correct_current = is_correct_auto 
-
-        elif answer.question.response_format == 'text' or answer.question.response_format == 'number':
-            auto_is_correct_text_num = False
-            if answer.question.response_format == 'text':
-                if answer.question.correct_answer:
-                    correct_answer_display = answer.question.correct_answer
-                if answer.answer_text is not None and answer.answer_text != "" and answer.question.correct_answer:
-                    auto_is_correct_text_num = answer.answer_text.strip().lower() == answer.question.correct_answer.strip().lower()
-            elif answer.question.response_format == 'number':
-                if answer.question.correct_answer:
-                    correct_answer_display = answer.question.correct_answer
-                if answer.answer_number is not None and correct_answer_display is not None:
-                    try:
-                        user_num = Decimal(str(answer.answer_number))
-                        correct_num = Decimal(str(correct_answer_display))
-                        auto_is_correct_text_num = user_num == correct_num
-                    except (ValueError, InvalidOperation):
-                        auto_is_correct_text_num = False
-
-            if answer.grade_status == 'graded':
-                question_status = "graded"
-                is_correct_current = answer.is_correct_manual
-            else:
-                user_attempted_to_answer = (answer.question.response_format == 'text' and answer.answer_text is not None and answer.answer_text != "") or \
-                                           (answer.question.response_format == 'number' and answer.answer_number is not None)
-                
-                if user_attempted_to_answer:
-                    if auto_is_correct_text_num:
-                        question_status = "correct"
-                        is_correct_current = True
-                    else:
-                        question_status = "pending"
-                        is_correct_current = False
-                else:
-                    question_status = "incorrect"
-                    is_correct_current = False
-
-        if question_status == "correct":
-            question_score_value = self.points_per_difficulty.get(str(difficulty), Decimal(0))
-        elif question_status == "incorrect":
-            if self.penalty_type == 'fixed':
-                question_score_value = -self.fixed_penalty
-            elif self.penalty_type == 'by_difficulty':
-                question_score_value = -self.penalty_by_difficulty.get(str(difficulty), Decimal(0))
-            else:
-                question_score_value = Decimal(0)
-        elif question_status == "pending":
-            question_score_value = Decimal(0)
-        elif question_status == "graded":
-            question_score_value = answer.manual_grade if answer.manual_grade is not None else Decimal('0.0')
+        question_status = answer.grade_status
+        is_correct_current = answer.outcome == 'correct'
+        question_score_value = answer.question_score if answer.question_score is not None else Decimal(0)
 
         user_answer_display = 'Sin respuesta'
         if answer.question.response_format == 'choice':
@@ -117,34 +67,11 @@ class TestReviewService:
         }
 
     def calculate_review_results(self):
-        self.total_correct = 0
-        self.total_raw_score = Decimal(0)
-        self.question_results = []
-
-        for answer in self.answers:
-            result = self._calculate_answer_score_and_status(answer)
-            self.question_results.append(result)
-
-            if result['status'] == 'correct' or \
-               (result['status'] == 'graded' and result['is_correct_auto']):
-                self.total_correct += 1
-            
-            self.total_raw_score += result['question_score']
-
-        max_possible_test_score = Decimal(0)
-        for q in self.test.questions.all():
-            max_possible_test_score += self.points_per_difficulty.get(str(q.difficulty), Decimal(0))
-
-        if max_possible_test_score > Decimal(0):
-            self.final_percentage_score = (self.total_raw_score / max_possible_test_score) * Decimal(100)
-            self.final_percentage_score = max(Decimal(0), min(Decimal(100), self.final_percentage_score))
-        else:
-            self.final_percentage_score = Decimal(0)
-
-        with transaction.atomic():
-            self.attempt.score = self.final_percentage_score
-            self.attempt.correct_count = self.total_correct
-            self.attempt.save()
+        self.question_results = [self._calculate_answer_score_and_status(answer) for answer in self.answers]
+        self.total_correct = self.attempt.correct_count
+        self.total_raw_score = self.attempt.raw_score
+        self.final_percentage_score = self.attempt.score
+        distribution = get_score_distribution(self.test.id) if self.attempt.end_time else None
 
         return {
             'test': self.test,
@@ -153,49 +80,60 @@ class TestReviewService:
             'total_score': self.final_percentage_score,
             'raw_score': self.total_raw_score,
             'question_results': self.question_results,
-            'attempt_id': self.attempt.id
+            'attempt_id': self.attempt.id,
+            'percentile_rank': percentile_rank(distribution.sorted_scores, self.final_percentage_score) if distribution else None,
+            'compared_attempts': len(distribution.sorted_scores) if distribution else 0,
         }
 
     @transaction.atomic
     def process_manual_corrections(self):
         updated_answers = []
+        score_delta, correct_delta = Decimal(0), 0
         for answer in self.answers:
             if answer.grade_status == 'pending' and \
                answer.question.response_format in ['text', 'number']:
-                
+
                 checkbox_name = f'is_correct_manual_{answer.id}'
                 is_correct_manual_checked = checkbox_name in self.post_data
 
                 if is_correct_manual_checked != (answer.is_correct_manual if answer.is_correct_manual is not None else False):
+                    previous_score = answer.question_score or Decimal(0)
                     answer.is_correct_manual = is_correct_manual_checked
                     answer.grade_status = 'graded'
                     answer.graded_by = self.request_user
                     answer.graded_at = timezone.now()
+                    answer.manual_grade = manual_grade_for(get_key_entry(self.answer_key, answer.question), answer.is_correct_manual)
+                    answer.question_score = answer.manual_grade
+                    answer.refresh_outcome()
 
-                    if answer.is_correct_manual:
-                        test_points_config = self.test.points_per_difficulty
-                        if test_points_config and str(answer.question.difficulty) in test_points_config:
-                            answer.manual_grade = Decimal(str(test_points_config[str(answer.question.difficulty)]))
-                        else:
-                            answer.manual_grade = Decimal('0.0')
-                    else:
-                        calculated_penalty = Decimal('0.0')
-                        test_penalty_type = self.test.penalty_type
-                        if test_penalty_type == 'fixed':
-                            calculated_penalty = self.test.fixed_penalty if self.test.fixed_penalty is not None else Decimal('0.0')
-                        elif test_penalty_type == 'by_difficulty':
-                            penalty_config = self.test.penalty_by_difficulty
-                            if penalty_config and str(answer.question.difficulty) in penalty_config:
-                                calculated_penalty = Decimal(str(penalty_config[str(answer.question.difficulty)]))
-                            else:
-                                calculated_penalty = Decimal('0.0')
-                        answer.manual_grade = -calculated_penalty
-                    
+                    score_delta += answer.question_score - previous_score
+                    correct_delta += int(answer.is_correct_manual)
                     updated_answers.append(answer)
-        
-        if updated_answers:
-            Answer.objects.bulk_update(updated_answers, ['is_correct_manual', 'grade_status', 'graded_by', 'graded_at', 'manual_grade'])
 
-        recalculated_results = self.calculate_review_results()
-        
-        return True
\ No newline at end of file
+        if updated_answers:
+            with updating_rollups([self.attempt.id]):
+                Answer.objects.bulk_update(
+                    updated_answers,
+                    ['is_correct_manual', 'grade_status', 'graded_by', 'graded_at', 'manual_grade', 'question_score', 'outcome']
+                )
+                update_attempt_totals(
+                    {self.attempt.id: (score_delta, correct_delta)},
+                    {self.attempt.id: self.test.max_score}
+                )
+            for answer in updated_answers:
+                normalized = normalized_answer_value(answer.answer_text, answer.answer_number)
+                if normalized is not None:
+                    record_answer_decisions(answer.question_id, [normalized], answer.is_correct_manual)
+
+        return True
+
+
+def review_validators(attempt, viewer):
+    last_graded_at = Answer.objects.filter(attempt=attempt).aggregate(last=Max('graded_at'))['last']
+    last_modified = max(filter(None, (attempt.end_time, last_graded_at)))
+    fingerprint = ':'.join(str(part) for part in (
+        attempt.id, viewer.id, attempt.end_time.isoformat(),
+        last_graded_at.isoformat() if last_graded_at else '', attempt.raw_score, attempt.score,
+        get_score_distribution(attempt.test_id).version,
+    ))
+    return quote_etag(hashlib.sha1(fingerprint.encode()).hexdigest()), int(last_modified.timestamp())
@@ -0,0 +1,24 @@
+from collections import defaultdict
+
+from ..models import Test
+from .scoring_service import ScoringPolicy
+
+
+def compute_test_totals(test, difficulties):
+    return len(difficulties), ScoringPolicy(test).max_score(difficulties)
+
+
+def refresh_test_totals(test_ids):
+    test_ids = set(test_ids)
+    if not test_ids:
+        return 0
+
+    difficulties_by_test = defaultdict(list)
+    memberships = Test.questions.through.objects.filter(test_id__in=test_ids).values_list('test_id', 'question__difficulty')
+    for test_id, difficulty in memberships:
+        difficulties_by_test[test_id].append(difficulty)
+
+    tests = list(Test.objects.filter(id__in=test_ids))
+    for test in tests:
+        test.question_count, test.max_score = compute_test_totals(test, difficulties_by_test[test.id])
+    return Test.objects.bulk_update(tests, ['question_count', 'max_score'])
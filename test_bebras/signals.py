@@ -0,0 +1,106 @@
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import Attempt, Choice, IndexedAnswer, Question, Skill, Test
+from .services.activity_rollup_service import remove_from_activity_rollups
+from .services.answer_key import invalidate_answer_keys, invalidate_answer_keys_for_questions
+from .services.statistics_rollup_service import invalidate_statistics, refresh_skill_rollups, remove_from_rollups
+from .services.test_totals_service import refresh_test_totals
+
+
+def bump_question_content_version(question_id):
+    Question.objects.filter(id=question_id).update(content_version=F('content_version') + 1)
+
+
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def choice_changed(sender, instance, **kwargs):
+    bump_question_content_version(instance.question_id)
+    invalidate_answer_keys_for_questions([instance.question_id])
+
+
+@receiver(post_save, sender=IndexedAnswer)
+@receiver(post_delete, sender=IndexedAnswer)
+def indexed_answer_changed(sender, instance, **kwargs):
+    invalidate_answer_keys_for_questions([instance.question_id])
+
+
+@receiver(post_save, sender=Skill)
+def skill_changed(sender, instance, created, **kwargs):
+    if not created:
+        Question.objects.filter(skills=instance).update(content_version=F('content_version') + 1)
+
+
+@receiver(m2m_changed, sender=Question.skills.through)
+def question_skills_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        if pk_set:
+            Question.objects.filter(id__in=pk_set).update(content_version=F('content_version') + 1)
+    else:
+        bump_question_content_version(instance.id)
+
+    if reverse and action == 'post_clear':
+        test_ids = instance.test_rollups.values_list('test_id', flat=True)
+    else:
+        question_ids = (pk_set or []) if reverse else [instance.id]
+        test_ids = Test.questions.through.objects.filter(question_id__in=question_ids).values_list('test_id', flat=True)
+    refresh_skill_rollups(test_ids)
+
+
+@receiver(post_save, sender=Question)
+def question_changed(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_answer_keys_for_questions([instance.id])
+        refresh_test_totals(instance.tests_assigned.values_list('id', flat=True))
+
+
+@receiver(pre_delete, sender=Question)
+def question_deleting(sender, instance, **kwargs):
+    invalidate_answer_keys_for_questions([instance.id])
+    instance._test_ids = list(instance.tests_assigned.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Question)
+def question_deleted(sender, instance, **kwargs):
+    refresh_test_totals(getattr(instance, '_test_ids', []))
+
+
+@receiver(post_save, sender=Test)
+def test_changed(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_answer_keys([instance.id])
+        refresh_test_totals([instance.id])
+
+
+@receiver(m2m_changed, sender=Test.questions.through)
+def test_questions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear', 'pre_clear'):
+        return
+    if reverse:
+        if action == 'pre_clear':
+            invalidate_answer_keys_for_questions([instance.id])
+            instance._test_ids = list(instance.tests_assigned.values_list('id', flat=True))
+        elif action == 'post_clear':
+            refresh_test_totals(getattr(instance, '_test_ids', []))
+        elif pk_set:
+            invalidate_answer_keys(pk_set)
+            refresh_test_totals(pk_set)
+    elif action != 'pre_clear':
+        invalidate_answer_keys([instance.id])
+        refresh_test_totals([instance.id])
+
+
+@receiver(pre_delete, sender=Attempt)
+def attempt_deleting(sender, instance, **kwargs):
+    remove_from_rollups([instance.id])
+    remove_from_activity_rollups(instance)
+    invalidate_statistics([instance.test_id])
+
+
+@receiver(post_save, sender=Attempt)
+def attempt_saved(sender, instance, created, **kwargs):
+    if created:
+        invalidate_statistics([instance.test_id])
@@ -1,30 +1,53 @@
 document.addEventListener('DOMContentLoaded', function() {
     Chart.register(ChartDataLabels);
 
-    const userAttemptsDataElement = document.querySelector('script[type="application/json"][data-id="user_attempt_counts_json"]');
-    const overallPerformanceDataElement = document.querySelector('script[type="application/json"][data-id="overall_performance_json"]');
-    const skillPerformanceDataElement = document.querySelector('script[type="application/json"][data-id="skill_performance_data_json"]');
+    function loadStatistic(container, hasData, render) {
+        const loadingElement = container.querySelector('.statistic-loading');
+        const emptyElement = container.querySelector('.statistic-empty');
+        const canvases = container.querySelectorAll('canvas');
 
-    let userAttemptsData = [];
-    let overallPerformanceData = {};
-    let skillPerformanceData = [];
-
-    if (userAttemptsDataElement) {
-        userAttemptsData = JSON.parse(userAttemptsDataElement.textContent);
-    }
-    if (overallPerformanceDataElement) {
-        overallPerformanceData = JSON.parse(overallPerformanceDataElement.textContent);
+        fetch(container.dataset.statisticUrl, {
+            credentials: 'same-origin',
+            headers: { 'Accept': 'application/json' }
+        })
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error('HTTP ' + response.status);
+                }
+                return response.json();
+            })
+            .then(data => {
+                if (loadingElement) loadingElement.style.display = 'none';
+                if (hasData(data)) {
+                    render(data);
+                } else {
+                    canvases.forEach(canvas => { canvas.style.display = 'none'; });
+                    if (emptyElement) emptyElement.style.display = 'block';
+                }
+            })
+            .catch(() => {
+                canvases.forEach(canvas => { canvas.style.display = 'none'; });
+                if (loadingElement) loadingElement.textContent = 'No se pudieron cargar los datos.';
+            });
     }
-    if (skillPerformanceDataElement) {
-        skillPerformanceData = JSON.parse(skillPerformanceDataElement.textContent);
+
+    function renderUserAttempts(data) {
+        const tableWrapper = document.querySelector('.user-attempts-table');
+        const tableBody = tableWrapper.querySelector('tbody');
+        data.forEach(userData => {
+            const row = tableBody.insertRow();
+            row.insertCell().textContent = userData.username;
+            row.insertCell().textContent = userData.attempts;
+        });
+        tableWrapper.style.display = 'block';
     }
 
-    if (overallPerformanceData && overallPerformanceData.total_attempts_count > 0) {
+    function renderOverallPerformance(data) {
         const overallLabels = ['Correctas', 'Incorrectas', 'No Respondidas'];
         const overallCounts = [
-            overallPerformanceData.correct,
-            overallPerformanceData.incorrect,
-            overallPerformanceData.unanswered
+            data.correct,
+            data.incorrect,
+            data.unanswered
         ];
         const overallColors = ['#28a745', '#dc3545', '#ffc107'];
 
@@ -64,19 +87,12 @@ document.addEventListener('DOMContentLoaded', function() {
                 }
             }
         });
-    } else {
-        const overallPerformanceCtx = document.getElementById('overallPerformanceChart');
-        if (overallPerformanceCtx) {
-            overallPerformanceCtx.style.display = 'none';
-            const messageElement = overallPerformanceCtx.parentNode.querySelector('.text-muted.text-center.mt-3');
-            if (messageElement) messageElement.style.display = 'block';
-        }
     }
 
-    if (skillPerformanceData && skillPerformanceData.length > 0) {
-        const skillLabels = skillPerformanceData.map(item => item.skill_name);
-        const correctData = skillPerformanceData.map(item => item.correct);
-        const incorrectData = skillPerformanceData.map(item => item.incorrect);
+    function renderSkillPerformance(data) {
+        const skillLabels = data.map(item => item.skill_name);
+        const correctData = data.map(item => item.correct);
+        const incorrectData = data.map(item => item.incorrect);
 
         const skillPerformanceCtx = document.getElementById('skillPerformanceChart').getContext('2d');
         new Chart(skillPerformanceCtx, {
@@ -150,12 +166,192 @@ document.addEventListener('DOMContentLoaded', function() {
                 }
             }
         });
-    } else {
-        const skillPerformanceCtx = document.getElementById('skillPerformanceChart');
-        if (skillPerformanceCtx) {
-            skillPerformanceCtx.style.display = 'none';
-            const messageElement = skillPerformanceCtx.parentNode.querySelector('.text-muted.text-center.mt-3');
-            if (messageElement) messageElement.style.display = 'block';
-        }
     }
-});
\ No newline at end of file
+
+    function renderActivityTrend(data) {
+        const activityTrendCtx = document.getElementById('activityTrendChart').getContext('2d');
+        new Chart(activityTrendCtx, {
+            type: 'bar',
+            data: {
+                labels: data.daily.map(item => item.day),
+                datasets: [
+                    {
+                        label: 'Intentos iniciados',
+                        data: data.daily.map(item => item.started),
+                        backgroundColor: 'rgba(54, 162, 235, 0.6)',
+                        yAxisID: 'y'
+                    },
+                    {
+                        label: 'Intentos finalizados',
+                        data: data.daily.map(item => item.finished),
+                        backgroundColor: 'rgba(75, 192, 192, 0.6)',
+                        yAxisID: 'y'
+                    },
+                    {
+                        type: 'line',
+                        label: 'Puntaje promedio (%)',
+                        data: data.daily.map(item => item.average_score),
+                        borderColor: 'rgba(255, 159, 64, 1)',
+                        backgroundColor: 'rgba(255, 159, 64, 1)',
+                        spanGaps: true,
+                        yAxisID: 'score'
+                    }
+                ]
+            },
+            options: {
+                responsive: true,
+                maintainAspectRatio: false,
+                plugins: {
+                    legend: {
+                        position: 'top'
+                    },
+                    datalabels: {
+                        display: false
+                    }
+                },
+                scales: {
+                    y: {
+                        beginAtZero: true,
+                        ticks: {
+                            precision: 0
+                        },
+                        title: {
+                            display: true,
+                            text: 'Intentos por día'
+                        }
+                    },
+                    score: {
+                        position: 'right',
+                        min: 0,
+                        max: 100,
+                        grid: {
+                            drawOnChartArea: false
+                        },
+                        title: {
+                            display: true,
+                            text: 'Puntaje promedio (%)'
+                        }
+                    }
+                }
+            }
+        });
+
+        const weeklyCompletionCtx = document.getElementById('weeklyCompletionChart').getContext('2d');
+        new Chart(weeklyCompletionCtx, {
+            type: 'line',
+            data: {
+                labels: data.weekly.map(item => item.week),
+                datasets: [{
+                    label: 'Tasa de finalización semanal (%)',
+                    data: data.weekly.map(item => item.completion_rate),
+                    borderColor: 'rgba(153, 102, 255, 1)',
+                    backgroundColor: 'rgba(153, 102, 255, 0.2)',
+                    fill: true,
+                    spanGaps: true
+                }]
+            },
+            options: {
+                responsive: true,
+                maintainAspectRatio: false,
+                plugins: {
+                    legend: {
+                        position: 'top'
+                    },
+                    datalabels: {
+                        display: false
+                    }
+                },
+                scales: {
+                    y: {
+                        beginAtZero: true,
+                        suggestedMax: 100,
+                        title: {
+                            display: true,
+                            text: 'Finalizados / iniciados (%)'
+                        }
+                    }
+                }
+            }
+        });
+    }
+
+    function renderScoreDistribution(data) {
+        const summaryElement = document.querySelector('.score-distribution-summary');
+        summaryElement.textContent = 'Intentos: ' + data.count +
+            ' · Promedio: ' + data.mean.toFixed(2) + '%' +
+            ' · Q1: ' + data.quartiles.q1.toFixed(2) + '%' +
+            ' · Mediana: ' + data.quartiles.median.toFixed(2) + '%' +
+            ' · Q3: ' + data.quartiles.q3.toFixed(2) + '%';
+        summaryElement.style.display = 'block';
+
+        const scoreDistributionCtx = document.getElementById('scoreDistributionChart').getContext('2d');
+        new Chart(scoreDistributionCtx, {
+            type: 'bar',
+            data: {
+                labels: data.histogram.map(bin => bin.from + '–' + bin.to + '%'),
+                datasets: [{
+                    label: 'Intentos',
+                    data: data.histogram.map(bin => bin.count),
+                    backgroundColor: 'rgba(52, 58, 64, 0.6)',
+                    borderColor: 'rgba(52, 58, 64, 1)',
+                    borderWidth: 1
+                }]
+            },
+            options: {
+                responsive: true,
+                maintainAspectRatio: false,
+                plugins: {
+                    legend: {
+                        display: false
+                    },
+                    datalabels: {
+                        anchor: 'end',
+                        align: 'top',
+                        formatter: value => value > 0 ? value : '',
+                        color: '#000'
+                    }
+                },
+                scales: {
+                    x: {
+                        title: {
+                            display: true,
+                            text: 'Puntaje'
+                        }
+                    },
+                    y: {
+                        beginAtZero: true,
+                        ticks: {
+                            precision: 0
+                        },
+                        title: {
+                            display: true,
+                            text: 'Intentos'
+                        }
+                    }
+                }
+            }
+        });
+    }
+
+    const userAttemptsContainer = document.querySelector('.user-attempts-container');
+    const overallPerformanceContainer = document.querySelector('.general-performance-chart-container');
+    const skillPerformanceContainer = document.querySelector('.skill-performance-chart-container');
+    const scoreDistributionContainer = document.querySelector('.score-distribution-chart-container');
+    const activityTrendContainer = document.querySelector('.activity-trend-chart-container');
+
+    if (userAttemptsContainer) {
+        loadStatistic(userAttemptsContainer, data => data.length > 0, renderUserAttempts);
+    }
+    if (overallPerformanceContainer) {
+        loadStatistic(overallPerformanceContainer, data => data.total_attempts_count > 0, renderOverallPerformance);
+    }
+    if (skillPerformanceContainer) {
+        loadStatistic(skillPerformanceContainer, data => data.length > 0, renderSkillPerformance);
+    }
+    if (scoreDistributionContainer) {
+        loadStatistic(scoreDistributionContainer, data => data.count > 0, renderScoreDistribution);
+    }
+    if (activityTrendContainer) {
+        loadStatistic(activityTrendContainer, data => data.daily.length > 0, renderActivityTrend);
+    }
+});
@@ -1,7 +1,7 @@
 document.addEventListener("DOMContentLoaded", function () {
     const form = document.getElementById("test-form");
-    const nextButton = form.querySelector(".btn-next");
-    const inputs = form.querySelectorAll("input");
+    let nextButton = form.querySelector(".btn-next");
+    let inputs = form.querySelectorAll("input:not([type=hidden])");
     const timerElement = document.getElementById("timer");
     const timerContainer = document.querySelector(".timer");
 
@@ -10,14 +10,14 @@ document.addEventListener("DOMContentLoaded", function () {
     const attemptId = timerContainer.dataset.attemptId;
     const allowBacktracking = timerContainer.dataset.allowBacktracking === "true";
     const allowNoResponse = timerContainer.dataset.allowNoResponse === "true";
+    const singlePage = timerContainer.dataset.deliveryMode === "single_page";
 
-    const storageKey = `timeLeft-${testId}-${attemptId}`;
+    const answersStorageKey = `answers-${testId}-${attemptId}`;
 
-    const savedTimeLeft = localStorage.getItem(storageKey);
-    let timeLeft = savedTimeLeft ? parseInt(savedTimeLeft, 10) : totalTestTime;
+    let timeLeft = totalTestTime;
     
     function checkInput() {
-        if (allowNoResponse) {
+        if (allowNoResponse || singlePage) {
             nextButton.disabled = false;
             return;
         }
@@ -33,12 +33,187 @@ document.addEventListener("DOMContentLoaded", function () {
         nextButton.disabled = !isFilled;
     }    
 
-    inputs.forEach(input => {
-        input.addEventListener("input", checkInput);
-        input.addEventListener("change", checkInput);
-    });
+    const savedChoice = form.dataset.userAnswer;
+    if (savedChoice) {
+        form.querySelectorAll("input[type=radio]").forEach(radio => {
+            radio.checked = radio.value === savedChoice;
+        });
+    }
+
+    function bindInputs() {
+        inputs = form.querySelectorAll("input:not([type=hidden])");
+        inputs.forEach(input => {
+            input.addEventListener("input", checkInput);
+            input.addEventListener("change", checkInput);
+        });
+        checkInput();
+    }
+
+    bindInputs();
+
+    function saveAnswersLocally() {
+        const answers = {};
+        inputs.forEach(input => {
+            if (input.type === "radio") {
+                if (input.checked) {
+                    answers[input.name] = input.value;
+                }
+            } else if (input.value.trim() !== "") {
+                answers[input.name] = input.value;
+            }
+        });
+        localStorage.setItem(answersStorageKey, JSON.stringify(answers));
+    }
+
+    function restoreLocalAnswers() {
+        const savedAnswers = JSON.parse(localStorage.getItem(answersStorageKey) || "{}");
+        inputs.forEach(input => {
+            if (!(input.name in savedAnswers)) {
+                return;
+            }
+            if (input.type === "radio") {
+                input.checked = input.value === savedAnswers[input.name];
+            } else {
+                input.value = savedAnswers[input.name];
+            }
+        });
+    }
+
+    if (singlePage) {
+        restoreLocalAnswers();
+        inputs.forEach(input => {
+            input.addEventListener("input", saveAnswersLocally);
+            input.addEventListener("change", saveAnswersLocally);
+        });
+    }
+
+    function renderAnswerSpace(question) {
+        const answerSpace = document.createElement("div");
+        answerSpace.className = "answer-space";
+        const inputName = `question_${question.id}`;
+
+        if (question.response_format === "choice") {
+            answerSpace.classList.add("choices");
+            question.choices.forEach(choice => {
+                const label = document.createElement("label");
+                label.className = "choice-item";
+                const radio = document.createElement("input");
+                radio.type = "radio";
+                radio.name = inputName;
+                radio.value = choice.id;
+                radio.checked = question.user_answer_data === choice.id;
+                const content = document.createElement("span");
+                content.className = "choice-content";
+                content.innerHTML = choice.text;
+                label.appendChild(radio);
+                label.appendChild(content);
+                answerSpace.appendChild(label);
+                answerSpace.appendChild(document.createElement("br"));
+            });
+        } else {
+            const input = document.createElement("input");
+            input.type = question.response_format === "number" ? "number" : "text";
+            input.name = inputName;
+            input.value = question.user_answer_data === null ? "" : question.user_answer_data;
+            answerSpace.appendChild(input);
+        }
+        return answerSpace;
+    }
 
-    checkInput(); 
+    function renderNavigation(question) {
+        const navigation = form.querySelector(".navigation-buttons");
+        navigation.innerHTML = "";
+        if (question.allow_backtracking && question.question_number > 1) {
+            const prevButton = document.createElement("button");
+            prevButton.type = "submit";
+            prevButton.name = "previous_question";
+            prevButton.className = "btn-prev";
+            prevButton.innerText = "Anterior";
+            navigation.appendChild(prevButton);
+        }
+        nextButton = document.createElement("button");
+        nextButton.type = "submit";
+        nextButton.name = "next_question";
+        nextButton.className = "btn-next";
+        nextButton.innerText = "Siguiente";
+        navigation.appendChild(nextButton);
+    }
+
+    function renderSidebar(question) {
+        const sidebar = document.getElementById("question-sidebar");
+        if (!sidebar) {
+            return;
+        }
+        sidebar.innerHTML = "";
+        const difficulty = document.createElement("p");
+        difficulty.innerHTML = "<strong>Dificultad:</strong> ";
+        difficulty.appendChild(document.createTextNode(question.difficulty));
+        sidebar.appendChild(difficulty);
+        if (question.skills.length > 0) {
+            const title = document.createElement("p");
+            title.innerHTML = "<strong>Habilidades relacionadas:</strong>";
+            sidebar.appendChild(title);
+            const list = document.createElement("ul");
+            question.skills.forEach(skill => {
+                const item = document.createElement("li");
+                item.innerText = skill;
+                list.appendChild(item);
+            });
+            sidebar.appendChild(list);
+        }
+    }
+
+    function showError(message) {
+        const errorElement = document.getElementById("question-error");
+        errorElement.innerText = message || "";
+        errorElement.hidden = !message;
+    }
+
+    function renderQuestion(question) {
+        document.getElementById("question-heading").innerText = `Pregunta ${question.question_number} de ${question.total_questions}`;
+        document.getElementById("question-statement").innerHTML = question.statement;
+        const answerContainer = document.getElementById("answer-container");
+        answerContainer.innerHTML = "";
+        answerContainer.appendChild(renderAnswerSpace(question));
+        renderNavigation(question);
+        renderSidebar(question);
+        showError(null);
+        bindInputs();
+    }
+
+    const autosaveUrl = form.dataset.autosaveUrl;
+
+    form.addEventListener("submit", function (event) {
+        if (!autosaveUrl || !event.submitter || event.submitter.name !== "next_question") {
+            return;
+        }
+        event.preventDefault();
+        nextButton.disabled = true;
+
+        fetch(autosaveUrl, {
+            method: "POST",
+            body: new FormData(form),
+            headers: { "X-Requested-With": "XMLHttpRequest" },
+        })
+            .then(response => response.json())
+            .then(data => {
+                if (data.status === "finished") {
+                    window.location.href = data.redirect_url;
+                } else if (data.status === "in_progress") {
+                    renderQuestion(data.question);
+                } else {
+                    showError(data.message);
+                    checkInput();
+                }
+            })
+            .catch(() => {
+                const nextInput = document.createElement("input");
+                nextInput.type = "hidden";
+                nextInput.name = "next_question";
+                form.appendChild(nextInput);
+                form.submit();
+            });
+    });
 
     if (!allowBacktracking) {
         window.history.pushState(null, "", window.location.href);
@@ -54,10 +229,8 @@ document.addEventListener("DOMContentLoaded", function () {
         
         if (timeLeft <= 0) {
             clearInterval(timerInterval);
-            localStorage.removeItem(storageKey);
             handleTimeout()
         } else {
-            localStorage.setItem(storageKey, timeLeft);
             timeLeft--;
         }
     }
@@ -65,31 +238,48 @@ document.addEventListener("DOMContentLoaded", function () {
     let timerInterval = setInterval(updateTimer, 1000);
 
     Object.keys(localStorage).forEach(function(key) {
-        if (key.startsWith("timeLeft-") && !key.includes(`${testId}-${attemptId}`)) {
+        if (key.startsWith("timeLeft-") || (key.startsWith("answers-") && !key.includes(`${testId}-${attemptId}`))) {
             localStorage.removeItem(key);
         }
     });
 
     function handleTimeout() {
-        const form = document.createElement('form');
-        form.method = 'POST';
-        form.action = window.location.href;
+        if (singlePage) {
+            const submitInput = document.createElement('input');
+            submitInput.type = 'hidden';
+            submitInput.name = 'submit_test';
+            form.appendChild(submitInput);
+
+            const timedOutInput = document.createElement('input');
+            timedOutInput.type = 'hidden';
+            timedOutInput.name = 'timed_out';
+            timedOutInput.value = 'true';
+            form.appendChild(timedOutInput);
+
+            localStorage.removeItem(answersStorageKey);
+            form.submit();
+            return;
+        }
+
+        const finishForm = document.createElement('form');
+        finishForm.method = 'POST';
+        finishForm.action = window.location.href;
     
         const csrfToken = document.querySelector('[name=csrfmiddlewaretoken]').value;
         const csrfInput = document.createElement('input');
         csrfInput.type = 'hidden';
         csrfInput.name = 'csrfmiddlewaretoken';
         csrfInput.value = csrfToken;
-        form.appendChild(csrfInput);
+        finishForm.appendChild(csrfInput);
     
         const forceInput = document.createElement('input');
         forceInput.type = 'hidden';
         forceInput.name = 'force_finish';
         forceInput.value = 'true';
-        form.appendChild(forceInput);
+        finishForm.appendChild(forceInput);
     
-        document.body.appendChild(form);
-        form.submit();
+        document.body.appendChild(finishForm);
+        finishForm.submit();
     }
     
 });
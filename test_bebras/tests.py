@@ -1,3 +1,891 @@
-from django.test import TestCase
+import threading
+from collections import namedtuple
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import (
+    Answer, Attempt, Choice, DailyActivityRollup, GroupMetadata, IndexedAnswer, Question, Skill, Test, TestAssignment
+)
+from .services.activity_rollup_service import refresh_activity_rollups
+from .services.answer_key import get_answer_key
+from .services.attempt_finalization_service import finalize_attempt_batch, finalize_expired_attempts
+from .services.attempt_manifest import get_attempt_manifest
+from .services.calibration_service import calibrate_difficulties, fit_rasch
+from .services.grading_queue_service import grade_answer_group
+from .services.item_analysis_service import get_item_analysis
+from .services.rescoring_service import rescore_test
+from .services.score_distribution_service import percentile_rank, summarize_scores
+from .services.scoring_service import (
+    ScoringPolicy, answer_score, is_correct_status, manual_grade_for, score_answers, to_cents, update_attempt_totals
+)
+from .services.statistics_rollup_service import invalidate_statistics, rebuild_rollups, statistics_version
+from .services.test_attempt_service import TestAttemptService
+
+
+class ConcurrentAttemptAdmissionTests(TransactionTestCase):
+    concurrent_requests = 8
+
+    def setUp(self):
+        group = Group.objects.create(name='Grupo A')
+        student_role_group = Group.objects.create(name='Estudiantes')
+        self.student = User.objects.create_user(username='alumno', email='alumno@example.com', password='clave-segura')
+        self.student.groups.add(group, student_role_group)
+
+        self.test = Test.objects.create(name='Test Bebras', maximum_time=timedelta(minutes=30), max_attempts=1)
+        self.test.questions.add(Question.objects.create(statement='Pregunta', difficulty=1, response_format='text'))
+        TestAssignment.objects.create(test=self.test, group=group)
+
+    def test_simultaneous_starts_create_a_single_open_attempt(self):
+        clients = []
+        for _ in range(self.concurrent_requests):
+            client = Client()
+            client.force_login(self.student)
+            clients.append(client)
+
+        barrier = threading.Barrier(self.concurrent_requests)
+        status_codes = []
+        errors = []
+
+        def start_test(client):
+            try:
+                barrier.wait()
+                response = client.get(reverse('test_detail', args=[self.test.id]))
+                status_codes.append(response.status_code)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=start_test, args=(client,)) for client in clients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(status_codes, [200] * self.concurrent_requests)
+        self.assertEqual(Attempt.objects.filter(user=self.student, test=self.test).count(), 1)
+        self.assertEqual(Attempt.objects.filter(user=self.student, test=self.test, end_time__isnull=True).count(), 1)
+
+
+class AttemptManifestTests(TestCase):
+    def test_manifest_keeps_the_questions_frozen_at_start(self):
+        cache.clear()
+        student = User.objects.create_user(username='alumno', email='alumno@example.com')
+        test = Test.objects.create(name='Test Bebras', maximum_time=timedelta(minutes=30))
+        questions = [Question.objects.create(statement=f'Pregunta {i}', difficulty=1, response_format='text') for i in range(3)]
+        test.questions.set(questions)
+        attempt = Attempt.objects.create(user=student, test=test)
+
+        test.questions.remove(questions[0])
+        test.questions.add(Question.objects.create(statement='Nueva', difficulty=1, response_format='text'))
+        cache.clear()
+
+        self.assertEqual([entry.id for entry in get_attempt_manifest(attempt)], [question.id for question in questions])
+
+
+class QuestionContentVersionTests(TestCase):
+    def test_saving_a_stale_instance_still_bumps_the_version(self):
+        question = Question.objects.create(statement='Pregunta', difficulty=1, response_format='text')
+        stale = Question.objects.get(id=question.id)
+
+        question.save()
+        stale.statement = 'Pregunta corregida'
+        stale.save()
+
+        self.assertEqual(stale.content_version, 3)
+        self.assertEqual(Question.objects.get(id=question.id).content_version, 3)
+
+
+class WriteTimeScoringTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        group = Group.objects.create(name='Grupo A')
+        student_role_group = Group.objects.create(name='Estudiantes')
+        self.student = User.objects.create_user(username='alumno', email='alumno@example.com')
+        self.student.groups.add(group, student_role_group)
+
+        self.test = Test.objects.create(
+            name='Test Bebras', maximum_time=timedelta(minutes=30), points_per_difficulty={'1': 10, '2': 20},
+            penalty_type='fixed', fixed_penalty=Decimal('2')
+        )
+        self.choice_question = Question.objects.create(statement='Alternativas', difficulty=1, response_format='choice')
+        self.right_choice = Choice.objects.create(question=self.choice_question, text='A', is_correct=True)
+        self.wrong_choice = Choice.objects.create(question=self.choice_question, text='B', is_correct=False)
+        self.number_question = Question.objects.create(statement='Número', difficulty=2, response_format='number', correct_answer='42')
+        self.text_question = Question.objects.create(statement='Texto', difficulty=1, response_format='text', correct_answer='hola')
+        self.test.questions.set([self.choice_question, self.number_question, self.text_question])
+        TestAssignment.objects.create(test=self.test, group=group)
+
+        self.url = reverse('test_detail', args=[self.test.id])
+        self.client.force_login(self.student)
+        self.client.get(self.url)
+        self.attempt = Attempt.objects.get(user=self.student, test=self.test)
+
+    def _answer(self, question, value):
+        return self.client.post(self.url, {f'question_{question.id}': value, 'next_question': '1'})
+
+    def _totals(self):
+        self.attempt.refresh_from_db()
+        return self.attempt.raw_score, self.attempt.correct_count, self.attempt.score
+
+    def test_answers_update_attempt_totals_when_written(self):
+        self._answer(self.choice_question, self.wrong_choice.id)
+        self.assertEqual(self._totals(), (Decimal('-2'), 0, Decimal('0')))
+
+        self.client.post(self.url, {'previous_question': '1'})
+        self._answer(self.choice_question, self.right_choice.id)
+        self.assertEqual(self._totals(), (Decimal('10'), 1, Decimal('25')))
+        self.assertEqual(Answer.objects.get(attempt=self.attempt, question=self.choice_question).grade_status, 'correct')
+
+        self._answer(self.number_question, '42')
+        self.assertEqual(self._totals(), (Decimal('30'), 2, Decimal('75')))
+
+    def test_force_finish_penalizes_unanswered_questions(self):
+        self._answer(self.choice_question, self.right_choice.id)
+        self.client.post(self.url, {'force_finish': 'true'})
+
+        self.assertEqual(self._totals(), (Decimal('6'), 1, Decimal('15')))
+        self.assertIsNotNone(self.attempt.end_time)
+        self.assertEqual(
+            sorted(Answer.objects.filter(attempt=self.attempt, outcome='unanswered').values_list('question_score', flat=True)),
+            [Decimal('-2'), Decimal('-2')]
+        )
+
+    def test_manual_grades_apply_deltas_to_each_attempt(self):
+        other_attempt = Attempt.objects.create(user=self.student, test=self.test, end_time=timezone.now(), raw_score=20, correct_count=1)
+        update_attempt_totals(
+            {self.attempt.id: (Decimal('10'), 1), other_attempt.id: (Decimal('-2'), -1)},
+            {self.attempt.id: Decimal('40'), other_attempt.id: Decimal('40')}
+        )
+        self.assertEqual(self._totals(), (Decimal('10'), 1, Decimal('25')))
+        other_attempt.refresh_from_db()
+        self.assertEqual((other_attempt.raw_score, other_attempt.correct_count, other_attempt.score), (Decimal('18'), 0, Decimal('45')))
+
+    def test_review_page_does_not_write(self):
+        self._answer(self.choice_question, self.right_choice.id)
+        self.client.post(self.url, {'force_finish': 'true'})
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('test_review', args=[self.test.id, self.attempt.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].lstrip().upper().startswith(('INSERT', 'UPDATE', 'DELETE'))
+        ])
+
+    def test_finished_review_answers_conditional_requests(self):
+        self._answer(self.choice_question, self.right_choice.id)
+        self.client.post(self.url, {'force_finish': 'true'})
+        review_url = reverse('test_review', args=[self.test.id, self.attempt.id])
+
+        response = self.client.get(review_url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertIn('private', response['Cache-Control'])
+        self.assertEqual(self.client.get(review_url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        update_attempt_totals({self.attempt.id: (Decimal('10'), 1)}, {self.attempt.id: Decimal('40')})
+        response = self.client.get(review_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_rescoring_applies_a_corrected_answer_key(self):
+        self._answer(self.choice_question, self.wrong_choice.id)
+        self.client.post(self.url, {'force_finish': 'true'})
+        self.assertEqual(self._totals(), (Decimal('-6'), 0, Decimal('0')))
+
+        self.right_choice.is_correct = False
+        self.right_choice.save()
+        self.wrong_choice.is_correct = True
+        self.wrong_choice.save()
+        rescore_test(self.test)
+
+        self.assertEqual(self._totals(), (Decimal('6'), 1, Decimal('15')))
+        answer = Answer.objects.get(attempt=self.attempt, question=self.choice_question)
+        self.assertEqual((answer.grade_status, answer.outcome, answer.question_score), ('correct', 'correct', Decimal('10')))
+
+    def test_rescoring_ignores_a_cached_answer_key(self):
+        self._answer(self.choice_question, self.right_choice.id)
+        self.client.post(self.url, {'force_finish': 'true'})
+        self.assertEqual(self._totals(), (Decimal('6'), 1, Decimal('15')))
+
+        Test.objects.filter(id=self.test.id).update(points_per_difficulty={'1': 20, '2': 20}, max_score=60)
+        rescore_test(self.test)
+
+        self.assertEqual(self._totals(), (Decimal('16'), 1, Decimal('26.67')))
+
+
+class AttemptDeliveryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.group = Group.objects.create(name='Grupo A')
+        self.student_role_group = Group.objects.create(name='Estudiantes')
+        self.student = User.objects.create_user(username='alumno', email='alumno@example.com')
+        self.student.groups.add(self.group, self.student_role_group)
+
+        self.test = Test.objects.create(name='Test Bebras', maximum_time=timedelta(minutes=30), points_per_difficulty={'1': 10})
+        self.choice_question = Question.objects.create(statement='Alternativas', difficulty=1, response_format='choice')
+        self.right_choice = Choice.objects.create(question=self.choice_question, text='A', is_correct=True)
+        self.number_question = Question.objects.create(statement='Número', difficulty=1, response_format='number', correct_answer='42')
+        self.text_question = Question.objects.create(statement='Texto', difficulty=1, response_format='text', correct_answer='hola')
+        self.test.questions.set([self.choice_question, self.number_question, self.text_question])
+        TestAssignment.objects.create(test=self.test, group=self.group)
+
+        self.url = reverse('test_detail', args=[self.test.id])
+        self.client.force_login(self.student)
+
+    def _start(self):
+        self.client.get(self.url)
+        return Attempt.objects.get(user=self.student, test=self.test)
+
+    def test_autosave_upserts_the_answer_and_returns_the_next_question(self):
+        attempt = self._start()
+        autosave_url = reverse('test_autosave', args=[self.test.id])
+
+        response = self.client.post(autosave_url, {f'question_{self.choice_question.id}': self.right_choice.id})
+        self.assertEqual(response.status_code, 200)
+        payload = response.json()
+        self.assertEqual(payload['status'], 'in_progress')
+        self.assertEqual((payload['question']['id'], payload['question']['question_number']), (self.number_question.id, 2))
+        self.assertEqual(Answer.objects.get(attempt=attempt, question=self.choice_question).grade_status, 'correct')
+
+        self.client.post(autosave_url, {f'question_{self.number_question.id}': '42'})
+        response = self.client.post(autosave_url, {f'question_{self.text_question.id}': 'hola'})
+        self.assertEqual(response.json(), {
+            'status': 'finished',
+            'redirect_url': reverse('test_review', args=[self.test.id, attempt.id]),
+        })
+        attempt.refresh_from_db()
+        self.assertIsNotNone(attempt.end_time)
+        self.assertEqual((attempt.correct_count, attempt.score), (3, Decimal('100')))
+
+    def test_autosave_rejects_missing_answers_and_attempts(self):
+        autosave_url = reverse('test_autosave', args=[self.test.id])
+        self.assertEqual(self.client.post(autosave_url, {}).status_code, 409)
+
+        Test.objects.filter(id=self.test.id).update(allow_no_response=False)
+        attempt = self._start()
+        response = self.client.post(autosave_url, {})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['status'], 'validation_error')
+        self.assertFalse(Answer.objects.filter(attempt=attempt).exists())
+
+    def test_navigation_is_stored_on_the_attempt(self):
+        attempt = self._start()
+        self.client.post(self.url, {f'question_{self.choice_question.id}': self.right_choice.id, 'next_question': '1'})
+        self.client.post(self.url, {f'question_{self.number_question.id}': '42', 'next_question': '1'})
+        self.client.post(self.url, {'previous_question': '1'})
+
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.current_question_index, 1)
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['current_question'], self.number_question)
+        self.assertEqual(response.context['user_answer_data'], 42)
+
+    def test_concurrent_next_requests_advance_once(self):
+        attempt = self._start()
+        post_data = {f'question_{self.choice_question.id}': self.right_choice.id, 'next_question': '1'}
+        first = TestAttemptService(self.student, self.test, post_data, attempt=Attempt.objects.get(id=attempt.id))
+        second = TestAttemptService(self.student, self.test, post_data, attempt=Attempt.objects.get(id=attempt.id))
+
+        first.process_post_request()
+        second.process_post_request()
+
+        attempt.refresh_from_db()
+        self.assertEqual((attempt.current_question_index, second.current_question_index), (1, 1))
+        self.assertEqual((attempt.correct_count, attempt.raw_score), (1, Decimal('10')))
+        self.assertEqual(Answer.objects.filter(attempt=attempt).count(), 1)
+
+    def test_single_page_submission_saves_every_answer_at_once(self):
+        Test.objects.filter(id=self.test.id).update(delivery_mode='single_page')
+        attempt = self._start()
+
+        response = self.client.post(self.url, {
+            f'question_{self.choice_question.id}': self.right_choice.id,
+            f'question_{self.number_question.id}': '42',
+            'submit_test': '1',
+        })
+
+        self.assertRedirects(response, reverse('test_review', args=[self.test.id, attempt.id]), fetch_redirect_response=False)
+        attempt.refresh_from_db()
+        self.assertIsNotNone(attempt.end_time)
+        self.assertEqual((attempt.correct_count, attempt.raw_score), (2, Decimal('20')))
+        self.assertEqual(
+            dict(Answer.objects.filter(attempt=attempt).values_list('question_id', 'outcome')),
+            {self.choice_question.id: 'correct', self.number_question.id: 'correct', self.text_question.id: 'unanswered'}
+        )
+
+    def test_single_page_submission_requires_every_answer_when_configured(self):
+        Test.objects.filter(id=self.test.id).update(delivery_mode='single_page', allow_no_response=False)
+        attempt = self._start()
+
+        response = self.client.post(self.url, {f'question_{self.choice_question.id}': self.right_choice.id, 'submit_test': '1'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Faltan: 2, 3')
+        attempt.refresh_from_db()
+        self.assertIsNone(attempt.end_time)
+        self.assertFalse(Answer.objects.filter(attempt=attempt).exists())
+
+
+class AttemptFinalizationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.test = Test.objects.create(
+            name='Test Bebras', maximum_time=timedelta(minutes=30), points_per_difficulty={'1': 10},
+            penalty_type='fixed', fixed_penalty=Decimal('2')
+        )
+        self.answered_question = Question.objects.create(statement='Número', difficulty=1, response_format='number', correct_answer='42')
+        self.skipped_question = Question.objects.create(statement='Texto', difficulty=1, response_format='text', correct_answer='hola')
+        self.test.questions.set([self.answered_question, self.skipped_question])
+        self.student_count = 0
+
+    def _open_attempt(self, deadline):
+        self.student_count += 1
+        student = User.objects.create_user(username=f'alumno{self.student_count}', email=f'alumno{self.student_count}@example.com')
+        attempt = Attempt.objects.create(user=student, test=self.test, deadline=deadline)
+        Answer.objects.create(
+            attempt=attempt, user=student, question=self.answered_question, answer_number=42,
+            grade_status='correct', question_score=Decimal('10')
+        )
+        update_attempt_totals({attempt.id: (Decimal('10'), 1)}, {attempt.id: Decimal('20')})
+        return attempt
+
+    def test_sweeper_finalizes_only_attempts_past_the_grace_period(self):
+        reference_time = timezone.now()
+        expired = [self._open_attempt(reference_time - timedelta(minutes=minutes)) for minutes in (5, 10, 15)]
+        within_grace = self._open_attempt(reference_time - timedelta(seconds=10))
+        running = self._open_attempt(reference_time + timedelta(minutes=5))
+
+        self.assertEqual(finalize_expired_attempts(batch_size=2, reference_time=reference_time), 3)
+        self.assertEqual(finalize_expired_attempts(batch_size=2, reference_time=reference_time), 0)
+
+        for attempt in expired:
+            attempt.refresh_from_db()
+            self.assertEqual(attempt.end_time, attempt.deadline)
+            self.assertEqual((attempt.raw_score, attempt.correct_count, attempt.score), (Decimal('8'), 1, Decimal('40')))
+            self.assertEqual(
+                Answer.objects.get(attempt=attempt, question=self.skipped_question).outcome, 'unanswered'
+            )
+        for attempt in (within_grace, running):
+            attempt.refresh_from_db()
+            self.assertIsNone(attempt.end_time)
+            self.assertFalse(Answer.objects.filter(attempt=attempt, question=self.skipped_question).exists())
+
+    def _finalize_queries(self, count):
+        deadline = timezone.now() - timedelta(minutes=5)
+        attempts = [self._open_attempt(deadline) for _ in range(count)]
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            finalized_count = finalize_attempt_batch([(attempt.id, attempt.test_id, attempt.user_id) for attempt in attempts])
+        self.assertEqual(finalized_count, count)
+        return len(queries)
+
+    def test_batch_query_count_does_not_grow_with_attempts(self):
+        self.assertEqual(self._finalize_queries(2), self._finalize_queries(12))
+
+
+class BatchScoringTests(TestCase):
+    answer_count = 400
+    attempt_count = 20
+
+    def test_batch_scores_match_answer_score(self):
+        rng = np.random.default_rng(2024)
+        test = Test(
+            points_per_difficulty={str(d): float(rng.integers(1, 40)) / 2 for d in range(1, 8)},
+            penalty_type='by_difficulty',
+            penalty_by_difficulty={str(d): float(rng.integers(0, 10)) / 4 for d in range(1, 8)},
+        )
+        policy = ScoringPolicy(test)
+        Entry = namedtuple('Entry', ['points', 'penalty'])
+
+        difficulties = rng.integers(1, 8, self.answer_count).tolist()
+        statuses = rng.choice(['correct', 'incorrect', 'pending', 'graded'], self.answer_count).tolist()
+        is_correct_manual = rng.choice([True, False, None], self.answer_count).tolist()
+        manual_grades = [
+            Decimal(int(value)).scaleb(-2) if value % 5 else None for value in rng.integers(-500, 2000, self.answer_count)
+        ]
+        attempt_index = rng.integers(0, self.attempt_count, self.answer_count).tolist()
+
+        for grades in (manual_grades, None):
+            scores = score_answers(
+                policy, difficulties, statuses, grades, is_correct_manual,
+                attempt_index=attempt_index, attempt_count=self.attempt_count
+            )
+            expected_cents = []
+            for index, (difficulty, status) in enumerate(zip(difficulties, statuses)):
+                entry = Entry(policy.points(difficulty), policy.penalty(difficulty))
+                if grades is None:
+                    manual_grade = manual_grade_for(entry, is_correct_manual[index])
+                else:
+                    manual_grade = grades[index]
+                expected_cents.append(to_cents(answer_score(entry, status, manual_grade)))
+
+            self.assertEqual(scores.question_scores.tolist(), expected_cents)
+            self.assertEqual(
+                scores.is_correct.tolist(),
+                [is_correct_status(status, manual) for status, manual in zip(statuses, is_correct_manual)]
+            )
+            expected_raw = [0] * self.attempt_count
+            for index, cents in zip(attempt_index, expected_cents):
+                expected_raw[index] += cents
+            self.assertEqual(scores.attempt_raw_scores.tolist(), expected_raw)
+
+
+class AnswerKeyVersionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.test = Test.objects.create(name='Test Bebras', maximum_time=timedelta(minutes=30), points_per_difficulty={'1': 10})
+        self.question = Question.objects.create(statement='Alternativas', difficulty=1, response_format='choice')
+        self.right_choice = Choice.objects.create(question=self.question, text='A', is_correct=True)
+        self.wrong_choice = Choice.objects.create(question=self.question, text='B', is_correct=False)
+        self.test.questions.add(self.question)
+
+    def test_answer_key_follows_the_stored_version(self):
+        stale_test = Test.objects.get(id=self.test.id)
+        self.assertEqual(get_answer_key(stale_test).entries[self.question.id].correct_choice_ids, {self.right_choice.id})
+        version = statistics_version(self.test.id)
+
+        self.wrong_choice.is_correct = True
+        self.wrong_choice.save()
+
+        current_test = Test.objects.get(id=self.test.id)
+        self.assertGreater(current_test.answer_key_version, stale_test.answer_key_version)
+        self.assertEqual(
+            get_answer_key(current_test).entries[self.question.id].correct_choice_ids,
+            {self.right_choice.id, self.wrong_choice.id}
+        )
+        self.assertNotEqual(statistics_version(self.test.id), version)
+
+        stale_test.name = 'Test renombrado'
+        stale_test.save()
+        self.assertGreater(Test.objects.get(id=self.test.id).answer_key_version, current_test.answer_key_version)
+
+    def test_statistics_version_changes_after_commit(self):
+        version = statistics_version(self.test.id)
+        global_version = statistics_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_statistics([self.test.id])
+            self.assertEqual(statistics_version(self.test.id), version)
+        self.assertNotEqual(statistics_version(self.test.id), version)
+        self.assertNotEqual(statistics_version(), global_version)
+
+
+class GradingQueueTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.group = Group.objects.create(name='Grupo A')
+        self.student_role_group = Group.objects.create(name='Estudiantes')
+        self.teacher = User.objects.create_user(username='profesor', email='profesor@example.com', is_staff=True)
+        self.test = Test.objects.create(
+            name='Test Bebras', maximum_time=timedelta(minutes=30), points_per_difficulty={'1': 10},
+            penalty_type='fixed', fixed_penalty=Decimal('2')
+        )
+        self.question = Question.objects.create(statement='Texto', difficulty=1, response_format='text', correct_answer='hola')
+        self.test.questions.add(self.question)
+        TestAssignment.objects.create(test=self.test, group=self.group)
+        self.student_count = 0
+
+    def _answer_as_new_student(self, answer_text):
+        self.student_count += 1
+        student = User.objects.create_user(username=f'alumno{self.student_count}', email=f'alumno{self.student_count}@example.com')
+        student.groups.add(self.group, self.student_role_group)
+        self.client.force_login(student)
+        url = reverse('test_detail', args=[self.test.id])
+        self.client.get(url)
+        self.client.post(url, {f'question_{self.question.id}': answer_text, 'next_question': '1'})
+        return Answer.objects.get(attempt__user=student, question=self.question)
+
+    def test_grading_a_group_updates_every_matching_answer(self):
+        matching = [self._answer_as_new_student(' Chao '), self._answer_as_new_student('chao')]
+        other = self._answer_as_new_student('adiós')
+        self.assertEqual({answer.grade_status for answer in matching + [other]}, {'pending'})
+
+        result = grade_answer_group(self.test, self.question, 'chao', True, self.teacher)
+
+        self.assertEqual(result, {'graded_count': 2, 'attempt_count': 2})
+        for answer in matching:
+            answer.refresh_from_db()
+            self.assertEqual(
+                (answer.grade_status, answer.outcome, answer.question_score, answer.graded_by),
+                ('graded', 'correct', Decimal('10'), self.teacher)
+            )
+            answer.attempt.refresh_from_db()
+            self.assertEqual((answer.attempt.raw_score, answer.attempt.correct_count, answer.attempt.score), (Decimal('10'), 1, Decimal('100')))
+        other.refresh_from_db()
+        self.assertEqual(other.grade_status, 'pending')
+        self.assertTrue(IndexedAnswer.objects.filter(question=self.question, normalized_answer='chao', is_correct=True).exists())
+
+    def test_indexed_answers_are_graded_automatically(self):
+        IndexedAnswer.objects.create(question=self.question, normalized_answer='chao', is_correct=True)
+        IndexedAnswer.objects.create(question=self.question, normalized_answer='adiós', is_correct=False)
+
+        accepted = self._answer_as_new_student(' CHAO ')
+        rejected = self._answer_as_new_student('Adiós')
+        unmatched = self._answer_as_new_student('hasta luego')
+
+        self.assertEqual((accepted.grade_status, accepted.question_score), ('correct', Decimal('10')))
+        self.assertEqual((rejected.grade_status, rejected.question_score), ('incorrect', Decimal('-2')))
+        self.assertEqual((unmatched.grade_status, unmatched.outcome, unmatched.question_score), ('pending', 'pending', Decimal('0')))
+
+
+class StatisticsDashboardQueryCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create_user(username='admin', email='admin@example.com', password='clave-segura', is_staff=True)
+        self.test = Test.objects.create(name='Test Bebras', maximum_time=timedelta(minutes=30), points_per_difficulty={'1': 10})
+        self.questions = []
+        for index, skill_name in enumerate(['Algoritmos', 'Lógica', 'Patrones']):
+            question = Question.objects.create(statement=f'Pregunta {index}', difficulty=1, response_format='text')
+            question.skills.add(Skill.objects.create(name=skill_name))
+            self.questions.append(question)
+        self.test.questions.set(self.questions)
+        self.group = Group.objects.create(name='Grupo A')
+        TestAssignment.objects.create(test=self.test, group=self.group)
+        self.student_count = 0
+
+    def _create_attempts(self, count):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._create_finished_attempts(count)
+
+    def _create_finished_attempts(self, count):
+        for _ in range(count):
+            self.student_count += 1
+            student = User.objects.create_user(username=f'alumno{self.student_count}', email=f'alumno{self.student_count}@example.com')
+            student.groups.add(self.group)
+            attempt = Attempt.objects.create(user=student, test=self.test, end_time=timezone.now(), correct_count=1)
+            Answer.objects.bulk_create([
+                Answer(attempt=attempt, user=student, question=self.questions[0], answer_text='a', grade_status='correct', outcome='correct'),
+                Answer(attempt=attempt, user=student, question=self.questions[1], answer_text='b', grade_status='incorrect', outcome='incorrect'),
+            ])
+        rebuild_rollups([self.test.id])
+
+    def _get_statistics(self):
+        self.client.force_login(self.staff)
+        data = {}
+        with CaptureQueriesContext(connection) as queries:
+            for statistic in ('user_attempts', 'overall_performance', 'skill_performance'):
+                response = self.client.get(reverse('test_statistics_data', args=[statistic]))
+                self.assertEqual(response.status_code, 200)
+                data[statistic] = response.json()
+        return data, len(queries)
+
+    def test_query_count_does_not_grow_with_attempts(self):
+        self._create_attempts(2)
+        _, small_query_count = self._get_statistics()
+
+        self._create_attempts(20)
+        data, large_query_count = self._get_statistics()
+
+        self.assertEqual(large_query_count, small_query_count)
+        self.assertEqual(len(data['user_attempts']), 22)
+        self.assertEqual(data['overall_performance'], {
+            'total_attempts_count': 22,
+            'correct': 22,
+            'incorrect': 22,
+            'answered': 44,
+            'unanswered': 22,
+            'total_possible': 66,
+        })
+        self.assertEqual(
+            [(row['skill_name'], row['answered'], row['correct']) for row in data['skill_performance']],
+            [('Algoritmos', 22, 22), ('Lógica', 22, 0)]
+        )
+
+    def test_statistics_are_cached_until_attempts_change(self):
+        self._create_attempts(2)
+        self._get_statistics()
+        data, cached_query_count = self._get_statistics()
+        self.assertEqual(data['overall_performance']['total_attempts_count'], 2)
+
+        self._create_finished_attempts(1)
+        data, _ = self._get_statistics()
+        self.assertEqual(data['overall_performance']['total_attempts_count'], 2)
+
+        self._create_attempts(1)
+        data, query_count = self._get_statistics()
+        self.assertEqual(data['overall_performance']['total_attempts_count'], 4)
+        self.assertGreater(query_count, cached_query_count)
+
+    def test_students_in_two_assigned_groups_are_counted_once(self):
+        other_group = Group.objects.create(name='Grupo B')
+        TestAssignment.objects.create(test=self.test, group=other_group)
+        with self.captureOnCommitCallbacks(execute=True):
+            self._create_finished_attempts(1)
+            User.objects.get(username='alumno1').groups.add(other_group)
+            rebuild_rollups([self.test.id])
+
+        data, _ = self._get_statistics()
+        self.assertEqual(len(data['user_attempts']), 1)
+        self.assertEqual(
+            (data['overall_performance']['total_attempts_count'], data['overall_performance']['correct']), (1, 1)
+        )
+        for group in (self.group, other_group):
+            response = self.client.get(reverse('test_statistics_data', args=['overall_performance']), {'group': group.id})
+            self.assertEqual(response.json()['total_attempts_count'], 1)
+
+    def _create_teacher(self):
+        teacher = User.objects.create_user(username='profesor', email='profesor@example.com')
+        teacher.groups.add(Group.objects.create(name='Profesores'))
+        GroupMetadata.objects.create(group=self.group, created_by=teacher)
+        Test.objects.filter(id=self.test.id).update(creator=teacher)
+        TestAssignment.objects.filter(test=self.test, group=self.group).update(assigned_by=teacher)
+        return teacher
+
+    def test_teachers_only_count_attempts_from_their_groups(self):
+        teacher = self._create_teacher()
+        other_group = Group.objects.create(name='Grupo B')
+        TestAssignment.objects.create(test=self.test, group=other_group)
+        with self.captureOnCommitCallbacks(execute=True):
+            self._create_finished_attempts(2)
+            self.group = other_group
+            self._create_finished_attempts(3)
+
+        self.client.force_login(teacher)
+        response = self.client.get(reverse('test_statistics_data', args=['overall_performance']))
+        self.assertEqual((response.json()['total_attempts_count'], response.json()['answered']), (2, 4))
+
+        data, _ = self._get_statistics()
+        self.assertEqual((data['overall_performance']['total_attempts_count'], data['overall_performance']['answered']), (5, 10))
+
+    def test_teacher_score_distribution_keeps_equal_scores(self):
+        teacher = self._create_teacher()
+        self._create_attempts(3)
+        Attempt.objects.filter(test=self.test).update(score=Decimal('50'))
+
+        self.client.force_login(teacher)
+        summary = self.client.get(reverse('test_statistics_data', args=['score_distribution'])).json()
+        self.assertEqual((summary['count'], summary['mean']), (3, 50.0))
+        self.assertEqual([bucket['count'] for bucket in summary['histogram'] if bucket['count']], [3])
+
+    def test_dashboard_page_does_not_compute_statistics(self):
+        self._create_attempts(2)
+        self.client.force_login(self.staff)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('test_statistics_dashboard'), {'test': self.test.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any('rollup' in query['sql'] for query in queries.captured_queries))
+        self.assertContains(response, reverse('test_statistics_data', args=['skill_performance']) + f'?test={self.test.id}')
+
+
+class ItemAnalysisTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.test = Test.objects.create(name='Test Bebras', maximum_time=timedelta(minutes=30), points_per_difficulty={'1': 10})
+        self.questions = [
+            Question.objects.create(statement=f'Pregunta {index}', difficulty=1, response_format='choice') for index in range(2)
+        ]
+        self.choices = [
+            (Choice.objects.create(question=question, text='A', is_correct=True), Choice.objects.create(question=question, text='B'))
+            for question in self.questions
+        ]
+        self.test.questions.set(self.questions)
+        self.student_count = 0
+
+    def _finish_attempt(self, correct_flags):
+        self.student_count += 1
+        student = User.objects.create_user(username=f'alumno{self.student_count}', email=f'alumno{self.student_count}@example.com')
+        with self.captureOnCommitCallbacks(execute=True):
+            attempt = Attempt.objects.create(user=student, test=self.test)
+            for question, (right, wrong), correct in zip(self.questions, self.choices, correct_flags):
+                Answer.objects.create(
+                    attempt=attempt, user=student, question=question, answer_choice=right if correct else wrong,
+                    grade_status='correct' if correct else 'incorrect'
+                )
+            finalize_attempt_batch([(attempt.id, self.test.id, student.id)])
+
+    def test_analysis_is_cached_until_statistics_change(self):
+        for flags in [(True, True), (True, False), (False, False), (True, False)]:
+            self._finish_attempt(flags)
+
+        analysis = get_item_analysis(Test.objects.get(id=self.test.id))
+        self.assertEqual(analysis.student_count, 4)
+        self.assertEqual([analysis.items[question.id].p_value for question in self.questions], [0.75, 0.25])
+        self.assertEqual(
+            [(rate.is_correct, rate.rate) for rate in analysis.items[self.questions[1].id].choice_rates],
+            [(True, 0.25), (False, 0.75)]
+        )
+
+        test = Test.objects.get(id=self.test.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_item_analysis(test), analysis)
+
+        self._finish_attempt((False, True))
+        analysis = get_item_analysis(Test.objects.get(id=self.test.id))
+        self.assertEqual(analysis.student_count, 5)
+        self.assertEqual([analysis.items[question.id].p_value for question in self.questions], [0.6, 0.4])
+
+
+class RaschCalibrationTests(TestCase):
+    def test_fit_recovers_simulated_difficulties(self):
+        rng = np.random.default_rng(2024)
+        person_count, difficulties = 400, np.linspace(-2, 2, 8)
+        abilities = rng.normal(0, 1, person_count)
+        person_index = np.repeat(np.arange(person_count), len(difficulties))
+        item_index = np.tile(np.arange(len(difficulties)), person_count)
+        probabilities = 1 / (1 + np.exp(difficulties[item_index] - abilities[person_index]))
+        responses = (rng.random(len(probabilities)) < probabilities).astype(np.int64)
+
+        fit = fit_rasch(person_index, item_index, responses, np.zeros(person_count), np.zeros(len(difficulties)))
+
+        self.assertTrue(fit.converged)
+        self.assertTrue(np.all(np.abs(fit.difficulties - difficulties) < 3 * fit.standard_errors))
+        self.assertTrue(np.all(np.diff(fit.difficulties) > 0))
+
+    def test_calibration_stores_estimates(self):
+        test = Test.objects.create(name='Test Bebras', maximum_time=timedelta(minutes=30))
+        easy = Question.objects.create(statement='Fácil', difficulty=1, response_format='number', correct_answer='1')
+        hard = Question.objects.create(statement='Difícil', difficulty=1, response_format='number', correct_answer='1')
+        test.questions.set([easy, hard])
+        for index in range(6):
+            student = User.objects.create_user(username=f'alumno{index}', email=f'alumno{index}@example.com')
+            attempt = Attempt.objects.create(user=student, test=test, end_time=timezone.now())
+            for question, correct in ((easy, index < 5), (hard, index < 1)):
+                Answer.objects.create(
+                    attempt=attempt, user=student, question=question, answer_number=1 if correct else 2,
+                    grade_status='correct' if correct else 'incorrect'
+                )
+
+        result = calibrate_difficulties()
+
+        self.assertEqual((result['answers'], result['questions'], result['attempts']), (12, 2, 6))
+        self.assertTrue(result['converged'])
+        easy.refresh_from_db()
+        hard.refresh_from_db()
+        self.assertLess(easy.estimated_difficulty, hard.estimated_difficulty)
+        self.assertIsNotNone(easy.calibrated_at)
+        self.assertEqual(easy.estimated_difficulty, round(easy.estimated_difficulty, 3))
+        self.assertEqual(Attempt.objects.filter(test=test, ability_estimate__isnull=True).count(), 0)
+
+        self.assertEqual(calibrate_difficulties()['updated_attempts'], 0)
+
+
+class AnswerOutcomeTests(TestCase):
+    def setUp(self):
+        self.student = User.objects.create_user(username='alumno', email='alumno@example.com')
+        self.test = Test.objects.create(name='Test Bebras', maximum_time=timedelta(minutes=30))
+        self.question = Question.objects.create(statement='Pregunta', difficulty=1, response_format='text')
+        self.attempt = Attempt.objects.create(user=self.student, test=self.test)
+
+    def test_outcome_follows_response_and_grading(self):
+        answer = Answer.objects.create(attempt=self.attempt, user=self.student, question=self.question, answer_text='')
+        self.assertEqual(answer.outcome, 'unanswered')
+
+        answer.answer_text = 'respuesta'
+        answer.save(update_fields=['answer_text'])
+        answer.refresh_from_db()
+        self.assertEqual(answer.outcome, 'pending')
+
+        answer.grade_status = 'graded'
+        answer.is_correct_manual = True
+        answer.save()
+        self.assertEqual(Answer.objects.filter(attempt=self.attempt, outcome='correct').count(), 1)
+
+        answer.is_correct_manual = False
+        answer.save()
+        self.assertEqual(Answer.objects.filter(attempt=self.attempt, outcome='incorrect').count(), 1)
+
+
+class DailyActivityRollupTests(TestCase):
+    def setUp(self):
+        self.test = Test.objects.create(name='Test Bebras', maximum_time=timedelta(minutes=30), max_attempts=5)
+        self.group = Group.objects.create(name='Grupo A')
+        TestAssignment.objects.create(test=self.test, group=self.group)
+        self.student = User.objects.create_user(username='alumno', email='alumno@example.com')
+        self.student.groups.add(self.group)
+
+    def _create_attempt(self, days_ago, score):
+        taken = timezone.now() - timedelta(days=days_ago)
+        attempt = Attempt.objects.create(user=self.student, test=self.test, end_time=taken, score=score)
+        Attempt.objects.filter(id=attempt.id).update(date_taken=taken, updated_at=taken)
+        return attempt
+
+    def test_refresh_only_recomputes_changed_days(self):
+        self._create_attempt(10, 40)
+        self._create_attempt(3, 80)
+        self.assertEqual(refresh_activity_rollups()['buckets'], 2)
+        self.assertEqual(
+            list(DailyActivityRollup.objects.order_by('day').values_list('group_id', 'started', 'finished', 'score_sum')),
+            [(self.group.id, 1, 1, 40), (self.group.id, 1, 1, 80)]
+        )
+
+        self._create_attempt(0, 60)
+        result = refresh_activity_rollups()
+        self.assertEqual(result['buckets'], 1)
+        self.assertEqual(DailyActivityRollup.objects.get(day=timezone.localdate()).score_sum, 60)
+
+
+class ScoreDistributionTests(TestCase):
+    def test_summary_and_percentile_rank(self):
+        scores = np.array([10.0, 20.0, 20.0, 40.0, 95.0, 100.0])
+        summary = summarize_scores(scores)
+        self.assertEqual(summary['count'], 6)
+        self.assertEqual([bin['count'] for bin in summary['histogram']], [0, 1, 2, 0, 1, 0, 0, 0, 0, 2])
+        self.assertEqual(summary['quartiles'], {'q1': 20.0, 'median': 30.0, 'q3': 81.25})
+        self.assertAlmostEqual(percentile_rank(np.sort(scores), 20), 100 * 2 / 6)
+        self.assertAlmostEqual(percentile_rank(np.sort(scores), 100), 100 * 5.5 / 6)
+        self.assertIsNone(percentile_rank(np.array([]), 50))
+
+
+class GroupGradebookTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(username='admin', email='admin@example.com', is_staff=True)
+        self.group = Group.objects.create(name='Grupo A')
+        self.tests = []
+        for name in ('Test A', 'Test B'):
+            test = Test.objects.create(name=name, maximum_time=timedelta(minutes=30), max_attempts=5)
+            TestAssignment.objects.create(test=test, group=self.group)
+            self.tests.append(test)
+        self.student_count = 0
+
+    def _create_students(self, count, scores):
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(count):
+                self.student_count += 1
+                student = User.objects.create_user(username=f'alumno{self.student_count:02d}', email=f'alumno{self.student_count}@example.com')
+                student.groups.add(self.group)
+                for test in self.tests:
+                    for score in scores:
+                        Attempt.objects.create(user=student, test=test, end_time=timezone.now(), score=score)
+        rebuild_rollups([test.id for test in self.tests])
+
+    def _get_gradebook(self, **params):
+        self.client.force_login(self.staff)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('group_history_results', args=[self.group.id]), params)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_query_count_does_not_grow_with_students(self):
+        self._create_students(2, [40, 70])
+        _, small_query_count = self._get_gradebook()
+
+        self._create_students(20, [40, 70, 90])
+        response, large_query_count = self._get_gradebook()
+
+        self.assertEqual(large_query_count, small_query_count)
+        row = response.context['page_obj'][0]
+        self.assertEqual(row.username, 'alumno01')
+        self.assertEqual([(cell.best_score, cell.last_score, cell.attempt_count) for cell in row.cells], [(70, 70, 2), (70, 70, 2)])
+
+    def test_sorting_and_csv_export(self):
+        self._create_students(1, [40])
+        self._create_students(1, [90])
+        response, _ = self._get_gradebook(sort=f'test_{self.tests[0].id}', order='desc')
+        self.assertEqual([row.username for row in response.context['page_obj']], ['alumno02', 'alumno01'])
+
+        response = self.client.get(reverse('export_group_gradebook_csv', args=[self.group.id]), {'sort': 'average', 'order': 'desc'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:4], ['Estudiante', 'Usuario', 'Intentos', 'Promedio General (%)'])
+        self.assertEqual(lines[1].split(',')[:4], ['alumno02', 'alumno02', '2', '90.00'])
+        self.assertEqual(len(lines), 3)
@@ -7,7 +7,9 @@ urlpatterns = [
     path('login/', views.simple_login, name='simple_login'),
     path('logout/', views.simple_logout, name='simple_logout'),
     path('<int:test_id>/', views.test_detail, name='test_detail'),
+    path('<int:test_id>/autosave/', views.test_autosave, name='test_autosave'),
     path('<int:test_id>/teacher-view/', views.test_detail_teacher, name='test_detail_teacher'),
+    path('<int:test_id>/grading/<int:question_id>/', views.grading_queue, name='grading_queue'),
     path('review/<int:test_id>/<int:attempt_id>/', views.test_review, name='test_review'),
     path('test_attempts/', views.test_attempts, name='test_attempts'),
     path('create/auto/', views.auto_test_creation_view, name='auto_test_create'),
@@ -17,5 +19,7 @@ urlpatterns = [
     path('groups/<int:group_id>/', views.group_detail_view, name='group_detail'),    
     path('export/attempts/xlsx/', views.export_attempts_xlsx, name='export_attempts_xlsx'),
     path('group/<int:group_id>/history/', views.group_history_results, name='group_history_results'),
+    path('group/<int:group_id>/history/csv/', views.export_group_gradebook_csv, name='export_group_gradebook_csv'),
     path('statistics/', views.test_statistics_dashboard, name='test_statistics_dashboard'),
+    path('statistics/data/<str:statistic>/', views.test_statistics_data, name='test_statistics_data'),
 ]
\ No newline at end of file
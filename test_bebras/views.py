@@ -1,9 +1,12 @@
 from django.shortcuts import render, redirect, get_object_or_404, HttpResponse
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_POST
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.urls import reverse
+from django.core.paginator import Paginator
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User, Group
-from .models import Test, Answer, Choice, Attempt, Question, TestAssignment, Skill, GroupMetadata
+from .models import Test, Choice, Attempt, Question, TestAssignment, GroupMetadata
 from collections import defaultdict
 from django.db.models import Q
 from django.contrib import messages
@@ -12,20 +15,29 @@ from django.utils import timezone
 from django import forms
 from .forms import AutoTestCreationForm, StudentUploadForm, AssignTestForm
 import random
-import json
 import csv
 import io
 from django.core.mail import send_mail
 from django.conf import settings
-from django.db.models import Avg, Sum, Count
+from django.db.models import Count
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
 from django.contrib.auth import get_user_model
-from decimal import Decimal, InvalidOperation
+from decimal import InvalidOperation
 from .services.excel_exporter import generate_attempts_xlsx_report
 from .services.test_assignment_service import assign_tests_and_notify
-from .services.test_attempt_service import TestAttemptService
-from .services.test_review_service import TestReviewService
+from .services.test_attempt_service import TestAttemptService, admit_attempt
+from .services.attempt_finalization_service import finalize_attempt_batch
+from .services.test_review_service import TestReviewService, review_validators
+from .services.grading_queue_service import grade_answer_group, pending_answer_groups
+from .services.item_analysis_service import get_item_analysis
+from .services.gradebook_service import GRADEBOOK_PAGE_SIZE, build_gradebook, gradebook_csv_rows, is_valid_sort
+from .services.statistics_dashboard_service import DASHBOARD_STATISTICS, get_dashboard_statistic
+from .services.statistics_rollup_service import updating_rollups
 from .utils.user_roles import is_teacher_or_staff, is_student
 
 @login_required
@@ -79,43 +91,46 @@ def test_detail(request, test_id):
         messages.error(request, "No tienes permiso para acceder a los tests.")
         return redirect('simple_login')
 
-    finalized_attempts_count = Attempt.objects.filter(
-        user=user,
-        test=test,
-        end_time__isnull=False 
-    ).count()
+    admission = admit_attempt(user, test)
 
-    if finalized_attempts_count >= test.max_attempts: 
+    if admission['status'] == 'exhausted':
         messages.warning(request, f"Ya has agotado tus {test.max_attempts} intentos para este test.")
 
-        last_finalized_attempt = Attempt.objects.filter(
-            user=user,
-            test=test,
-            end_time__isnull=False
-        ).order_by('-date_taken').first() 
-
+        last_finalized_attempt = admission['last_finalized_attempt']
         if last_finalized_attempt:
             messages.info(request, "Serás redirigido a la revisión de tu último intento.")
             return redirect('test_review', test_id=test.id, attempt_id=last_finalized_attempt.id)
         else:
             return redirect('test_list')
 
-    current_attempt = Attempt.objects.filter(user=user, test=test, end_time__isnull=True).first()
+    current_attempt = admission['attempt']
 
-    if not current_attempt:
-        current_attempt = Attempt.objects.create(user=user, test=test, score=0, correct_count=0)
-        messages.info(request, f"Iniciando un nuevo intento para el test: {test.name}. Este es tu intento {finalized_attempts_count + 1} de {test.max_attempts}.")
-        request.session[f'current_question_index_{current_attempt.id}'] = 0
+    if current_attempt.is_expired():
+        finalize_attempt_batch([(current_attempt.id, test.id, user.id)])
+        messages.warning(request, "El tiempo de tu intento terminó. Se guardaron las respuestas enviadas.")
+        return redirect('test_review', test_id=test.id, attempt_id=current_attempt.id)
+
+    if admission['status'] == 'created':
+        messages.info(request, f"Iniciando un nuevo intento para el test: {test.name}. Este es tu intento {admission['finalized_count'] + 1} de {test.max_attempts}.")
     else:
         messages.info(request, f"Continuando con tu intento para el test: {test.name}.")
 
-    service = TestAttemptService(user, test, request.session, request.POST if request.method == 'POST' else None, attempt=current_attempt)
+    service = TestAttemptService(user, test, request.POST if request.method == 'POST' else None, attempt=current_attempt)
 
     if request.method == 'POST':
         process_results = service.process_post_request()
 
         if process_results['status'] == 'redirect':
             return redirect(reverse(process_results['view_name'], kwargs=process_results['kwargs']))
+        elif process_results['status'] == 'validation_error' and service.single_page:
+            context = service.get_single_page_state()
+            return render(request, 'tests/test_detail_single_page.html', {
+                'test': test,
+                'attempt': context['attempt'],
+                'question_items': context['question_items'],
+                'total_questions': context['total_questions'],
+                'error': process_results['message']
+            })
         elif process_results['status'] == 'validation_error':
             context = service.get_current_state() 
             context['error'] = process_results['message']
@@ -131,7 +146,10 @@ def test_detail(request, test_id):
                 'error': context['error']
             })
     
-    context = service.get_current_state()
+    if service.single_page:
+        context = service.get_single_page_state()
+    else:
+        context = service.get_current_state()
 
     if context['status'] == 'finished':
         attempt_id = context['attempt_id']
@@ -139,12 +157,22 @@ def test_detail(request, test_id):
             attempt = Attempt.objects.get(id=attempt_id)
             if attempt.end_time is None: 
                 attempt.end_time = timezone.now()
-                attempt.save()
+                with updating_rollups([attempt.id]):
+                    attempt.save(update_fields=['end_time', 'updated_at'])
         except Attempt.DoesNotExist:
             messages.error(request, "Error: No se encontró el intento del test para finalizar.")
 
         return redirect('test_review', test_id=test.id, attempt_id=context['attempt_id'])
 
+    if service.single_page:
+        return render(request, 'tests/test_detail_single_page.html', {
+            'test': test,
+            'attempt': context['attempt'],
+            'question_items': context['question_items'],
+            'total_questions': context['total_questions'],
+            'error': context['error']
+        })
+
     return render(request, 'tests/test_detail.html', {
         'test': test,
         'attempt': context['attempt'],
@@ -158,6 +186,40 @@ def test_detail(request, test_id):
     })
 
 
+@login_required
+@require_POST
+def test_autosave(request, test_id):
+    user = request.user
+    test = get_object_or_404(Test, id=test_id)
+
+    if is_teacher_or_staff(user):
+        if not user.is_staff and test.creator != user:
+            return JsonResponse({'status': 'error', 'message': "No tienes permiso para ver este test."}, status=403)
+    elif is_student(user):
+        user_groups_ids = user.groups.values_list('id', flat=True)
+        if not Test.objects.filter(id=test_id, assigned_groups__id__in=user_groups_ids).exists():
+            return JsonResponse({'status': 'error', 'message': "Este test no está asignado a ninguno de tus grupos."}, status=403)
+    else:
+        return JsonResponse({'status': 'error', 'message': "No tienes permiso para acceder a los tests."}, status=403)
+
+    current_attempt = Attempt.objects.filter(user=user, test=test, end_time__isnull=True).first()
+    if not current_attempt:
+        return JsonResponse({'status': 'error', 'message': "No tienes un intento en curso para este test."}, status=409)
+
+    if current_attempt.is_expired():
+        finalize_attempt_batch([(current_attempt.id, test.id, user.id)])
+        return JsonResponse({
+            'status': 'finished',
+            'redirect_url': reverse('test_review', kwargs={'test_id': test.id, 'attempt_id': current_attempt.id})
+        })
+
+    service = TestAttemptService(user, test, request.POST, attempt=current_attempt)
+    result = service.process_autosave()
+
+    if result['status'] == 'validation_error':
+        return JsonResponse(result, status=400)
+    return JsonResponse(result)
+
 @login_required
 def test_detail_teacher(request, test_id):
     if not is_teacher_or_staff(request.user):
@@ -165,14 +227,55 @@ def test_detail_teacher(request, test_id):
         return redirect('test_list')
 
     test = get_object_or_404(Test, pk=test_id)
-    questions = test.questions.all().order_by('id')
+    questions = list(test.questions.annotate(
+        pending_count=Count('answer', filter=Q(answer__grade_status='pending', answer__attempt__test=test))
+    ).order_by('id'))
+    item_analysis = get_item_analysis(test)
+    for question in questions:
+        question.item_statistics = item_analysis.items.get(question.id)
 
     context = {
         'test': test,
         'questions': questions,
+        'analyzed_student_count': item_analysis.student_count,
     }
     return render(request, 'tests/test_detail_teacher.html', context)
 
+@login_required
+@user_passes_test(is_teacher_or_staff, login_url='/login/')
+def grading_queue(request, test_id, question_id):
+    if request.user.is_staff:
+        test = get_object_or_404(Test, id=test_id)
+    else:
+        test = get_object_or_404(Test, id=test_id, creator=request.user)
+    question = get_object_or_404(test.questions, id=question_id)
+
+    if question.response_format == 'choice':
+        messages.info(request, "Las preguntas de alternativas se corrigen automáticamente.")
+        return redirect('test_detail_teacher', test_id=test.id)
+
+    if request.method == 'POST':
+        decision = request.POST.get('decision')
+        normalized = request.POST.get('normalized')
+        if decision not in ('correct', 'incorrect') or normalized is None:
+            messages.error(request, "Selecciona una respuesta y una decisión válidas.")
+        else:
+            result = grade_answer_group(test, question, normalized, decision == 'correct', request.user)
+            messages.success(
+                request,
+                f"Se corrigieron {result['graded_count']} respuestas de {result['attempt_count']} intentos."
+            )
+        return redirect('grading_queue', test_id=test.id, question_id=question.id)
+
+    answer_groups = pending_answer_groups(test, question)
+    context = {
+        'test': test,
+        'question': question,
+        'answer_groups': answer_groups,
+        'pending_total': sum(group['count'] for group in answer_groups),
+    }
+    return render(request, 'tests/grading_queue.html', context)
+
 @login_required
 def test_review(request, test_id, attempt_id):
     test = get_object_or_404(Test, id=test_id)
@@ -189,6 +292,13 @@ def test_review(request, test_id, attempt_id):
             messages.error(request, "No tienes permiso para ver los resultados de este test (no lo creaste tú).")
             return redirect('test_attempts')
 
+    etag = last_modified = None
+    if attempt.end_time:
+        etag, last_modified = review_validators(attempt, request.user)
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+
     review_service = TestReviewService(test_id, attempt_id)
     review_results = review_service.calculate_review_results()
 
@@ -198,9 +308,16 @@ def test_review(request, test_id, attempt_id):
         'total_questions': review_results['total_questions'],
         'total_score': review_results['total_score'],
         'question_results': review_results['question_results'],
+        'percentile_rank': review_results['percentile_rank'],
+        'compared_attempts': review_results['compared_attempts'],
         'is_teacher_user': is_current_user_teacher_or_staff,
     }
-    return render(request, 'tests/test_review.html', context)
+    response = render(request, 'tests/test_review.html', context)
+    if etag:
+        response.headers['ETag'] = etag
+        response.headers['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 
 @login_required
@@ -422,6 +539,7 @@ def auto_test_creation_view(request):
             allow_backtracking = form.cleaned_data['allow_backtracking']
             allow_no_response = form.cleaned_data['allow_no_response']
             max_attempts = form.cleaned_data['max_attempts']
+            delivery_mode = form.cleaned_data['delivery_mode']
 
             form_points_per_difficulty = form.cleaned_data['points_per_difficulty']
             penalty_type = form.cleaned_data['penalty_type']
@@ -465,6 +583,7 @@ def auto_test_creation_view(request):
                 allow_backtracking=allow_backtracking,
                 allow_no_response=allow_no_response,
                 max_attempts=max_attempts,
+                delivery_mode=delivery_mode,
                 points_per_difficulty= points_data_for_json,
                 penalty_type=penalty_type,
                 fixed_penalty=fixed_penalty,
@@ -667,192 +786,106 @@ def export_attempts_xlsx(request):
 @login_required
 @user_passes_test(is_teacher_or_staff)
 def group_history_results(request, group_id):
-
-    if request.user.is_staff:
-        group = get_object_or_404(Group, id=group_id)
-        
-        test_summaries = Test.objects.filter(
-            testassignment__group=group,
-            attempt__user__groups=group
-        ).annotate(
-            avg_score=Avg('attempt__score'),
-            total_attempts=Count('attempt', distinct=True)
-        ).order_by('name').distinct()
-    else:
-        group = get_object_or_404(Group, id=group_id, groupmetadata__created_by=request.user)
-
-        test_summaries = Test.objects.filter(
-            creator=request.user,
-            testassignment__group=group,
-            testassignment__assigned_by=request.user,
-            attempt__user__groups=group
-        ).annotate(
-            avg_score=Avg('attempt__score'),
-            total_attempts=Count('attempt', distinct=True)
-        ).order_by('name').distinct()
-
-    students_in_group = User.objects.filter(groups=group).order_by('username')
-    student_results = []
-    for student in students_in_group:
-        attempts_by_student = Attempt.objects.filter(user=student, test__in=test_summaries.values_list('id', flat=True)).order_by('test__name', 'date_taken')
-        student_results.append({
-            'student': student,
-            'attempts': attempts_by_student
-        })
+    group, test_summaries = _group_history_scope(request, group_id)
+    gradebook, sort, descending = _group_gradebook(request, group, test_summaries)
+    page_obj = Paginator(gradebook.rows, GRADEBOOK_PAGE_SIZE).get_page(request.GET.get('page'))
 
     context = {
         'group': group,
-        'test_summaries': test_summaries,
-        'student_results': student_results,
+        'test_summaries': gradebook.tests,
+        'page_obj': page_obj,
+        'sort': sort,
+        'order': 'desc' if descending else 'asc',
         'is_teacher_user': is_teacher_or_staff(request.user),
     }
     return render(request, 'tests/group_history_results.html', context)
 
 @login_required
 @user_passes_test(is_teacher_or_staff)
-def test_statistics_dashboard(request):
-    context = {}
+def export_group_gradebook_csv(request, group_id):
+    group, test_summaries = _group_history_scope(request, group_id)
+    gradebook, _, _ = _group_gradebook(request, group, test_summaries)
+    response = StreamingHttpResponse(gradebook_csv_rows(gradebook), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="libro_calificaciones_{group.id}.csv"'
+    return response
 
-    group_id = request.GET.get('group')
-    test_id = request.GET.get('test')
+def _group_history_scope(request, group_id):
+    if request.user.is_staff:
+        group = get_object_or_404(Group, id=group_id)
 
-    if not request.user.is_staff:
-        groups_visible_to_teacher = Group.objects.filter(groupmetadata__created_by=request.user).distinct()
-        tests_visible_to_teacher = Test.objects.filter(creator=request.user)
-        attempts_queryset = Attempt.objects.filter(
-            user__groups__in=groups_visible_to_teacher,
-            test__in=tests_visible_to_teacher,
-            test__testassignment__assigned_by=request.user,
-            test__testassignment__group__in=groups_visible_to_teacher
-        ).distinct()
-    else: 
-        attempts_queryset = Attempt.objects.all()
+        test_summaries = Test.objects.filter(group_rollups__group=group, group_rollups__attempts__gt=0)
+    else:
+        group = get_object_or_404(Group, id=group_id, groupmetadata__created_by=request.user)
 
+        test_summaries = Test.objects.filter(
+            creator=request.user,
+            testassignment__group=group,
+            testassignment__assigned_by=request.user,
+            group_rollups__group=group,
+            group_rollups__attempts__gt=0
+        )
+
+    test_summaries = test_summaries.annotate(
+        avg_score=Cast('group_rollups__percentage_sum', FloatField()) / F('group_rollups__attempts'),
+        total_attempts=F('group_rollups__attempts')
+    ).order_by('name').distinct()
+    return group, test_summaries
+
+def _group_gradebook(request, group, test_summaries):
+    tests = list(test_summaries)
+    sort = request.GET.get('sort', 'name')
+    if not is_valid_sort(sort, tests):
+        sort = 'name'
+    descending = request.GET.get('order') == 'desc'
+    return build_gradebook(group, tests, sort=sort, descending=descending), sort, descending
+
+def _statistics_filters(request):
+    group_id = request.GET.get('group')
+    test_id = request.GET.get('test')
+    selected_group = selected_test = None
     if group_id:
         if request.user.is_staff:
-            group_obj = get_object_or_404(Group, id=group_id)
+            selected_group = get_object_or_404(Group, id=group_id)
         else:
-            group_obj = get_object_or_404(Group, id=group_id, groupmetadata__created_by=request.user)
-        attempts_queryset = attempts_queryset.filter(user__groups__id=group_id)
-        context['selected_group'] = group_obj 
+            selected_group = get_object_or_404(Group, id=group_id, groupmetadata__created_by=request.user)
     if test_id:
         if request.user.is_staff:
-            test_obj = get_object_or_404(Test, id=test_id)
+            selected_test = get_object_or_404(Test, id=test_id)
         else:
-            test_obj = get_object_or_404(Test, id=test_id, creator=request.user)
-        attempts_queryset = attempts_queryset.filter(test__id=test_id)
-        context['selected_test'] = test_obj
-
-    if not attempts_queryset.exists():
-        context['user_attempt_counts'] = []
-        context['overall_performance'] = {
-            'total_attempts_count': 0,
-            'correct': 0,
-            'incorrect': 0,
-            'answered': 0,
-            'unanswered': 0,
-            'total_possible': 0,
-        }
-        context['skill_performance_data_json'] = json.dumps([])
-        context['user_attempt_counts_json'] = json.dumps([])
-        context['overall_performance_json'] = json.dumps(context['overall_performance'])
-        return render(request, 'tests/statistics_dashboard.html', context)
-
-    user_attempts_data = User.objects.filter(
-        attempt__in=attempts_queryset
-    ).annotate(
-        num_attempts=Count('attempt', filter=Q(attempt__in=attempts_queryset))
-    ).filter(num_attempts__gt=0).order_by('-num_attempts')
-
-    context['user_attempt_counts'] = [
-        {'username': user.get_full_name() or user.username, 'attempts': user.num_attempts}
-        for user in user_attempts_data
-    ]
-
-    total_correct_global = 0
-    total_answered_global = 0
-    total_possible_questions_global = 0
+            selected_test = get_object_or_404(Test, id=test_id, creator=request.user)
+    return selected_group, selected_test
 
-    test_ids_in_attempts = attempts_queryset.values_list('test_id', flat=True).distinct()
-    questions_per_test = {
-        test.id: test.questions.count() for test in Test.objects.filter(id__in=test_ids_in_attempts)
-    }
-
-    for attempt in attempts_queryset:
-        total_correct_global += attempt.correct_count
-
-        answered_count_for_attempt = Answer.objects.filter(attempt=attempt).count()
-        total_answered_global += answered_count_for_attempt
-
-        total_possible_questions_global += questions_per_test.get(attempt.test_id, 0)
-
-    overall_incorrect_global = total_answered_global - total_correct_global
-    overall_unanswered_global = total_possible_questions_global - total_answered_global
-
-    context['overall_performance'] = {
-        'total_attempts_count': attempts_queryset.count(),
-        'correct': total_correct_global,
-        'incorrect': overall_incorrect_global,
-        'answered': total_answered_global,
-        'unanswered': overall_unanswered_global,
-        'total_possible': total_possible_questions_global,
+@login_required
+@user_passes_test(is_teacher_or_staff)
+def test_statistics_dashboard(request):
+    selected_group, selected_test = _statistics_filters(request)
+    query_string = request.GET.urlencode()
+    context = {
+        'selected_group': selected_group,
+        'selected_test': selected_test,
+        'statistics_urls': {
+            statistic: reverse('test_statistics_data', args=[statistic]) + (f'?{query_string}' if query_string else '')
+            for statistic in DASHBOARD_STATISTICS
+        },
     }
-
-    skill_performance_data = []
-    relevant_skills_ids = Skill.objects.filter(
-        question__tests_assigned__in=attempts_queryset.values_list('test', flat=True)
-    ).values_list('id', flat=True).distinct()
-
-    skills = Skill.objects.filter(id__in=relevant_skills_ids).order_by('name')
-
-    for skill in skills:
-        questions_in_skill_and_filtered_tests = Question.objects.filter(
-            skills=skill,
-            tests_assigned__in=attempts_queryset.values_list('test', flat=True)
-        ).distinct()
-
-        total_questions_answered_for_skill = 0
-        total_correct_for_skill = 0
-
-        answers_for_skill = Answer.objects.filter(
-            attempt__in=attempts_queryset,
-            question__in=questions_in_skill_and_filtered_tests
-        ).select_related('question', 'answer_choice')
-
-        for answer in answers_for_skill:
-            total_questions_answered_for_skill += 1
-
-            is_correct_answer = False
-            if answer.question.response_format == 'choice' and answer.answer_choice:
-                is_correct_answer = answer.answer_choice.is_correct
-            elif answer.question.response_format == 'text' and answer.question.correct_answer:
-                is_correct_answer = (answer.answer_text is not None) and (answer.answer_text.strip() == answer.question.correct_answer.strip())
-            elif answer.question.response_format == 'number' and answer.question.correct_answer:
-                try:
-                    is_correct_answer = (answer.answer_number is not None) and (float(answer.answer_number) == float(answer.question.correct_answer))
-                except (ValueError, TypeError):
-                    is_correct_answer = False
-
-            if is_correct_answer:
-                total_correct_for_skill += 1
-
-        accuracy = (total_correct_for_skill / total_questions_answered_for_skill * 100) if total_questions_answered_for_skill > 0 else 0
-
-        if total_questions_answered_for_skill > 0:
-            skill_performance_data.append({
-                'skill_name': skill.name,
-                'answered': total_questions_answered_for_skill,
-                'correct': total_correct_for_skill,
-                'accuracy': accuracy,
-                'incorrect': total_questions_answered_for_skill - total_correct_for_skill
-            })
-
-    context['skill_performance_data_json'] = json.dumps(skill_performance_data)
-    context['user_attempt_counts_json'] = json.dumps(context['user_attempt_counts'])
-    context['overall_performance_json'] = json.dumps(context['overall_performance'])
-
     return render(request, 'tests/statistics_dashboard.html', context)
 
+@login_required
+@user_passes_test(is_teacher_or_staff)
+def test_statistics_data(request, statistic):
+    if statistic not in DASHBOARD_STATISTICS:
+        raise Http404("Estadística no encontrada.")
+    selected_group, selected_test = _statistics_filters(request)
+    data = get_dashboard_statistic(
+        statistic,
+        request.user,
+        group_id=selected_group.id if selected_group else None,
+        test_id=selected_test.id if selected_test else None,
+    )
+    response = JsonResponse(data, safe=False)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
 def simple_logout(request):
     logout(request)
     messages.info(request, "Has cerrado sesión exitosamente.")